@@ -0,0 +1,186 @@
+"""Receives the metrics pushed by many monitors and writes them into one store.
+
+Every monitor started with --aggregator HOST:PORT (headless.py) pushes its
+flushed rows here through a network_sink.NetworkSink. The store is one
+SQLite file with the tables of a session database, each with two extra
+leading columns: host and session. Device ids are those of each host's
+session, so devices join on (host, session, id). The sessions table lists
+every (host, session) with the time its first and last batch arrived.
+
+There is no authentication: anyone who can connect can write rows. The
+aggregator listens on the loopback interface unless --bind says otherwise;
+only bind it to a network interface on a trusted network.
+
+Example:
+    python aggregator.py --port 9470 --db aggregate.db
+    python aggregator.py --bind 10.0.0.5 --port 9470 --db aggregate.db
+"""
+import os
+import signal
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import zlib
+from datetime import datetime
+from backend import (INSERT_COLUMNS, ROLLUP_TABLES, DEVICES_TABLE, configure_connection, write_batches)
+from network_sink import (ACK, FRAME, FRAME_MAGIC, MAX_FRAME, DEFAULT_PORT, decode_batch, recv_exact)
+
+STORE_PREFIX = ("host", "session")
+
+def create_store(conn):
+    # Columns are left untyped: values are stored as each host wrote them
+    for table, columns in INSERT_COLUMNS.items():
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (host TEXT, session TEXT, {", ".join(columns)})
+        """)
+        if table in ROLLUP_TABLES or table == DEVICES_TABLE:
+            # Rewritten rows replace the previous ones, as in a session file
+            conn.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_key ON {table} (host, session, {columns[0]})
+            """)
+        elif columns[0] == "timestamp":
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_host_timestamp ON {table} (host, timestamp)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sessions (
+        host TEXT,
+        session TEXT,
+        first_seen TEXT,
+        last_seen TEXT,
+        PRIMARY KEY (host, session)
+    )
+    """)
+    # Sequence numbers of the stored batches, so one sent again is not stored twice
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS received_batches (
+        host TEXT,
+        seq INTEGER,
+        PRIMARY KEY (host, seq)
+    )
+    """)
+    conn.commit()
+
+class Aggregator(socketserver.ThreadingTCPServer):
+    """Accepts monitor connections on address and stores their batches in db_path.
+
+    Each connection gets a thread; the store has one connection, shared
+    under a lock, so batches are committed one at a time.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, db_path):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        configure_connection(self.conn)
+        create_store(self.conn)
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        # Open client sockets, closed by stop()
+        self.clients = set()
+        super().__init__(address, BatchHandler)
+
+    def store(self, seq, host, session, batches):
+        """Write one batch in one transaction; False when it was already stored."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = {}
+        for table, table_rows in batches.items():
+            columns = INSERT_COLUMNS.get(table)
+            if columns is None:
+                print(f"Ignoring unknown table {table!r} from {host}")
+                continue
+            rows[table] = [(host, session) + tuple(row) for row in table_rows if len(row) == len(columns)]
+            if len(rows[table]) < len(table_rows):
+                print(f"Ignoring {len(table_rows) - len(rows[table])} malformed {table} rows from {host}")
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM received_batches WHERE host = ? AND seq = ?",
+                                 (host, seq)).fetchone():
+                return False
+            # Part of the transaction write_batches commits
+            self.conn.execute("INSERT INTO received_batches (host, seq) VALUES (?, ?)", (host, seq))
+            self.conn.execute("INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?)", (host, session, now, now))
+            self.conn.execute("UPDATE sessions SET last_seen = ? WHERE host = ? AND session = ?",
+                              (now, host, session))
+            write_batches(self.conn, rows, prefix=STORE_PREFIX)
+            self.batches += 1
+            self.rows += sum(len(table_rows) for table_rows in rows.values())
+        return True
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        # The handlers see the end of their stream and return
+        for sock in list(self.clients):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        with self.lock:
+            self.conn.close()
+
+class BatchHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        server.clients.add(self.request)
+        peer = f"{self.client_address[0]}:{self.client_address[1]}"
+        try:
+            while True:
+                try:
+                    header = recv_exact(self.request, FRAME.size)
+                except ConnectionError:
+                    # The monitor closed the connection between batches
+                    break
+                magic, length, seq = FRAME.unpack(header)
+                if magic != FRAME_MAGIC or length > MAX_FRAME:
+                    print(f"Closing {peer}: not a metrics stream")
+                    break
+                try:
+                    host, session, batches = decode_batch(recv_exact(self.request, length))
+                except (ValueError, KeyError, TypeError, zlib.error) as e:
+                    print(f"Closing {peer}: bad batch:", e)
+                    break
+                try:
+                    server.store(seq, host, session, batches)
+                except sqlite3.Error as e:
+                    # Not acknowledged; the monitor keeps the batch and sends it again
+                    print(f"Error storing a batch from {host}:", e)
+                    break
+                self.request.sendall(ACK.pack(seq))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Closing {peer}:", e)
+        finally:
+            server.clients.discard(self.request)
+
+def serve(address, db_path):
+    server = Aggregator(address, db_path)
+    thread = threading.Thread(target=server.serve_forever, name="Aggregator", daemon=True)
+    thread.start()
+    return server
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Store the metrics pushed by monitors on other hosts.")
+    parser.add_argument("--bind", default="127.0.0.1",
+                        help="address to listen on, e.g. 0.0.0.0 for all on a trusted network (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--db", default="aggregate.db", help="store the hosts are written to (default: ./aggregate.db)")
+    args = parser.parse_args(argv)
+
+    server = Aggregator((args.bind, args.port), args.db)
+    # SIGTERM (service stop) ends serve_forever like Ctrl+C; shutdown() has
+    # to be called from another thread
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    print(f"Storing metrics received on {args.bind}:{args.port} in {args.db}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.conn.close()
+    print(f"{server.batches} batches, {server.rows:,} rows stored")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
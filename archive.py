@@ -0,0 +1,463 @@
+"""Compact columnar archives of finished sessions.
+
+archive_session() turns a closed session database into one .pcarc file that
+holds every table column by column (metric, device, rollup, process_top
+and overhead_metrics tables):
+
+    header   magic, then the offset and length of the index (little endian)
+    columns  one block per column, 8-byte aligned
+    index    JSON: session metadata and, per table, the row count and the
+             offset, length, dtype, shape, codec and encoding of every column
+
+Timestamps are stored as int64 milliseconds since the epoch, delta-encoded;
+metrics are float32 (per-core and per-fan lists as 2-D arrays, padded with
+NaN). Per-device tables keep an int32 device_id column; the device names
+are in the index, as are the process names that process_top refers to by
+its name_id column. Each block is zlib-compressed, with the bytes of float columns shuffled
+first so they compress well. Archives written with compress=False keep raw
+blocks, which ArchiveReader maps straight from the file without copying.
+
+ArchiveReader offers the same queries as session_query.SessionReader, so
+OldDataViewer opens archives like session databases.
+
+Example:
+    python archive.py db/2024-12-18_22-12-18.db --remove
+"""
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+import numpy as np
+from backend import (METRIC_TABLES, ROLLUP_RESOLUTIONS, ROLLUP_TABLES, rollup_table, DEVICE_TABLES, DEVICE_COLUMNS, DEVICES_TABLE,
+                     OVERHEAD_TABLE, OVERHEAD_COLUMNS, PROCESS_TABLE, PROCESS_COLUMNS)
+from session_query import DEFAULT_MAX_POINTS, LIST_COLUMNS, open_session, series_expr, fetch_arrays
+
+ARCHIVE_SUFFIX = ".pcarc"
+MAGIC = b"PCMARC\x00\x01"
+HEADER = struct.Struct("<8sQQ")
+FORMAT_VERSION = 1
+
+# Milliseconds since the Unix epoch for a stored (UTC) timestamp
+EPOCH_MS_EXPR = "CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000.0) AS INTEGER)"
+
+def encode_column(array, codec, level):
+    """Encode one column; returns (bytes, encoding)."""
+    encoding = None
+    if array.dtype == np.int64:
+        # Timestamps: the first value, then the differences
+        array = np.diff(array, prepend=np.int64(0))
+        encoding = "delta"
+    elif codec == "zlib":
+        # Group the n-th byte of every value together: exponents and high
+        # mantissa bytes repeat a lot and compress far better side by side
+        array = np.ascontiguousarray(array).view(np.uint8).reshape(-1, array.dtype.itemsize).T
+        encoding = "shuffle"
+    data = np.ascontiguousarray(array).tobytes()
+    if codec == "zlib":
+        data = zlib.compress(data, level)
+    return data, encoding
+
+def decode_column(buffer, meta):
+    dtype = np.dtype(meta["dtype"])
+    shape = tuple(meta["shape"])
+    count = int(np.prod(shape))
+    if meta["codec"] == "zlib":
+        try:
+            buffer = zlib.decompress(buffer)
+        except zlib.error as e:
+            raise ValueError(f"corrupt archive column: {e}")
+    if meta["encoding"] == "shuffle":
+        raw = np.frombuffer(buffer, dtype=np.uint8).reshape(dtype.itemsize, count)
+        array = np.ascontiguousarray(raw.T).view(dtype).reshape(shape)
+    else:
+        array = np.frombuffer(buffer, dtype=dtype, count=count).reshape(shape)
+    if meta["encoding"] == "delta":
+        array = np.cumsum(array, dtype=np.int64)
+    return array
+
+def _layout(conn, table, process_names):
+    # (column names, SELECT expressions, dtypes) of a table in an archive
+    if table in METRIC_TABLES:
+        columns = METRIC_TABLES[table]
+        dtypes = [None if column in LIST_COLUMNS else np.float32 for column in columns]
+        exprs = [series_expr(conn, table, column) if column == "avg_usage" else column for column in columns]
+        return columns, exprs, dtypes
+    if table in DEVICE_COLUMNS:
+        columns = ("device_id",) + DEVICE_COLUMNS[table]
+        return columns, columns, [np.int32] + [np.float32] * (len(columns) - 1)
+    if table in ROLLUP_TABLES:
+        columns = tuple(row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] != "timestamp")
+        return columns, columns, [np.int32 if column == "sample_count" else np.float32 for column in columns]
+    if table == PROCESS_TABLE:
+        # Names are stored once, in the index, and referenced by position
+        conn.create_function("process_name_id", 1,
+                             lambda name: process_names.setdefault(name, len(process_names)))
+        columns = ("pid", "name_id") + PROCESS_COLUMNS[2:]
+        exprs = ("pid", "process_name_id(name)") + PROCESS_COLUMNS[2:]
+        return columns, exprs, [np.int32, np.int32] + [np.float32] * (len(columns) - 2)
+    columns = OVERHEAD_COLUMNS
+    return columns, columns, [np.float32] * len(columns)
+
+def read_table(conn, table, process_names=None):
+    """Every row of a table as {column: NumPy array}, ordered by time.
+
+    Names of process_top rows are added to process_names ({name: id}) as
+    they are read, and the table gets their ids as a name_id column.
+    """
+    columns, exprs, dtypes = _layout(conn, table, {} if process_names is None else process_names)
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    arrays = fetch_arrays(conn, f"""
+    SELECT {EPOCH_MS_EXPR}, {", ".join(exprs)} FROM {table} ORDER BY timestamp
+    """, dtypes=[np.int64] + dtypes, count=count)
+    return dict(zip(("timestamp",) + tuple(columns), arrays))
+
+def archive_session(db_path, archive_path=None, compress=True, level=6):
+    """Write a session database as a columnar archive; returns the archive path."""
+    if archive_path is None:
+        archive_path = os.path.splitext(db_path)[0] + ARCHIVE_SUFFIX
+    codec = "zlib" if compress else "none"
+    conn = open_session(db_path)
+    try:
+        metadata = conn.execute(
+            "SELECT start_time, end_time FROM session_metadata ORDER BY id DESC LIMIT 1").fetchone()
+        index = {
+            "format": FORMAT_VERSION,
+            "source": os.path.basename(db_path),
+            "metadata": {"start_time": metadata[0] if metadata else None,
+                         "end_time": metadata[1] if metadata else None},
+            "tables": {},
+            "devices": {},
+        }
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        tables = list(METRIC_TABLES)
+        if DEVICES_TABLE in existing:
+            tables += [table for table in DEVICE_TABLES.values() if table in existing]
+            index["devices"] = {str(device_id): name for device_id, name
+                                in conn.execute(f"SELECT id, name FROM {DEVICES_TABLE}")}
+        # Rollups outlive pruned raw rows, so they are kept too, as are the
+        # process and overhead tables
+        tables += [table for table in sorted(ROLLUP_TABLES) if table in existing]
+        tables += [table for table in (PROCESS_TABLE, OVERHEAD_TABLE) if table in existing]
+        process_names = {}
+        # Written to a temporary name so a failed run never leaves a half archive
+        tmp_path = archive_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, 0, 0))
+            for table in tables:
+                arrays = read_table(conn, table, process_names)
+                entry = {"rows": len(arrays["timestamp"]), "columns": {}}
+                for column, array in arrays.items():
+                    data, encoding = encode_column(array, codec, level)
+                    # Aligned so raw blocks can be viewed in place
+                    f.write(b"\0" * (-f.tell() % 8))
+                    entry["columns"][column] = {
+                        "offset": f.tell(), "length": len(data), "dtype": array.dtype.str,
+                        "shape": list(array.shape), "codec": codec, "encoding": encoding,
+                    }
+                    f.write(data)
+                index["tables"][table] = entry
+            index["process_names"] = list(process_names)
+            index_data = json.dumps(index).encode("utf-8")
+            index_offset = f.tell()
+            f.write(index_data)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, index_offset, len(index_data)))
+        os.replace(tmp_path, archive_path)
+    finally:
+        conn.close()
+    return archive_path
+
+def _bucket_starts(times, start, width, max_points):
+    # Rows are ordered by time, so every bucket is a contiguous run
+    ids = np.minimum(((times - start) / width).astype(np.int64), max_points - 1)
+    return np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1))
+
+def _reduce(values, starts):
+    """Mean, min and max of every run of values beginning at starts, ignoring NaN."""
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid, starts, dtype=np.int64)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / counts
+    return (mean,
+            np.fmin.reduceat(values, starts).astype(np.float64),
+            np.fmax.reduceat(values, starts).astype(np.float64))
+
+class ArchiveReader:
+    """Read-only access to a session archive, with the queries of SessionReader.
+
+    The file is memory-mapped and each column is decoded once, on first use.
+    """
+
+    def __init__(self, path):
+        self.db_path = path
+        self.file = open(path, "rb")
+        try:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, index_offset, index_length = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a session archive")
+            self.index = json.loads(self.mm[index_offset:index_offset + index_length])
+        except Exception:
+            self.file.close()
+            raise
+        self.lock = threading.Lock()
+        self.decoded = {}
+
+    @property
+    def metadata(self):
+        return self.index["metadata"]
+
+    def close(self):
+        with self.lock:
+            if self.mm is None:
+                return
+            self.decoded = {}
+            try:
+                self.mm.close()
+            except BufferError:
+                # Raw columns are still referenced; the map goes away with them
+                pass
+            self.file.close()
+            self.mm = None
+
+    def rows(self, table):
+        entry = self.index["tables"].get(table)
+        return entry["rows"] if entry else 0
+
+    def column(self, table, column):
+        key = (table, column)
+        with self.lock:
+            if key not in self.decoded:
+                meta = self.index["tables"][table]["columns"][column]
+                view = memoryview(self.mm)[meta["offset"]:meta["offset"] + meta["length"]]
+                self.decoded[key] = decode_column(view, meta)
+            return self.decoded[key]
+
+    def times(self, table):
+        """Sample times of a table in epoch seconds."""
+        key = (table, "time")
+        with self.lock:
+            cached = self.decoded.get(key)
+        if cached is None:
+            cached = self.column(table, "timestamp") / 1000.0
+            with self.lock:
+                self.decoded[key] = cached
+        return cached
+
+    def time_bounds(self, table):
+        if self.rows(table) == 0:
+            return None
+        times = self.times(table)
+        return float(times[0]), float(times[-1])
+
+    def _range(self, table, start, end):
+        times = self.times(table)
+        lo = np.searchsorted(times, start, side="left")
+        hi = np.searchsorted(times, end, side="right")
+        return times, lo, hi
+
+    def buckets(self, table, columns, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+        """Same result as session_query.query_buckets, computed with NumPy."""
+        bounds = self.time_bounds(table)
+        if bounds is None:
+            return None
+        start = bounds[0] if start is None else start
+        end = bounds[1] if end is None else end
+        width = max((end - start) / max_points, 1e-3)
+
+        times, lo, hi = self._range(table, start, end)
+        times = times[lo:hi]
+        if len(times) == 0:
+            empty = np.empty(0, dtype=np.float64)
+            return dict({"time": empty}, **{c: {"mean": empty, "min": empty, "max": empty} for c in columns})
+        starts = _bucket_starts(times, start, width, max_points)
+        result = {"time": np.add.reduceat(times, starts) / np.diff(np.append(starts, len(times)))}
+        for column in columns:
+            mean, low, high = _reduce(self.column(table, column)[lo:hi], starts)
+            result[column] = {"mean": mean, "min": low, "max": high}
+        return result
+
+    def device_buckets(self, table, columns, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+        """Same result as session_query.query_device_buckets."""
+        device_table = DEVICE_TABLES.get(table)
+        if self.rows(device_table) == 0:
+            return {}
+        bounds = self.time_bounds(device_table)
+        start = bounds[0] if start is None else start
+        end = bounds[1] if end is None else end
+        width = max((end - start) / max_points, 1e-3)
+
+        times, lo, hi = self._range(device_table, start, end)
+        times = times[lo:hi]
+        ids = self.column(device_table, "device_id")[lo:hi]
+        values = [self.column(device_table, column)[lo:hi] for column in columns]
+        names = self.index.get("devices", {})
+        result = {}
+        for device_id in np.unique(ids):
+            rows = np.flatnonzero(ids == device_id)
+            starts = _bucket_starts(times[rows], start, width, max_points)
+            device = {"time": np.add.reduceat(times[rows], starts) / np.diff(np.append(starts, len(rows)))}
+            for column, array in zip(columns, values):
+                device[column] = _reduce(array[rows], starts)[0]
+            result[names.get(str(device_id), str(device_id))] = device
+        return result
+
+    def core_usage(self, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+        """Same result as session_query.query_core_usage: the first row of every bucket."""
+        bounds = self.time_bounds("cpu_metrics")
+        if bounds is None:
+            return None, None
+        start = bounds[0] if start is None else start
+        end = bounds[1] if end is None else end
+        width = max((end - start) / max_points, 1e-3)
+
+        times, lo, hi = self._range("cpu_metrics", start, end)
+        if hi <= lo:
+            return None, None
+        starts = _bucket_starts(times[lo:hi], start, width, max_points) + lo
+        return times[starts], self.column("cpu_metrics", "core_usage")[starts].T
+
+    def columns(self, table, columns, start=None, end=None):
+        """Same result as session_query.query_columns. Columns of uncompressed
+        archives are views into the mapped file."""
+        if self.rows(table) == 0:
+            empty = np.empty(0, dtype=np.float64)
+            return dict({"time": empty}, **{column: empty for column in columns})
+        times, lo, hi = self._range(table, -np.inf if start is None else start,
+                                    np.inf if end is None else end)
+        result = {"time": times[lo:hi]}
+        for column in columns:
+            result[column] = self.column(table, column)[lo:hi]
+        return result
+
+    def load_table(self, table, columns, cores=False, max_points=DEFAULT_MAX_POINTS, devices=False):
+        bounds = self.time_bounds(table)
+        if bounds is None:
+            return None
+        payload = {"bounds": bounds, "buckets": None, "cores": None, "devices": None}
+        if columns:
+            payload["buckets"] = self.buckets(table, columns, bounds[0], bounds[1], max_points)
+        if cores:
+            payload["cores"] = self.core_usage(bounds[0], bounds[1], max_points)
+        if devices:
+            payload["devices"] = self.device_buckets(table, columns, bounds[0], bounds[1], max_points)
+        return payload
+
+    def iter_rows(self, table, columns, start, end, resolution=None, batch_size=1000):
+        """(time, value, ...) rows in [start, end], like cross_session.SessionSet.query_range.
+
+        With a rollup resolution, the averages of aligned buckets of that size
+        are returned, timed at the start of each bucket.
+        """
+        rollup = rollup_table(table, resolution) if resolution is not None else None
+        entry = self.index["tables"].get(rollup)
+        if entry and entry["rows"] and all(f"{column}_avg" in entry["columns"] for column in columns):
+            # Archived rollups also cover raw rows pruned while recording
+            times, lo, hi = self._range(rollup, start, end)
+            times = times[lo:hi]
+            values = [self.column(rollup, f"{column}_avg")[lo:hi].astype(np.float64) for column in columns]
+            resolution = None
+        elif self.rows(table) == 0:
+            return
+        else:
+            times, lo, hi = self._range(table, start, end)
+            times = times[lo:hi]
+            values = [self.column(table, column)[lo:hi].astype(np.float64) for column in columns]
+        if resolution is not None and len(times):
+            seconds = ROLLUP_RESOLUTIONS[resolution]
+            ids = (times // seconds).astype(np.int64)
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1))
+            times = ids[starts] * float(seconds)
+            values = [_reduce(v, starts)[0] for v in values]
+        for i in range(0, len(times), batch_size):
+            chunk = [times[i:i + batch_size].tolist()] + [v[i:i + batch_size].tolist() for v in values]
+            yield from zip(*chunk)
+
+def session_closed(db_path):
+    """Whether a session database has an end time, i.e. its recording finished."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT end_time FROM session_metadata ORDER BY id DESC LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    return bool(row and row[0])
+
+def verify_archive(db_path, archive_path):
+    """Read an archive back and check it against its session database; raises ValueError on a mismatch.
+
+    Every column is decoded, row counts and sample times must match, and no
+    table of the session with rows may be missing from the archive.
+    """
+    conn = open_session(db_path)
+    reader = ArchiveReader(archive_path)
+    try:
+        archived = reader.index["tables"]
+        # Tables whose contents live in the index or are not data
+        skip = {"session_metadata", "sqlite_sequence", DEVICES_TABLE}
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            if table in skip or table in archived:
+                continue
+            if conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0]:
+                raise ValueError(f"{table} has rows but is not in the archive")
+        for table, entry in archived.items():
+            times = fetch_arrays(conn, f"SELECT {EPOCH_MS_EXPR} FROM {table} ORDER BY timestamp",
+                                 dtypes=[np.int64])[0]
+            if entry["rows"] != len(times):
+                raise ValueError(f"{table}: {entry['rows']} rows archived, {len(times)} in the session")
+            for column in entry["columns"]:
+                if len(reader.column(table, column)) != len(times):
+                    raise ValueError(f"{table}.{column} has the wrong number of rows")
+            if not np.array_equal(reader.column(table, "timestamp"), times):
+                raise ValueError(f"{table}: archived sample times differ from the session")
+    finally:
+        reader.close()
+        conn.close()
+
+def main(argv=None):
+    import argparse
+    from backend import migrate_session
+    parser = argparse.ArgumentParser(description="Archive finished session databases as columnar files.")
+    parser.add_argument("sessions", nargs="+", help="session .db files")
+    parser.add_argument("--no-compress", action="store_true",
+                        help="store raw columns, larger but mapped without decoding")
+    parser.add_argument("--remove", action="store_true",
+                        help="delete each session database once its archive is written and read back")
+    parser.add_argument("--force", action="store_true",
+                        help="also archive sessions without an end time")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for db_path in args.sessions:
+        try:
+            if not args.force and not session_closed(db_path):
+                print(f"Skipping {db_path}: the session has no end time (still recording?)")
+                continue
+            migrate_session(db_path)
+            archive_path = archive_session(db_path, compress=not args.no_compress)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Could not archive {db_path}:", e)
+            status = 1
+            continue
+        before = sum(os.path.getsize(db_path + suffix) for suffix in ("", "-wal")
+                     if os.path.exists(db_path + suffix))
+        after = os.path.getsize(archive_path)
+        print(f"{db_path} -> {archive_path}: {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+        if args.remove:
+            # Nothing is deleted unless the archive reads back complete
+            try:
+                verify_archive(db_path, archive_path)
+            except (ValueError, sqlite3.Error, OSError) as e:
+                print(f"Keeping {db_path}: the archive does not match it:", e)
+                status = 1
+                continue
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+    return status
+
+if __name__ == "__main__":
+    raise SystemExit(main())
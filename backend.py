@@ -1,10 +1,344 @@
 import sqlite3
 import os
 import time
-from datetime import datetime
+import threading
+from array import array
+from datetime import datetime, timezone
+from instrumentation import instruments
+
+# Insertable columns of every metric table, in INSERT order. The timestamp
+# column is always written first and is not listed here.
+METRIC_TABLES = {
+    "cpu_metrics": ("core_usage", "cpu_temp", "fan_speeds", "avg_usage"),
+    "gpu_metrics": ("gpu_usage", "gpu_mem_usage", "gpu_temp", "gpu_fan"),
+    "ram_metrics": ("ram_usage",),
+    "network_metrics": ("download_speed", "upload_speed", "sample_interval"),
+    "disk_metrics": ("read_speed", "write_speed", "sample_interval"),
+}
+
+# Numeric columns of every metric table that are summarized into rollups
+ROLLUP_COLUMNS = {
+    "cpu_metrics": ("avg_usage", "cpu_temp"),
+    "gpu_metrics": ("gpu_usage", "gpu_mem_usage", "gpu_temp", "gpu_fan"),
+    "ram_metrics": ("ram_usage",),
+    "network_metrics": ("download_speed", "upload_speed"),
+    "disk_metrics": ("read_speed", "write_speed"),
+}
+
+# Rollup tables kept for every metric table: name suffix -> bucket size in
+# seconds. Each row of <table>_rollup_<name> summarizes one bucket with the
+# sample count and the min, max and average of every ROLLUP_COLUMNS column.
+ROLLUP_RESOLUTIONS = {
+    "10s": 10,
+    "1m": 60,
+    "1h": 3600,
+}
+
+def rollup_table(table, resolution):
+    return f"{table}_rollup_{resolution}"
+
+def rollup_columns(table):
+    """Columns of a rollup table in INSERT order."""
+    columns = ["timestamp", "sample_count"]
+    for column in ROLLUP_COLUMNS[table]:
+        columns += [f"{column}_min", f"{column}_max", f"{column}_avg"]
+    return tuple(columns)
+
+# Per-device breakdown of metric tables: metric table -> device table. A
+# device table has one row per device and sample, with the columns of the
+# metric table and the device's id in the devices table (kind, name). The
+# metric table keeps the totals. Device tables have no rollups.
+DEVICE_TABLES = {
+    "network_metrics": "network_device_metrics",
+    "disk_metrics": "disk_device_metrics",
+}
+DEVICE_COLUMNS = {
+    "network_device_metrics": ("download_speed", "upload_speed"),
+    "disk_device_metrics": ("read_speed", "write_speed"),
+}
+DEVICES_TABLE = "devices"
+
+# The monitor's own overhead (instrumentation.py), logged when enabled. It is
+# not a metric table: no rollups, not shown by the viewers.
+OVERHEAD_TABLE = "overhead_metrics"
+OVERHEAD_COLUMNS = ("cpu_percent", "rss_mb", "tick_p99_ms", "commit_p99_ms", "late_ticks")
+
+# The busiest processes of every sample of the processes source: one row per
+# process in the top N by CPU, memory, reads or writes (see sources.py)
+PROCESS_TABLE = "process_top"
+PROCESS_COLUMNS = ("pid", "name", "cpu_percent", "rss_mb", "read_speed", "write_speed")
+
+# INSERT columns of every table the logger writes to, rollups included
+INSERT_COLUMNS = {table: ("timestamp",) + columns for table, columns in METRIC_TABLES.items()}
+ROLLUP_TABLES = set()
+for _table in METRIC_TABLES:
+    for _resolution in ROLLUP_RESOLUTIONS:
+        INSERT_COLUMNS[rollup_table(_table, _resolution)] = rollup_columns(_table)
+        ROLLUP_TABLES.add(rollup_table(_table, _resolution))
+INSERT_COLUMNS[OVERHEAD_TABLE] = ("timestamp",) + OVERHEAD_COLUMNS
+for _device_table, _columns in DEVICE_COLUMNS.items():
+    INSERT_COLUMNS[_device_table] = ("timestamp", "device_id") + _columns
+INSERT_COLUMNS[DEVICES_TABLE] = ("id", "kind", "name")
+INSERT_COLUMNS[PROCESS_TABLE] = ("timestamp",) + PROCESS_COLUMNS
+
+# Raw rows deleted per table in one pruning pass, to keep each flush short
+PRUNE_BATCH = 5000
+
+# Bumped whenever the layout of a session database changes; stored in
+# PRAGMA user_version. 0 is the original layout with comma-joined TEXT lists,
+# 1 adds packed core lists and avg_usage, 2 adds WAL and timestamp indexes,
+# 3 adds rollup tables, 4 adds per-device tables, 5 adds the measured
+# sample_interval of rate metrics, 6 adds process_top.
+SCHEMA_VERSION = 6
+
+# Metric tables whose values are rates over the time since the previous
+# sample; that time, in seconds, is stored with each row
+RATE_TABLES = ("network_metrics", "disk_metrics")
+
+# Page size for new session files, in bytes. Only takes effect before the
+# first table is created.
+PAGE_SIZE = 8192
+
+def pack_floats(values):
+    """Pack a list of numbers into a float32 BLOB (used for per-core usage and fan speeds)."""
+    return array('f', values).tobytes()
+
+def unpack_floats(value):
+    """Inverse of pack_floats. Also accepts the comma-joined TEXT of older databases."""
+    if value is None:
+        return []
+    if isinstance(value, (bytes, memoryview)):
+        values = array('f')
+        values.frombytes(value)
+        return values.tolist()
+    return [float(x) for x in value.split(',') if x.strip()]
+
+def core_average(value):
+    """Mean of a packed or comma-joined core list; registered as core_avg() in SQL."""
+    values = unpack_floats(value)
+    return sum(values) / len(values) if values else None
+
+def format_timestamp(dt=None):
+    """Format a UTC datetime (default: now) the way metric timestamps are stored.
+
+    Milliseconds are kept so samples taken faster than 1 Hz stay distinct; the
+    result still sorts and parses like SQLite's CURRENT_TIMESTAMP.
+    """
+    if dt is None:
+        dt = datetime.now(timezone.utc)
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+def parse_timestamp(timestamp):
+    """Seconds since the epoch of a stored (UTC) timestamp."""
+    return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp()
+
+def configure_connection(conn, synchronous="NORMAL", cache_size_kb=8192):
+    """Apply the per-connection performance settings used for session databases.
+
+    WAL lets the viewer read a session while it is being written. With WAL,
+    synchronous=NORMAL only syncs on checkpoints, which is safe against
+    application crashes and loses at most the last transactions on power loss.
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    # A negative cache_size is in KiB rather than pages
+    conn.execute(f"PRAGMA cache_size = {-int(cache_size_kb)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+def create_timestamp_indexes(conn):
+    # Range queries and ORDER BY timestamp in the viewer use these
+    for table in METRIC_TABLES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)")
+
+def create_rollup_tables(conn):
+    for table in METRIC_TABLES:
+        for resolution in ROLLUP_RESOLUTIONS:
+            # The timestamp (bucket start) primary key doubles as the range index
+            columns = ", ".join(f"{column} REAL" for column in rollup_columns(table)[2:])
+            conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {rollup_table(table, resolution)} (
+                timestamp TEXT PRIMARY KEY,
+                sample_count INTEGER,
+                {columns}
+            )
+            """)
+
+def create_device_tables(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {DEVICES_TABLE} (
+        id INTEGER PRIMARY KEY,
+        kind TEXT,
+        name TEXT,
+        UNIQUE (kind, name)
+    )
+    """)
+    for device_table, device_columns in DEVICE_COLUMNS.items():
+        columns = ", ".join(f"{column} REAL" for column in device_columns)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {device_table} (timestamp TEXT, device_id INTEGER, {columns})")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{device_table}_timestamp ON {device_table} (timestamp)")
+
+def create_process_table(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {PROCESS_TABLE} (
+        timestamp TEXT,
+        pid INTEGER,
+        name TEXT,
+        cpu_percent REAL,
+        rss_mb REAL,
+        read_speed REAL,
+        write_speed REAL
+    )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{PROCESS_TABLE}_timestamp ON {PROCESS_TABLE} (timestamp)")
+
+def rebuild_rollups(conn):
+    """Recompute every rollup table from the raw rows, e.g. for sessions recorded before rollups existed."""
+    conn.create_function("core_avg", 1, core_average, deterministic=True)
+    raw_columns = [row[1] for row in conn.execute("PRAGMA table_info(cpu_metrics)")]
+    for table, columns in ROLLUP_COLUMNS.items():
+        exprs = list(columns)
+        if table == "cpu_metrics":
+            # Rows written before avg_usage existed only have the core list
+            if "avg_usage" in raw_columns:
+                exprs[0] = "COALESCE(avg_usage, core_avg(core_usage))"
+            else:
+                exprs[0] = "core_avg(core_usage)"
+        aggregates = ", ".join(f"MIN({expr}), MAX({expr}), AVG({expr})" for expr in exprs)
+        for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+            target = rollup_table(table, resolution)
+            conn.execute(f"""
+            INSERT OR REPLACE INTO {target} ({", ".join(rollup_columns(table))})
+            SELECT strftime('%Y-%m-%d %H:%M:%f',
+                            (CAST(strftime('%s', timestamp) AS INTEGER) / {seconds}) * {seconds}, 'unixepoch'),
+                   COUNT(*), {aggregates}
+            FROM {table}
+            GROUP BY 1
+            """)
+
+class RollupBucket:
+    """Running min/max/mean of the ROLLUP_COLUMNS of one table over one time bucket."""
+
+    def __init__(self, start, width):
+        self.start = start
+        self.count = 0
+        self.mins = [None] * width
+        self.maxs = [None] * width
+        self.sums = [0.0] * width
+        self.counts = [0] * width
+
+    def add(self, values):
+        self.count += 1
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            if self.counts[i] == 0 or value < self.mins[i]:
+                self.mins[i] = value
+            if self.counts[i] == 0 or value > self.maxs[i]:
+                self.maxs[i] = value
+            self.sums[i] += value
+            self.counts[i] += 1
+
+    def row(self):
+        row = [format_timestamp(datetime.fromtimestamp(self.start, timezone.utc)), self.count]
+        for i in range(len(self.sums)):
+            avg = self.sums[i] / self.counts[i] if self.counts[i] else None
+            row += [self.mins[i], self.maxs[i], avg]
+        return tuple(row)
+
+def upgrade_schema(conn):
+    """Bring a session database written by an older version up to SCHEMA_VERSION.
+
+    Existing rows are left as they are: old comma-joined TEXT core lists stay
+    readable through unpack_floats and simply have no avg_usage.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    if version < 1:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(cpu_metrics)")]
+        if columns and "avg_usage" not in columns:
+            conn.execute("ALTER TABLE cpu_metrics ADD COLUMN avg_usage REAL")
+    if version < 2:
+        conn.execute("PRAGMA journal_mode = WAL")
+        create_timestamp_indexes(conn)
+    if version < 3:
+        create_rollup_tables(conn)
+        rebuild_rollups(conn)
+    if version < 4:
+        create_device_tables(conn)
+    if version < 5:
+        for table in RATE_TABLES:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if columns and "sample_interval" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN sample_interval REAL")
+    if version < 6:
+        create_process_table(conn)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+def migrate_session(db_path):
+    """Upgrade one session file in place. Returns False if it could not be opened for writing."""
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            upgrade_schema(conn)
+        finally:
+            conn.close()
+        return True
+    except sqlite3.Error as e:
+        print(f"Could not migrate {db_path}:", e)
+        return False
+
+def write_batches(conn, batches, prefix=()):
+    """Insert {table: [rows in INSERT_COLUMNS order]} into conn in one transaction.
+
+    prefix columns (e.g. the aggregator's host and session) are written
+    before the INSERT_COLUMNS of every table; rows must then start with them.
+    """
+    with conn:
+        for table, rows in batches.items():
+            columns = tuple(prefix) + INSERT_COLUMNS[table]
+            placeholders = ", ".join("?" for _ in columns)
+            # A rollup bucket may be rewritten (e.g. a partial one
+            # written on close of a reopened session)
+            replace = table in ROLLUP_TABLES or table == DEVICES_TABLE
+            verb = "INSERT OR REPLACE" if replace else "INSERT"
+            conn.executemany(f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+class Sink:
+    """Where BackendLogger writes its flushed rows.
+
+    write(batches) gets {table: [rows in INSERT_COLUMNS order]} once per
+    flush. The session file's SQLiteSink is always written first; when it
+    raises the rows stay buffered for the next flush. The extra sinks
+    (e.g. network_sink.NetworkSink) are written after it, outside the
+    logger's lock, so they must be thread-safe and deal with their own
+    failures. open_session is called once with the session
+    name before the first write, close when the logger is closed.
+    """
+
+    def open_session(self, session):
+        pass
+
+    def write(self, batches):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SQLiteSink(Sink):
+    """Writes to the logger's session file; the connection stays owned by the logger."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def write(self, batches):
+        write_batches(self.conn, batches)
 
 class BackendLogger:
-    def __init__(self, base_dir="./db/"):
+    def __init__(self, base_dir="./db/", flush_interval=5.0, flush_rows=500,
+                 synchronous="NORMAL", cache_size_kb=8192, raw_retention=None, prune_interval=60.0,
+                 sinks=None):
         # Capture start time
         self.start_time = datetime.now()
         self.end_time = None
@@ -15,20 +349,80 @@ class BackendLogger:
         self.provisional_db_filename = f"{self.start_str}.db"
         self.db_path = os.path.join(base_dir, self.provisional_db_filename)
 
+        # Samples are buffered in memory and written in one transaction when
+        # flush_interval seconds have passed or flush_rows rows are pending.
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.write_buffer = {table: [] for table in INSERT_COLUMNS}
+        self.pending_rows = 0
+        self.last_flush_time = time.monotonic()
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.flush_count = 0
+        self.lock = threading.Lock()
+
+        # SQLite tuning, see configure_connection
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+
+        # Rollups are updated as samples arrive; a bucket is written once the
+        # next one starts (and on close). The open bucket of every
+        # (table, resolution) is kept here.
+        self.rollup_buckets = {}
+
+        # Raw rows older than raw_retention seconds are deleted every
+        # prune_interval seconds, during a flush; None keeps them forever.
+        # Rollups are never pruned.
+        self.raw_retention = raw_retention
+        self.prune_interval = prune_interval
+        self.last_prune_time = time.monotonic()
+
+        # Ids of the devices of the device tables, by (kind, name)
+        self.device_ids = {}
+
         self.conn = None
+        self.catalog = None
         self.create_database()
 
+        # Every flush goes to the session file, then to the extra sinks
+        self.sinks = [SQLiteSink(self.conn)] + list(sinks or [])
+        for sink in self.sinks:
+            sink.open_session(self.start_str)
+
     def create_database(self):
         new_db = not os.path.exists(self.db_path)
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        if new_db:
+            self.conn.execute(f"PRAGMA page_size = {PAGE_SIZE}")
+        configure_connection(self.conn, synchronous=self.synchronous, cache_size_kb=self.cache_size_kb)
         if new_db:
             self._create_tables()
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             # Insert start time (local time)
             start_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             cursor = self.conn.cursor()
             cursor.execute("INSERT INTO session_metadata (start_time) VALUES (?)", (start_time_str,))
             self.conn.commit()
+        else:
+            upgrade_schema(self.conn)
+        # Created on every open rather than by a schema version, as it is optional
+        columns = ", ".join(f"{column} REAL" for column in OVERHEAD_COLUMNS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {OVERHEAD_TABLE} (timestamp TEXT, {columns})")
+        self.conn.commit()
+        self.device_ids = {(kind, name): device_id for device_id, kind, name
+                           in self.conn.execute(f"SELECT id, kind, name FROM {DEVICES_TABLE}")}
+        self._open_catalog()
 
+    def _open_catalog(self):
+        # The session is listed in the directory's catalog (session_catalog.py)
+        # as soon as it starts, and its counts are filled in on close
+        from session_catalog import SessionCatalog, scan_session
+        try:
+            self.catalog = SessionCatalog(os.path.dirname(self.db_path) or ".")
+            self.catalog.record(self.db_path, scan_session(self.conn))
+        except sqlite3.Error as e:
+            print("Error updating the session catalog:", e)
+            self.catalog = None
 
     def _create_tables(self):
         cursor = self.conn.cursor()
@@ -45,12 +439,15 @@ class BackendLogger:
         cursor.execute("INSERT INTO session_metadata (start_time) VALUES (datetime('now'))")
 
         # CPU Metrics
+        # core_usage and fan_speeds are float32 BLOBs (see pack_floats) with one
+        # value per core / fan; avg_usage is the mean of core_usage
         cursor.execute("""
         CREATE TABLE cpu_metrics (
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            core_usage TEXT,
+            core_usage BLOB,
             cpu_temp REAL,
-            fan_speeds TEXT
+            fan_speeds BLOB,
+            avg_usage REAL
         )
         """)
 
@@ -78,7 +475,8 @@ class BackendLogger:
         CREATE TABLE network_metrics (
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
             download_speed REAL,
-            upload_speed REAL
+            upload_speed REAL,
+            sample_interval REAL
         )
         """)
 
@@ -87,56 +485,194 @@ class BackendLogger:
         CREATE TABLE disk_metrics (
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
             read_speed REAL,
-            write_speed REAL
+            write_speed REAL,
+            sample_interval REAL
         )
         """)
 
-        self.conn.commit()
+        create_timestamp_indexes(self.conn)
+        create_rollup_tables(self.conn)
+        create_device_tables(self.conn)
+        create_process_table(self.conn)
 
-    def log_cpu_metrics(self, core_usage_list, cpu_temp, fan_speeds):
-        cursor = self.conn.cursor()
-        core_usage_str = ",".join([str(u) for u in core_usage_list])
-        fan_speeds_str = ",".join([str(f) for f in fan_speeds]) if fan_speeds else ""
-        cursor.execute("""
-        INSERT INTO cpu_metrics (core_usage, cpu_temp, fan_speeds)
-        VALUES (?, ?, ?)
-        """, (core_usage_str, cpu_temp, fan_speeds_str))
         self.conn.commit()
 
-    def log_gpu_metrics(self, gpu_usage, gpu_mem_usage, gpu_temp, gpu_fan):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-        INSERT INTO gpu_metrics (gpu_usage, gpu_mem_usage, gpu_temp, gpu_fan)
-        VALUES (?, ?, ?, ?)
-        """, (gpu_usage, gpu_mem_usage, gpu_temp, gpu_fan))
-        self.conn.commit()
+    # Every log_* method takes an optional timestamp (see format_timestamp) so
+    # that samples taken in the same collector tick share one timestamp.
 
-    def log_ram_metrics(self, ram_usage):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-        INSERT INTO ram_metrics (ram_usage)
-        VALUES (?)
-        """, (ram_usage,))
-        self.conn.commit()
+    def log_cpu_metrics(self, core_usage_list, cpu_temp, fan_speeds, timestamp=None):
+        avg_usage = sum(core_usage_list) / len(core_usage_list) if core_usage_list else None
+        self._enqueue("cpu_metrics",
+                      (pack_floats(core_usage_list), cpu_temp, pack_floats(fan_speeds or []), avg_usage),
+                      timestamp)
 
-    def log_network_metrics(self, download_speed, upload_speed):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-        INSERT INTO network_metrics (download_speed, upload_speed)
-        VALUES (?, ?)
-        """, (download_speed, upload_speed))
-        self.conn.commit()
+    def log_gpu_metrics(self, gpu_usage, gpu_mem_usage, gpu_temp, gpu_fan, timestamp=None):
+        self._enqueue("gpu_metrics", (gpu_usage, gpu_mem_usage, gpu_temp, gpu_fan), timestamp)
 
-    def log_disk_metrics(self, read_speed, write_speed):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-        INSERT INTO disk_metrics (read_speed, write_speed)
-        VALUES (?, ?)
-        """, (read_speed, write_speed))
-        self.conn.commit()
+    def log_ram_metrics(self, ram_usage, timestamp=None):
+        self._enqueue("ram_metrics", (ram_usage,), timestamp)
+
+    # sample_interval is the measured time in seconds the rates were computed over
+
+    def log_network_metrics(self, download_speed, upload_speed, timestamp=None, sample_interval=None):
+        self._enqueue("network_metrics", (download_speed, upload_speed, sample_interval), timestamp)
+
+    def log_disk_metrics(self, read_speed, write_speed, timestamp=None, sample_interval=None):
+        self._enqueue("disk_metrics", (read_speed, write_speed, sample_interval), timestamp)
+
+    def log_network_device_metrics(self, devices, speeds, timestamp=None):
+        """Per-interface speeds: speeds has one (download, upload) row per name in devices."""
+        self._enqueue_devices("network_metrics", "network", devices, speeds, timestamp)
+
+    def log_disk_device_metrics(self, devices, speeds, timestamp=None):
+        """Per-disk speeds: speeds has one (read, write) row per name in devices."""
+        self._enqueue_devices("disk_metrics", "disk", devices, speeds, timestamp)
+
+    def log_process_top(self, processes, timestamp=None):
+        """The top processes of one sample, as tuples in PROCESS_COLUMNS order."""
+        if timestamp is None:
+            timestamp = format_timestamp()
+        with self.lock:
+            self.write_buffer[PROCESS_TABLE].extend((timestamp,) + tuple(row) for row in processes)
+            self.pending_rows += len(processes)
+        self._maybe_flush()
+
+    def log_overhead_metrics(self, cpu_percent, rss_mb, tick_p99_ms, commit_p99_ms, late_ticks, timestamp=None):
+        self._enqueue(OVERHEAD_TABLE, (cpu_percent, rss_mb, tick_p99_ms, commit_p99_ms, late_ticks), timestamp)
+
+    def _enqueue(self, table, values, timestamp=None):
+        # Rows carry their own timestamp since they are inserted later than
+        # they are sampled. UTC to match the CURRENT_TIMESTAMP column default.
+        if timestamp is None:
+            timestamp = format_timestamp()
+        with self.lock:
+            self.write_buffer[table].append((timestamp,) + tuple(values))
+            self.pending_rows += 1
+            if table in ROLLUP_COLUMNS:
+                self._update_rollups(table, timestamp, values)
+        self._maybe_flush()
+
+    def _enqueue_devices(self, table, kind, devices, values, timestamp=None):
+        if timestamp is None:
+            timestamp = format_timestamp()
+        device_table = DEVICE_TABLES[table]
+        with self.lock:
+            rows = self.write_buffer[device_table]
+            for name, row in zip(devices, values):
+                device_id = self.device_ids.get((kind, name))
+                if device_id is None:
+                    # Devices get the next id when first seen (hot-plugged ones too)
+                    device_id = max(self.device_ids.values(), default=0) + 1
+                    self.device_ids[(kind, name)] = device_id
+                    self.write_buffer[DEVICES_TABLE].append((device_id, kind, name))
+                rows.append((timestamp, device_id) + tuple(row))
+            self.pending_rows += len(devices)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        # Flush once flush_rows rows are pending or flush_interval seconds
+        # have passed since the last flush
+        with self.lock:
+            due = (self.pending_rows >= self.flush_rows
+                   or time.monotonic() - self.last_flush_time >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def _update_rollups(self, table, timestamp, values):
+        columns = METRIC_TABLES[table]
+        sample = [values[columns.index(column)] for column in ROLLUP_COLUMNS[table]]
+        t = parse_timestamp(timestamp)
+        for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+            start = int(t // seconds) * seconds
+            bucket = self.rollup_buckets.get((table, resolution))
+            if bucket is not None and bucket.start != start:
+                self._write_rollup(table, resolution, bucket)
+                bucket = None
+            if bucket is None:
+                bucket = RollupBucket(start, len(sample))
+                self.rollup_buckets[(table, resolution)] = bucket
+            bucket.add(sample)
+
+    def _write_rollup(self, table, resolution, bucket):
+        self.write_buffer[rollup_table(table, resolution)].append(bucket.row())
+        self.pending_rows += 1
+
+    def flush(self):
+        """Write all buffered samples to the database in a single transaction."""
+        with self.lock:
+            self.last_flush_time = time.monotonic()
+            if self.pending_rows == 0 or self.conn is None:
+                return
+            batches = {table: rows for table, rows in self.write_buffer.items() if rows}
+
+            start = time.perf_counter()
+            try:
+                self.sinks[0].write(batches)
+            except sqlite3.Error as e:
+                # Keep the rows buffered so the next flush retries them
+                print("Error flushing metrics:", e)
+                return
+            self.last_flush_latency = time.perf_counter() - start
+            # The rows are in the session file; cleared before the other
+            # sinks run so that none of them can get the rows written twice
+            self.write_buffer = {table: [] for table in INSERT_COLUMNS}
+            self.pending_rows = 0
+            instruments.record("sqlite.commit", self.last_flush_latency)
+            self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+            self.flush_count += 1
+
+            if (self.raw_retention is not None
+                    and time.monotonic() - self.last_prune_time >= self.prune_interval):
+                self._prune_raw()
+
+        # Outside the lock, so samples logged meanwhile do not wait for the
+        # encoding and I/O of the other sinks
+        for sink in self.sinks[1:]:
+            try:
+                sink.write(batches)
+            except Exception as e:
+                print(f"Error writing metrics to {type(sink).__name__}:", e)
+
+    def _prune_raw(self):
+        # At most PRUNE_BATCH rows per table are deleted per pass; when there is
+        # more (e.g. the first pass over an old session) the next flush goes on.
+        # Freed pages are reused by new rows, so the file stops growing.
+        cutoff = format_timestamp(datetime.fromtimestamp(time.time() - self.raw_retention, timezone.utc))
+        finished = True
+        try:
+            with self.conn:
+                for table in list(METRIC_TABLES) + list(DEVICE_TABLES.values()) + [PROCESS_TABLE]:
+                    deleted = self.conn.execute(f"""
+                    DELETE FROM {table} WHERE rowid IN
+                        (SELECT rowid FROM {table} WHERE timestamp < ? LIMIT {PRUNE_BATCH})
+                    """, (cutoff,)).rowcount
+                    if deleted == PRUNE_BATCH:
+                        finished = False
+        except sqlite3.Error as e:
+            print("Error pruning old metrics:", e)
+        if finished:
+            self.last_prune_time = time.monotonic()
+
+    def get_write_stats(self):
+        """Return the current queue depth and flush latency figures (in seconds)."""
+        with self.lock:
+            return {
+                "queue_depth": self.pending_rows,
+                "last_flush_latency": self.last_flush_latency,
+                "max_flush_latency": self.max_flush_latency,
+                "flush_count": self.flush_count,
+            }
 
     def close(self):
         if self.conn:
+            # Write out the open rollup buckets and anything still buffered
+            # before finalizing the session
+            with self.lock:
+                for (table, resolution), bucket in self.rollup_buckets.items():
+                    self._write_rollup(table, resolution, bucket)
+                self.rollup_buckets = {}
+            self.flush()
+
             # Update end time (local time)
             end_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             cursor = self.conn.cursor()
@@ -147,6 +683,29 @@ class BackendLogger:
             """, (end_time_str,))
             self.conn.commit()
 
+            for sink in self.sinks:
+                sink.close()
+
+            info = None
+            if self.catalog is not None:
+                from session_catalog import scan_session
+                info = scan_session(self.conn)
             self.conn.close()
             self.conn = None
 
+            if self.catalog is not None:
+                # Recorded after closing, so the catalog holds the final file stat
+                try:
+                    self.catalog.record(self.db_path, info)
+                except sqlite3.Error as e:
+                    print("Error updating the session catalog:", e)
+                self.catalog.close()
+                self.catalog = None
+
+if __name__ == "__main__":
+    # Upgrade existing session files: python backend.py [db_dir]
+    import sys
+    db_directory = sys.argv[1] if len(sys.argv) > 1 else "db"
+    for f in sorted(os.listdir(db_directory)):
+        if f.endswith(".db"):
+            migrate_session(os.path.join(db_directory, f))
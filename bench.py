@@ -0,0 +1,445 @@
+"""Benchmarks of the collection, logging and plotting hot paths.
+
+Runs without a display (offscreen Qt platform) and without real sensors:
+psutil and NVML are replaced by fake sources that return plausible values, so
+results only depend on this code and the machine running it. Measures:
+
+    log     insert throughput and latency percentiles of every log_*_metrics
+            method of BackendLogger (flushes included, as in production)
+    tick    per-tick cost of every source: the source's sample and log, the
+            SystemMonitor update_*_metrics method and the redraw of its tab
+    viewer  time for OldDataViewer to show and to load every table of
+            synthetic 1 hour, 1 day and 1 week sessions, from the session
+            database and from its archive
+    procfs  per-sample cost of the sources that read /proc and /sys
+            directly (Linux), next to the same sources through psutil; this
+            one runs on the real machine, before the fakes are installed
+
+Results are written as JSON so runs can be compared over time.
+
+Example:
+    python bench.py --output bench.json
+    python bench.py --only log,tick --samples 2000
+    python bench.py --only procfs
+"""
+import argparse
+import collections
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+
+SESSION_LENGTHS = {"1h": 3600, "1d": 86400, "1w": 7 * 86400}
+FAKE_CORES = 16
+FAKE_FANS = 3
+FAKE_NICS = ("eth0", "eth1", "wlan0", "docker0")
+FAKE_DISKS = ("nvme0n1", "nvme1n1", "sda", "sdb")
+# Enough processes to show what the processes source costs on a busy machine
+FAKE_PROCESSES = 2000
+
+Fan = collections.namedtuple("Fan", "label current")
+Temp = collections.namedtuple("Temp", "label current high critical")
+Memory = collections.namedtuple("Memory", "total available percent used free")
+NetIO = collections.namedtuple("NetIO", "bytes_sent bytes_recv packets_sent packets_recv")
+DiskIO = collections.namedtuple("DiskIO", "read_count write_count read_bytes write_bytes")
+Partition = collections.namedtuple("Partition", "device mountpoint fstype opts")
+DiskUsage = collections.namedtuple("DiskUsage", "total used free percent")
+CpuTimes = collections.namedtuple("CpuTimes", "user system")
+MemInfo = collections.namedtuple("MemInfo", "rss vms")
+ProcIO = collections.namedtuple("ProcIO", "read_count write_count read_bytes write_bytes")
+
+class FakeAccessDenied(Exception):
+    pass
+
+class FakeNoSuchProcess(Exception):
+    pass
+
+class FakeProcess:
+    """A process of FakePsutil; every fourth one belongs to another user and hides its I/O."""
+
+    def __init__(self, pid, random_source):
+        self.pid = pid
+        self.random = random_source
+        self.info = {"name": f"proc{pid}", "create_time": 1000.0 + pid,
+                     "cpu_times": CpuTimes(0.0, 0.0), "memory_info": MemInfo(0, 0)}
+        self.io = [0, 0]
+
+    def advance(self):
+        user, system = self.info["cpu_times"]
+        self.info["cpu_times"] = CpuTimes(user + self.random.uniform(0, 0.05), system)
+        self.info["memory_info"] = MemInfo(self.random.randrange(10 ** 9), 0)
+        self.io[0] += self.random.randrange(10 ** 5)
+        self.io[1] += self.random.randrange(10 ** 5)
+
+    def io_counters(self):
+        if self.pid % 4 == 0:
+            raise FakeAccessDenied()
+        return ProcIO(0, 0, *self.io)
+
+class FakePsutil:
+    """Stands in for the psutil functions the monitor calls, with random but plausible values."""
+    AccessDenied = FakeAccessDenied
+    NoSuchProcess = FakeNoSuchProcess
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.net = {nic: [0, 0] for nic in FAKE_NICS}
+        self.disk = {disk: [0, 0] for disk in FAKE_DISKS}
+        self.processes = [FakeProcess(pid, self.random) for pid in range(1, FAKE_PROCESSES + 1)]
+
+    def cpu_count(self, logical=True):
+        return FAKE_CORES if logical else FAKE_CORES // 2
+
+    def cpu_percent(self, interval=None, percpu=False):
+        values = [self.random.uniform(0, 100) for _ in range(FAKE_CORES)]
+        return values if percpu else sum(values) / len(values)
+
+    def sensors_temperatures(self):
+        return {"k10temp": [Temp("Tctl", 50.0, None, None),
+                            Temp("Tccd1", self.random.uniform(40, 80), None, None)]}
+
+    def sensors_fans(self):
+        return {"it8689": [Fan(f"fan{i}", self.random.uniform(800, 1500)) for i in range(FAKE_FANS)]}
+
+    def virtual_memory(self):
+        total = 32 * 1024 ** 3
+        percent = self.random.uniform(30, 70)
+        used = int(total * percent / 100)
+        return Memory(total, total - used, percent, used, total - used)
+
+    def net_io_counters(self, pernic=False, nowrap=True):
+        for counters in self.net.values():
+            counters[0] += self.random.randrange(10 ** 6)
+            counters[1] += self.random.randrange(10 ** 7)
+        nics = {nic: NetIO(sent, recv, 0, 0) for nic, (sent, recv) in self.net.items()}
+        return nics if pernic else NetIO(*(sum(values) for values in zip(*nics.values())))
+
+    def disk_io_counters(self, perdisk=False, nowrap=True):
+        for counters in self.disk.values():
+            counters[0] += self.random.randrange(10 ** 7)
+            counters[1] += self.random.randrange(10 ** 7)
+        disks = {disk: DiskIO(0, 0, read, write) for disk, (read, write) in self.disk.items()}
+        return disks if perdisk else DiskIO(*(sum(values) for values in zip(*disks.values())))
+
+    def pids(self):
+        return [proc.pid for proc in self.processes]
+
+    def process_iter(self, attrs=None, ad_value=None):
+        for proc in self.processes:
+            proc.advance()
+            yield proc
+
+    def boot_time(self):
+        return time.time() - 86400
+
+    # Static details shown when the tabs are built
+
+    def net_if_addrs(self):
+        return {"eth0": [], "lo": []}
+
+    def disk_partitions(self):
+        return [Partition("/dev/sda1", "/", "ext4", "rw")]
+
+    def disk_usage(self, path):
+        return DiskUsage(500 * 1024 ** 3, 200 * 1024 ** 3, 300 * 1024 ** 3, 40.0)
+
+class FakeNVML:
+    """Stands in for the pynvml calls of the GPU sampler."""
+    NVML_TEMPERATURE_GPU = 0
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+
+    def nvmlInit(self):
+        pass
+
+    def nvmlDeviceGetHandleByIndex(self, index):
+        return object()
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        return collections.namedtuple("Utilization", "gpu memory")(self.random.randrange(100), 0)
+
+    def nvmlDeviceGetMemoryInfo(self, handle):
+        total = 8 * 1024 ** 3
+        used = self.random.randrange(total)
+        return collections.namedtuple("MemoryInfo", "total used free")(total, used, total - used)
+
+    def nvmlDeviceGetTemperature(self, handle, sensor):
+        return self.random.randrange(40, 85)
+
+    def nvmlDeviceGetFanSpeed(self, handle):
+        return self.random.randrange(100)
+
+    def nvmlDeviceGetName(self, handle):
+        return "Fake GPU"
+
+def install_fakes():
+    """Point the metric sources (and the GUI, once imported) at the fake psutil and NVML."""
+    import procfs
+    import sources
+    fake = FakePsutil()
+    sources.psutil = fake
+    sources.pynvml = FakeNVML()
+    # Direct reads of the real /proc would bypass the fakes
+    procfs.AVAILABLE = False
+    import gui
+    gui.psutil = fake
+
+def summarize(durations_ns):
+    """Throughput and latency percentiles (microseconds) of a list of call durations."""
+    d = np.asarray(durations_ns, dtype=np.float64) / 1000.0
+    return {
+        "calls": len(d),
+        "calls_per_s": len(d) / (d.sum() / 1e6) if d.sum() else None,
+        "mean_us": float(d.mean()),
+        "p50_us": float(np.percentile(d, 50)),
+        "p99_us": float(np.percentile(d, 99)),
+        "max_us": float(d.max()),
+    }
+
+def timestamps(count, start=None):
+    from backend import format_timestamp
+    start = start or datetime.now(timezone.utc) - timedelta(seconds=count)
+    return [format_timestamp(start + timedelta(seconds=i)) for i in range(count)]
+
+def bench_log(work_dir, samples):
+    """Per-call cost of every log_*_metrics method, with the default flush policy."""
+    from backend import BackendLogger
+    fake = FakePsutil(1)
+    calls = {
+        "log_cpu_metrics": lambda b, ts: b.log_cpu_metrics(
+            fake.cpu_percent(percpu=True), 55.0, [1000.0] * FAKE_FANS, timestamp=ts),
+        "log_gpu_metrics": lambda b, ts: b.log_gpu_metrics(50, 2048.0, 60, 40, timestamp=ts),
+        "log_ram_metrics": lambda b, ts: b.log_ram_metrics(48.5, timestamp=ts),
+        "log_network_metrics": lambda b, ts: b.log_network_metrics(120.0, 15.0, timestamp=ts, sample_interval=1.0),
+        "log_disk_metrics": lambda b, ts: b.log_disk_metrics(300.0, 80.0, timestamp=ts, sample_interval=1.0),
+        "log_network_device_metrics": lambda b, ts: b.log_network_device_metrics(
+            FAKE_NICS, [(120.0, 15.0)] * len(FAKE_NICS), timestamp=ts),
+        "log_disk_device_metrics": lambda b, ts: b.log_disk_device_metrics(
+            FAKE_DISKS, [(300.0, 80.0)] * len(FAKE_DISKS), timestamp=ts),
+        "log_process_top": lambda b, ts: b.log_process_top(
+            [(pid, f"proc{pid}", 12.5, 300.0, 40.0, 8.0) for pid in range(1, 31)], timestamp=ts),
+    }
+    results = {}
+    for name, call in calls.items():
+        base_dir = os.path.join(work_dir, "log", name)
+        os.makedirs(base_dir, exist_ok=True)
+        logger = BackendLogger(base_dir=base_dir + os.sep)
+        stamps = timestamps(samples)
+        durations = []
+        for ts in stamps:
+            start = time.perf_counter_ns()
+            call(logger, ts)
+            durations.append(time.perf_counter_ns() - start)
+        start = time.perf_counter_ns()
+        logger.close()
+        result = summarize(durations)
+        result["close_us"] = (time.perf_counter_ns() - start) / 1000.0
+        result["flushes"] = logger.flush_count
+        result["max_flush_ms"] = logger.max_flush_latency * 1000.0
+        results[name] = result
+    return results
+
+def bench_tick(app, work_dir, samples):
+    """Per-tick cost of every source: sample and log, update_*_metrics and redraw of its tab."""
+    import gui
+    from backend import BackendLogger, format_timestamp
+
+    class BenchMonitor(gui.SystemMonitor):
+        # Nothing is sampled in the background; the benchmark drives the ticks
+        def start_timers(self):
+            pass
+
+    monitor = BenchMonitor()
+    monitor.show()
+    collector = monitor.collector
+    os.makedirs(os.path.join(work_dir, "tick"), exist_ok=True)
+    collector.backend = BackendLogger(base_dir=os.path.join(work_dir, "tick") + os.sep)
+    tabs = {source: (tab, draw) for tab, (source, draw) in monitor.tab_draws.items()}
+    results = {}
+    for name, source in collector.sources.items():
+        # Sources without a tab of their own (temps, fans) are only sampled and stored
+        tab, draw = tabs.get(name, (None, None))
+        if tab is not None:
+            monitor.tabs.setCurrentWidget(tab)
+            app.processEvents()
+        update = monitor.sample_handlers.get(name)
+        sample_ns, update_ns, draw_ns = [], [], []
+        for _ in range(samples):
+            ts = format_timestamp()
+            # As MetricsCollector.tick does for every source that is due
+            start = time.perf_counter_ns()
+            sample = collector.latest[name] = source.sample(1.0)
+            source.log(collector.backend, ts, sample, collector.latest)
+            sample_ns.append(time.perf_counter_ns() - start)
+            # As SystemMonitor.on_sample does for every source of a snapshot
+            start = time.perf_counter_ns()
+            if update is not None:
+                update(sample)
+            monitor.latest_samples[name] = sample
+            update_ns.append(time.perf_counter_ns() - start)
+            if draw is not None:
+                start = time.perf_counter_ns()
+                draw()
+                draw_ns.append(time.perf_counter_ns() - start)
+        results[name] = {
+            "cost": source.cost,
+            "sample": summarize(sample_ns),
+            "update": summarize(update_ns),
+        }
+        if draw_ns:
+            results[name]["draw"] = summarize(draw_ns)
+    collector.backend.close()
+    monitor.close()
+    return results
+
+def make_session(path, seconds):
+    """Write a synthetic session of seconds 1 Hz samples of every table to path."""
+    from backend import BackendLogger
+    base_dir = os.path.dirname(path) + os.sep
+    logger = BackendLogger(base_dir=base_dir, flush_rows=50000, flush_interval=1e9)
+    fake, nvml = FakePsutil(2), FakeNVML(2)
+    rng = np.random.default_rng(2)
+    start = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+    for i, ts in enumerate(timestamps(seconds, start)):
+        logger.log_cpu_metrics(fake.cpu_percent(percpu=True), 40 + 20 * fake.random.random(),
+                               [fan.current for fan in next(iter(fake.sensors_fans().values()))], timestamp=ts)
+        logger.log_gpu_metrics(nvml.nvmlDeviceGetUtilizationRates(None).gpu, 2048.0,
+                               nvml.nvmlDeviceGetTemperature(None, 0), nvml.nvmlDeviceGetFanSpeed(None), timestamp=ts)
+        logger.log_ram_metrics(fake.virtual_memory().percent, timestamp=ts)
+        logger.log_network_metrics(fake.random.uniform(0, 1000), fake.random.uniform(0, 100), timestamp=ts,
+                                   sample_interval=1.0)
+        logger.log_disk_metrics(fake.random.uniform(0, 5000), fake.random.uniform(0, 2000), timestamp=ts,
+                                sample_interval=1.0)
+        logger.log_network_device_metrics(FAKE_NICS, rng.uniform(0, 1000, (len(FAKE_NICS), 2)), timestamp=ts)
+        logger.log_disk_device_metrics(FAKE_DISKS, rng.uniform(0, 5000, (len(FAKE_DISKS), 2)), timestamp=ts)
+    logger.close()
+    os.replace(logger.db_path, path)
+
+def open_viewer(app, path):
+    """(seconds until the viewer is shown, seconds until every table is loaded)."""
+    from old_data_viewer import OldDataViewer
+    start = time.perf_counter()
+    viewer = OldDataViewer(path)
+    viewer.show()
+    app.processEvents()
+    shown = time.perf_counter() - start
+    while len(viewer.payloads) < len(viewer.tab_pages):
+        app.processEvents()
+        time.sleep(0.001)
+    loaded = time.perf_counter() - start
+    viewer.close()
+    return shown, loaded
+
+def bench_viewer(app, work_dir, lengths, repeat):
+    """Open time of OldDataViewer for synthetic sessions, as a database and as an archive."""
+    from archive import archive_session
+    session_dir = os.path.join(work_dir, "sessions")
+    os.makedirs(session_dir, exist_ok=True)
+    results = {}
+    for name in lengths:
+        db_path = os.path.join(session_dir, f"bench_{name}.db")
+        if not os.path.exists(db_path):
+            # Generated sessions are kept in work_dir and reused by later runs
+            print(f"Generating a {name} session...", file=sys.stderr, flush=True)
+            make_session(db_path, SESSION_LENGTHS[name])
+        archive_path = archive_session(db_path)
+        results[name] = {"db_size": os.path.getsize(db_path), "archive_size": os.path.getsize(archive_path)}
+        for kind, path in (("db", db_path), ("archive", archive_path)):
+            runs = [open_viewer(app, path) for _ in range(repeat)]
+            results[name][kind] = {
+                "shown_s": min(run[0] for run in runs),
+                "loaded_s": min(run[1] for run in runs),
+            }
+    return results
+
+# Sources with a /proc or /sys fast path
+PROCFS_SOURCES = ("cpu", "temps", "fans", "ram", "network", "disk")
+
+def bench_procfs(samples):
+    """Per-sample cost of every source with a fast path, through psutil and through procfs."""
+    import procfs
+    from sources import discover_sources
+    if not procfs.AVAILABLE:
+        return {"available": False}
+    results = {}
+    for path in ("psutil", "procfs"):
+        found = discover_sources(PROCFS_SOURCES, procfs=path == "procfs")
+        for name, source in found.items():
+            durations = []
+            for _ in range(samples):
+                start = time.perf_counter_ns()
+                source.sample(1.0)
+                durations.append(time.perf_counter_ns() - start)
+            results.setdefault(name, {})[path] = summarize(durations)
+    tick = {"psutil": 0.0, "procfs": 0.0}
+    for name, paths in results.items():
+        if len(paths) == 2:
+            paths["speedup"] = paths["psutil"]["mean_us"] / paths["procfs"]["mean_us"]
+            for path in tick:
+                tick[path] += paths[path]["mean_us"]
+    # All fast-path sources sampled on one tick
+    results["tick_us"] = tick
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark logging, per-tick and viewer hot paths.")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write (default: bench_results.json)")
+    parser.add_argument("--only", default="log,tick,viewer,procfs", help="comma-separated benchmarks to run")
+    parser.add_argument("--samples", type=int, default=5000, help="calls per log/tick benchmark (default: 5000)")
+    parser.add_argument("--sessions", default=",".join(SESSION_LENGTHS),
+                        help=f"synthetic session lengths for the viewer benchmark (default: {','.join(SESSION_LENGTHS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="viewer opens per session, best is kept (default: 3)")
+    parser.add_argument("--work-dir", default=None,
+                        help="where databases are written; keep it to reuse generated sessions (default: a temp dir)")
+    args = parser.parse_args(argv)
+    only = {name.strip() for name in args.only.split(",") if name.strip()}
+    lengths = [name.strip() for name in args.sessions.split(",") if name.strip()]
+    unknown = [name for name in lengths if name not in SESSION_LENGTHS]
+    if unknown:
+        parser.error(f"unknown session lengths: {', '.join(unknown)}")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="pc-monitor-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+
+    report = {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "samples": args.samples,
+        "results": {},
+    }
+    # The benchmarks sample back to back; without this the sources of rates
+    # would skip every read as too soon after the previous one
+    import sources
+    sources.MIN_CPU_INTERVAL = 0.0
+    if "procfs" in only:
+        report["results"]["procfs"] = bench_procfs(args.samples)
+
+    install_fakes()
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    if "log" in only:
+        report["results"]["log"] = bench_log(work_dir, args.samples)
+    if "tick" in only:
+        report["results"]["tick"] = bench_tick(app, work_dir, args.samples)
+    if "viewer" in only:
+        report["results"]["viewer"] = bench_viewer(app, work_dir, lengths, args.repeat)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
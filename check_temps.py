@@ -1,24 +1,15 @@
 import sys
 import time
-import psutil
 import pyqtgraph as pg
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QTabWidget, QVBoxLayout, QLabel, QGridLayout
 )
 from PyQt5.QtCore import QTimer
+from sources import discover_sources
 
-# Initialize NVML for GPU metrics
-try:
-    import pynvml
-    pynvml.nvmlInit()
-    NVML_AVAILABLE = True
-    gpu_handle = pynvml.nvmlDeviceGetHandleByIndex(0)  # Assuming a single GPU
-except ImportError:
-    NVML_AVAILABLE = False
-    print("pynvml library not found. GPU temperature monitoring is unavailable.")
-except pynvml.NVMLError:
-    NVML_AVAILABLE = False
-    print("NVIDIA GPU not found. GPU temperature monitoring is unavailable.")
+# The CPU temperature sensor and the GPU are looked up once, as in the monitor
+SOURCES = discover_sources(["temps", "gpu"])
+NVML_AVAILABLE = "gpu" in SOURCES
 
 PLOT_LENGTH = 60  # Number of data points to display in the graph
 
@@ -83,9 +74,8 @@ class SystemMonitor(QWidget):
             self.gpu_temp_timer.start(1000)  # Update every 1 second
 
     def update_cpu_temperature(self):
-        temps = psutil.sensors_temperatures()
-        if 'coretemp' in temps:
-            cpu_temp = temps['coretemp'][0].current
+        if "temps" in SOURCES:
+            cpu_temp = SOURCES["temps"].sample(1.0)["cpu_temp"]
             self.cpu_temp_data.append(cpu_temp)
             if len(self.cpu_temp_data) > PLOT_LENGTH:
                 self.cpu_temp_data.pop(0)
@@ -95,7 +85,7 @@ class SystemMonitor(QWidget):
 
     def update_gpu_temperature(self):
         if NVML_AVAILABLE:
-            gpu_temp = pynvml.nvmlDeviceGetTemperature(gpu_handle, pynvml.NVML_TEMPERATURE_GPU)
+            gpu_temp = SOURCES["gpu"].sample(1.0)["gpu_temp"]
             self.gpu_temp_data.append(gpu_temp)
             if len(self.gpu_temp_data) > PLOT_LENGTH:
                 self.gpu_temp_data.pop(0)
@@ -0,0 +1,135 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from backend import BackendLogger, format_timestamp
+from instrumentation import instruments
+from sources import default_rates, discover_sources
+
+class MetricsCollector(threading.Thread):
+    """Samples the metric sources (sources.py) on a background thread and logs them to the database.
+
+    All sources are driven by one base tick. A source sampled at a lower rate than
+    the fastest one is read every Nth tick, so rates are multiples of the base tick.
+    Each tick produces one snapshot dict that is handed to on_sample:
+
+        {"timestamp": "2024-12-18 22:12:18.250", "monotonic": 1234.25,
+         "cpu": {...}, "ram": {...}, ...}
+
+    Only the sources that were due on that tick and had a sample to report
+    (see MetricSource.sample) are present, and only sources found on this
+    machine are ever sampled; one that raises is disabled. Every source in a
+    snapshot shares the same timestamp, which is also the one
+    written to the database. on_sample runs on the collector thread, so GUI
+    code should pass something thread-safe such as a Qt signal's emit.
+    """
+
+    def __init__(self, on_sample=None, rates=None, base_tick=None, base_dir="./db/", flush_interval=5.0,
+                 raw_retention=None, log_overhead=False, source_options=None, sinks=None):
+        super().__init__(name="MetricsCollector", daemon=True)
+        self.on_sample = on_sample
+        self.base_dir = base_dir
+        self.flush_interval = flush_interval
+        self.raw_retention = raw_retention
+        # Extra sinks of the logger besides the session file (see backend.Sink)
+        self.sinks = sinks
+        self.stop_event = threading.Event()
+        self.backend = None
+
+        self.rates = default_rates()
+        if rates:
+            self.rates.update(rates)
+
+        # Sensors are looked up once; sources missing on this machine are
+        # never scheduled (see sources.py). log_overhead makes the overhead
+        # source also write to the overhead_metrics table.
+        options = dict(source_options or {}, log_overhead=log_overhead)
+        wanted = [name for name, rate in self.rates.items() if rate and rate > 0]
+        self.sources = discover_sources(wanted, **options)
+        # Why each source was dropped after failing while running
+        self.disabled = {}
+
+        # The base tick defaults to the period of the fastest source
+        present = [self.rates[name] for name in self.sources] or [1.0]
+        self.base_tick = base_tick or 1.0 / max(present)
+        self.schedule = []
+        for name, source in self.sources.items():
+            every = max(1, round(1.0 / (self.rates[name] * self.base_tick)))
+            self.schedule.append((name, every, source))
+        self.tick_count = 0
+        # The most recent sample of every source
+        self.latest = {}
+
+    def run(self):
+        # The logger is created here so its connection belongs to this thread
+        self.backend = BackendLogger(base_dir=self.base_dir, flush_interval=self.flush_interval,
+                                     raw_retention=self.raw_retention, sinks=self.sinks)
+
+        # Wall-clock timestamps are derived from the monotonic clock so they
+        # never jump backwards when the system time is adjusted
+        self.start_monotonic = time.monotonic()
+        self.start_wall = datetime.now(timezone.utc)
+        # The monitor's own CPU use is measured from here, not from startup
+        instruments.start_cpu_measurement()
+        try:
+            next_tick = self.start_monotonic
+            while not self.stop_event.is_set():
+                instruments.record("tick.lateness", time.monotonic() - next_tick)
+                with instruments.timed("tick"):
+                    self.tick()
+                next_tick += self.base_tick
+                now = time.monotonic()
+                if next_tick < now:
+                    # Fell behind (e.g. a slow sensor read); skip the missed
+                    # ticks instead of firing them back to back
+                    instruments.count("late_ticks")
+                    instruments.count("skipped_ticks", int((now - next_tick) // self.base_tick))
+                    next_tick = now
+                self.stop_event.wait(next_tick - now)
+        finally:
+            self.backend.close()
+
+    def stop(self):
+        """Stop sampling and wait for the logger to be closed."""
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def tick(self):
+        """Sample every source that is due on this tick into one snapshot and log it."""
+        monotonic = time.monotonic()
+        timestamp = format_timestamp(self.start_wall + timedelta(seconds=monotonic - self.start_monotonic))
+        snapshot = {"timestamp": timestamp, "monotonic": monotonic}
+
+        due = []
+        for name, every, source in self.schedule:
+            if self.tick_count % every:
+                continue
+            try:
+                with instruments.timed(f"sample.{name}"):
+                    sample = source.sample(every * self.base_tick)
+            except Exception as e:
+                self.disable(name, e)
+                continue
+            if sample is None:
+                # Too soon after the previous sample to report anything
+                continue
+            snapshot[name] = self.latest[name] = sample
+            due.append(source)
+        # Logged once every source has been read, so a table can combine
+        # several sources of the same tick
+        for source in due:
+            try:
+                source.log(self.backend, timestamp, snapshot[source.name], self.latest)
+            except Exception as e:
+                print(f"Error logging {source.name}:", e)
+        self.tick_count += 1
+
+        if self.on_sample is not None:
+            self.on_sample(snapshot)
+        return snapshot
+
+    def disable(self, name, error):
+        """Take a failing source out of the schedule for the rest of the session."""
+        print(f"Error sampling {name}, disabling it:", error)
+        self.disabled[name] = str(error)
+        self.schedule = [entry for entry in self.schedule if entry[0] != name]
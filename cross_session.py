@@ -0,0 +1,159 @@
+"""Range queries across every session database in a directory.
+
+Each recording is its own db/YYYY-MM-DD_HH-MM-SS.db file. SessionSet answers
+questions such as "CPU temperature over the last 30 days" by touching only the
+files that overlap the requested range, and streams their rows back as one
+time-ordered sequence.
+
+Example:
+    python cross_session.py cpu_metrics cpu_temp --days 30 --resolution 1h > cpu_temp.csv
+"""
+import heapq
+import itertools
+import os
+import time
+from archive import ARCHIVE_SUFFIX, ArchiveReader
+from backend import ROLLUP_RESOLUTIONS, rollup_table
+from session_catalog import SessionCatalog
+from session_query import SERIES, EPOCH_EXPR, get_rollups, open_session, range_clause, series_expr
+
+class SessionSet:
+    """All session databases of a directory, queried as one time series store.
+
+    Which files overlap a range is looked up in the directory's session
+    catalog (session_catalog.py), so only those files are ever opened.
+    """
+
+    def __init__(self, db_dir="db"):
+        self.db_dir = db_dir
+        self.catalog = SessionCatalog(db_dir)
+
+    def close(self):
+        self.catalog.close()
+
+    def files_for_range(self, table, start, end):
+        """[(path, (first, last))] of the files with samples of table in [start, end], by first sample."""
+        self.catalog.refresh()
+        bounds_by_file = self.catalog.table_bounds(table)
+        # A session archived without removing its database is read from the archive
+        archived = {os.path.splitext(filename)[0] for filename in bounds_by_file
+                    if filename.endswith(ARCHIVE_SUFFIX)}
+        matches = [(os.path.join(self.db_dir, filename), bounds)
+                   for filename, bounds in bounds_by_file.items()
+                   if bounds[1] >= start and bounds[0] <= end
+                   and not (filename.endswith(".db") and filename[:-3] in archived)]
+        matches.sort(key=lambda match: match[1][0])
+        return matches
+
+    def query_range(self, table, columns, start, end, resolution=None, batch_size=1000):
+        """Stream (time, value, ...) rows of columns of table in [start, end] over all sessions.
+
+        Rows come back ordered by time. With resolution set to one of the
+        rollup resolutions ("10s", "1m", "1h"), the bucket averages of the
+        rollup tables are returned instead of raw samples, which is far less
+        data for long ranges.
+
+        Sessions normally follow each other, so files are read one after the
+        other; only files whose time ranges overlap (e.g. a headless and a GUI
+        recording at once) are merged, and only those are open together.
+        """
+        if resolution is not None and resolution not in ROLLUP_RESOLUTIONS:
+            raise ValueError(f"unknown resolution: {resolution}")
+        files = self.files_for_range(table, start, end)
+
+        # Group files with overlapping time ranges
+        groups = []
+        group_end = None
+        for path, (first, last) in files:
+            if groups and first <= group_end:
+                groups[-1].append(path)
+                group_end = max(group_end, last)
+            else:
+                groups.append([path])
+                group_end = last
+
+        streams = (
+            heapq.merge(*(self._read_file(path, table, columns, start, end, resolution, batch_size)
+                          for path in group), key=lambda row: row[0])
+            if len(group) > 1 else
+            self._read_file(group[0], table, columns, start, end, resolution, batch_size)
+            for group in groups
+        )
+        return itertools.chain.from_iterable(streams)
+
+    def _read_file(self, path, table, columns, start, end, resolution, batch_size):
+        if path.endswith(ARCHIVE_SUFFIX):
+            reader = ArchiveReader(path)
+            try:
+                yield from reader.iter_rows(table, columns, start, end, resolution, batch_size)
+            finally:
+                reader.close()
+            return
+        # Read-only: the files may be older versions or still being recorded,
+        # and are never upgraded here (see backend.migrate_session)
+        conn = open_session(path)
+        try:
+            where, params = range_clause(start, end)
+            if resolution is None:
+                source = table
+                exprs = [series_expr(conn, table, column) for column in columns]
+            elif rollup_table(table, resolution) in dict(get_rollups(conn, table)):
+                source = rollup_table(table, resolution)
+                exprs = [f"{column}_avg" for column in columns]
+            else:
+                source = None
+            if source is not None:
+                query = f"""
+                SELECT t, {", ".join(f"c{i}" for i in range(len(exprs)))}
+                FROM (SELECT {EPOCH_EXPR} AS t, {", ".join(f"{expr} AS c{i}" for i, expr in enumerate(exprs))}
+                      FROM {source} WHERE {where} ORDER BY timestamp)
+                WHERE t >= ? AND t <= ?
+                """
+            else:
+                # No rollups in this file (recorded before they existed): the
+                # raw rows are averaged into the buckets rebuild_rollups would
+                # write, keyed by their start like the rollup rows
+                seconds = ROLLUP_RESOLUTIONS[resolution]
+                exprs = [series_expr(conn, table, column) for column in columns]
+                where, params = range_clause(start, end + seconds)
+                query = f"""
+                SELECT (CAST(strftime('%s', timestamp) AS INTEGER) / {seconds}) * {seconds} AS t,
+                       {", ".join(f"AVG({expr})" for expr in exprs)}
+                FROM {table} WHERE {where}
+                GROUP BY t HAVING t >= ? AND t <= ? ORDER BY t
+                """
+            cursor = conn.execute(query, params + (start, end))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+def main(argv=None):
+    import argparse
+    import csv
+    import sys
+    parser = argparse.ArgumentParser(description="Print a metric over all recorded sessions as CSV.")
+    parser.add_argument("table", choices=sorted(SERIES))
+    parser.add_argument("columns", nargs="+")
+    parser.add_argument("--db-dir", default="db")
+    parser.add_argument("--days", type=float, default=1.0, help="how far back to go (default: 1)")
+    parser.add_argument("--resolution", choices=list(ROLLUP_RESOLUTIONS), default=None,
+                        help="read rollup averages instead of raw samples")
+    args = parser.parse_args(argv)
+    unknown = [column for column in args.columns if column not in SERIES[args.table]]
+    if unknown:
+        parser.error(f"unknown columns for {args.table}: {', '.join(unknown)}")
+
+    end = time.time()
+    start = end - args.days * 86400
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["epoch_seconds"] + args.columns)
+    for row in SessionSet(args.db_dir).query_range(args.table, args.columns, start, end, args.resolution):
+        writer.writerow(row)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
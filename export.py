@@ -0,0 +1,309 @@
+"""Streaming export of recorded metrics to CSV, a columnar binary format or line protocol.
+
+A source is one session (.db, or a .pcarc archive) or a directory of
+sessions, optionally narrowed to a time range; a directory is read through
+cross_session.SessionSet, so a range spanning several recordings comes out
+as one series. Every table is read and written EXPORT_CHUNK_ROWS rows at a
+time, so memory use stays flat whatever the size of the session. Each table
+goes to its own file in the output directory:
+
+    csv       <table>.csv: epoch_seconds and one column per series
+    columnar  <table>.pccol: row groups of one block per column, like the
+              archive columns (delta-encoded int64 millisecond times,
+              byte-shuffled and zlib-compressed float64 values), with the
+              row count and min/max of every column of a group in the JSON
+              index at the end; read back with iter_columnar()
+    line      <table>.lp: InfluxDB line protocol, the table as measurement,
+              --tag values as tags and nanosecond timestamps
+
+Example:
+    python export.py db/2024-12-18_22-12-18.db --format csv --output export/
+    python export.py db --start "2024-12-18 00:00" --end "2024-12-19 00:00" --format line --tag host=desk
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime
+import numpy as np
+from archive import ARCHIVE_SUFFIX, HEADER, ArchiveReader, encode_column, decode_column
+from cross_session import SessionSet
+from session_query import SERIES, EPOCH_EXPR, open_session, range_clause, series_expr, get_time_bounds
+
+EXPORT_MAGIC = b"PCMEXP\x00\x01"
+EXPORT_FORMAT_VERSION = 1
+EXPORT_CHUNK_ROWS = 65536
+
+def iter_chunks(source, table, columns, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """(times, values) of at most chunk_rows rows of columns of table, in time order.
+
+    times are epoch seconds and values a float64 array with one column per
+    series (NaN where a value is missing). start and end (epoch seconds)
+    are both optional.
+    """
+    if os.path.isdir(source):
+        yield from _iter_session_set(source, table, columns, start, end, chunk_rows)
+    elif source.endswith(ARCHIVE_SUFFIX):
+        yield from _iter_archive(source, table, columns, start, end, chunk_rows)
+    else:
+        yield from _iter_database(source, table, columns, start, end, chunk_rows)
+
+def _iter_database(path, table, columns, start, end, chunk_rows):
+    conn = open_session(path)
+    try:
+        where, params = "1", ()
+        if start is not None or end is not None:
+            bounds = get_time_bounds(conn, table)
+            if bounds is None:
+                return
+            start = bounds[0] if start is None else start
+            end = bounds[1] if end is None else end
+            where, params = range_clause(start, end)
+            where += f" AND {EPOCH_EXPR} BETWEEN ? AND ?"
+            params += (start, end)
+        exprs = [series_expr(conn, table, column) for column in columns]
+        # Rows stream off the timestamp index; one chunk of tuples is alive at a time
+        cursor = conn.execute(f"""
+        SELECT {EPOCH_EXPR}, {", ".join(exprs)} FROM {table} WHERE {where} ORDER BY timestamp
+        """, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            block = np.array(rows, dtype=np.float64).reshape(len(rows), 1 + len(columns))
+            yield block[:, 0], block[:, 1:]
+    finally:
+        conn.close()
+
+def _iter_archive(path, table, columns, start, end, chunk_rows):
+    reader = ArchiveReader(path)
+    try:
+        if reader.rows(table) == 0:
+            return
+        times = reader.times(table)
+        lo = np.searchsorted(times, start, side="left") if start is not None else 0
+        hi = np.searchsorted(times, end, side="right") if end is not None else len(times)
+        series = [reader.column(table, column) for column in columns]
+        for i in range(lo, hi, chunk_rows):
+            j = min(i + chunk_rows, hi)
+            values = np.empty((j - i, len(columns)), dtype=np.float64)
+            for k, column in enumerate(series):
+                values[:, k] = column[i:j]
+            yield times[i:j], values
+    finally:
+        reader.close()
+
+def _iter_session_set(db_dir, table, columns, start, end, chunk_rows):
+    sessions = SessionSet(db_dir)
+    try:
+        rows = sessions.query_range(table, columns, 0.0 if start is None else start,
+                                    time.time() if end is None else end, batch_size=chunk_rows)
+        while True:
+            chunk = [row for _, row in zip(range(chunk_rows), rows)]
+            if not chunk:
+                break
+            block = np.array(chunk, dtype=np.float64).reshape(len(chunk), 1 + len(columns))
+            yield block[:, 0], block[:, 1:]
+    finally:
+        sessions.close()
+
+class CsvWriter:
+    suffix = ".csv"
+
+    def __init__(self, path, table, columns, tags=None):
+        self.path = path
+        self.file = open(path, "w", newline="")
+        self.file.write(",".join(["epoch_seconds"] + list(columns)) + "\n")
+        self.format = ",".join(["%.3f"] + ["%.10g"] * len(columns))
+
+    def write(self, times, values):
+        np.savetxt(self.file, np.column_stack((times, values)), fmt=self.format)
+
+    def close(self):
+        self.file.close()
+
+    def abort(self):
+        """Close and delete a file left incomplete by an error."""
+        self.file.close()
+        os.remove(self.path)
+
+class LineProtocolWriter:
+    suffix = ".lp"
+
+    def __init__(self, path, table, columns, tags=None):
+        self.path = path
+        self.file = open(path, "w")
+        self.columns = list(columns)
+        # Commas, spaces and equal signs in tags are escaped
+        escape = lambda text: str(text).replace(",", "\\,").replace(" ", "\\ ").replace("=", "\\=")
+        self.prefix = escape(table) + "".join(f",{escape(key)}={escape(value)}"
+                                              for key, value in sorted((tags or {}).items()))
+
+    def write(self, times, values):
+        # Whole milliseconds, as stored, so the nanoseconds are exact
+        stamps = (np.round(times * 1000.0).astype(np.int64) * 1000000).tolist()
+        lines = []
+        for stamp, row in zip(stamps, values.tolist()):
+            # Missing values (NaN) are left out; a row without any is skipped
+            fields = ",".join(f"{column}={value!r}" for column, value in zip(self.columns, row) if value == value)
+            if fields:
+                lines.append(f"{self.prefix} {fields} {stamp}\n")
+        self.file.write("".join(lines))
+
+    def close(self):
+        self.file.close()
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.path)
+
+class ColumnarWriter:
+    suffix = ".pccol"
+
+    def __init__(self, path, table, columns, tags=None, level=6):
+        self.path = path
+        self.file = open(path + ".tmp", "wb")
+        self.columns = list(columns)
+        self.level = level
+        self.index = {"format": EXPORT_FORMAT_VERSION, "table": table, "columns": ["time"] + self.columns,
+                      "tags": tags or {}, "rows": 0, "row_groups": []}
+        self.file.write(HEADER.pack(EXPORT_MAGIC, 0, 0))
+
+    def write(self, times, values):
+        arrays = {"time": np.round(times * 1000.0).astype(np.int64)}
+        for k, column in enumerate(self.columns):
+            arrays[column] = np.ascontiguousarray(values[:, k])
+        group = {"rows": len(times), "columns": {}}
+        for column, array in arrays.items():
+            data, encoding = encode_column(array, "zlib", self.level)
+            self.file.write(b"\0" * (-self.file.tell() % 8))
+            meta = {"offset": self.file.tell(), "length": len(data), "dtype": array.dtype.str,
+                    "shape": list(array.shape), "codec": "zlib", "encoding": encoding}
+            # Statistics let readers skip row groups outside a range or a threshold
+            finite = array[~np.isnan(array)] if array.dtype.kind == "f" else array
+            if len(finite):
+                meta["min"], meta["max"] = finite.min().item(), finite.max().item()
+            group["columns"][column] = meta
+            self.file.write(data)
+        self.index["row_groups"].append(group)
+        self.index["rows"] += len(times)
+
+    def close(self):
+        index_data = json.dumps(self.index).encode("utf-8")
+        index_offset = self.file.tell()
+        self.file.write(index_data)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(EXPORT_MAGIC, index_offset, len(index_data)))
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        # Nothing reaches path until close
+        self.file.close()
+        os.remove(self.path + ".tmp")
+
+FORMATS = {"csv": CsvWriter, "columnar": ColumnarWriter, "line": LineProtocolWriter}
+
+def iter_columnar(path):
+    """Read a columnar export back one row group at a time, as {"time": epoch seconds, column: values}."""
+    with open(path, "rb") as f:
+        magic, index_offset, index_length = HEADER.unpack(f.read(HEADER.size))
+        if magic != EXPORT_MAGIC:
+            raise ValueError(f"{path} is not a columnar export")
+        f.seek(index_offset)
+        index = json.loads(f.read(index_length))
+        for group in index["row_groups"]:
+            arrays = {}
+            for column, meta in group["columns"].items():
+                f.seek(meta["offset"])
+                arrays[column] = decode_column(f.read(meta["length"]), meta)
+            arrays["time"] = arrays["time"] / 1000.0
+            yield arrays
+
+def export(source, output_dir, fmt="csv", tables=None, start=None, end=None, tags=None,
+           chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """Export tables (all metric tables by default) of source to output_dir in format fmt.
+
+    progress(table, rows) is called after every chunk. Returns {table: {"path",
+    "rows", "seconds", "rows_per_s"}} of the tables with data.
+    """
+    writer_class = FORMATS[fmt]
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    for table in tables or list(SERIES):
+        columns = list(SERIES[table])
+        path = os.path.join(output_dir, table + writer_class.suffix)
+        writer = None
+        rows = 0
+        started = time.perf_counter()
+        try:
+            for times, values in iter_chunks(source, table, columns, start, end, chunk_rows):
+                if writer is None:
+                    writer = writer_class(path, table, columns, tags)
+                writer.write(times, values)
+                rows += len(times)
+                if progress is not None:
+                    progress(table, rows)
+        except BaseException:
+            # A partial file would look like a complete export
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is None:
+            continue
+        writer.close()
+        seconds = time.perf_counter() - started
+        results[table] = {"path": path, "rows": rows, "seconds": seconds,
+                          "rows_per_s": rows / seconds if seconds > 0 else None}
+    return results
+
+def parse_time(text):
+    """Epoch seconds from a number or a local date and time such as "2024-12-18 14:30"."""
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Export recorded metrics without loading them whole.")
+    parser.add_argument("source", help="a session file (.db or .pcarc) or a directory of sessions")
+    parser.add_argument("--output", default="export", help="directory the files are written to (default: ./export/)")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--tables", default=",".join(SERIES),
+                        help=f"comma-separated tables (default: {','.join(SERIES)})")
+    parser.add_argument("--start", type=parse_time, default=None, help="epoch seconds or local date and time")
+    parser.add_argument("--end", type=parse_time, default=None, help="epoch seconds or local date and time")
+    parser.add_argument("--tag", action="append", default=[], metavar="KEY=VALUE",
+                        help="tag added to every line (line protocol) or stored in the index (columnar)")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS,
+                        help=f"rows read and written at a time (default: {EXPORT_CHUNK_ROWS})")
+    args = parser.parse_args(argv)
+    tables = [table.strip() for table in args.tables.split(",") if table.strip()]
+    unknown = [table for table in tables if table not in SERIES]
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(unknown)}")
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} does not exist")
+    tags = {}
+    for tag in args.tag:
+        key, sep, value = tag.partition("=")
+        if not sep or not key:
+            parser.error(f"--tag expects KEY=VALUE, got {tag}")
+        tags[key] = value
+
+    def progress(table, rows):
+        print(f"\r{table}: {rows:,} rows", end="", file=sys.stderr, flush=True)
+
+    results = export(args.source, args.output, args.format, tables, args.start, args.end, tags,
+                     args.chunk_rows, progress)
+    print(file=sys.stderr)
+    for table, result in results.items():
+        print(f"{result['path']}: {result['rows']:,} rows in {result['seconds']:.2f} s "
+              f"({result['rows_per_s'] or 0:,.0f} rows/s)")
+    if not results:
+        print("No rows to export.")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
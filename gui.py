@@ -1,32 +1,25 @@
 import os
+import sqlite3
 import sys
 import time
+import numpy as np
 import psutil
 import pyqtgraph as pg
-# Remove pynvml if not using NVIDIA GPUs
-import pynvml
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QTabWidget, QVBoxLayout, QLabel, QGridLayout, QTableWidget, QTableWidgetItem, QHeaderView, QPushButton
+    QApplication, QWidget, QTabWidget, QVBoxLayout, QHBoxLayout, QLabel, QGridLayout, QTableView, QHeaderView,
+    QPushButton, QAbstractItemView, QTableWidget, QTableWidgetItem, QFileDialog, QInputDialog
 )
 from datetime import datetime
-from PyQt5.QtCore import QTimer, Qt
-from backend import BackendLogger  # Import the backend logger
+from PyQt5.QtCore import QTimer, Qt, QObject, QThread, pyqtSignal, QAbstractTableModel, QModelIndex
+from collector import MetricsCollector
+from export import FORMATS, export
 from old_data_viewer import OldDataViewer
-
-# TODO: separate the data collection from this gui. that way, the gui is reusable based on whatever data is sent to it
+from session_catalog import SessionCatalog
+from instrumentation import instruments
+from ring_buffer import RingBuffer
 
 PLOT_LENGTH = 60 + 1
-io_chip_name = 'it8689'
-
-# Initialize NVML for GPU metrics
-try:
-    pynvml.nvmlInit()
-    NVML_AVAILABLE = True
-    gpu_handle = pynvml.nvmlDeviceGetHandleByIndex(0)  # Assuming a single GPU
-except:
-    NVML_AVAILABLE = False
-    print("GPU not available")
-    
+
 def parse_datetime_from_filename(dt_str):
     """Parse a string like 'YYYY-MM-DD_HH-MM-SS' into a datetime object and return a friendly string."""
     try:
@@ -37,51 +30,236 @@ def parse_datetime_from_filename(dt_str):
         # If parsing fails, just return the original string
         return dt_str
     
-def get_session_times_from_db(db_path):
-    """Open the DB file read-only and retrieve start/end times from session_metadata."""
-    import sqlite3
-    if not os.path.exists(db_path):
-        return None, None
-    try:
-        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
-        cursor = conn.cursor()
-        cursor.execute("SELECT start_time, end_time FROM session_metadata ORDER BY id DESC LIMIT 1")
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return row[0], row[1]
-        return None, None
-    except Exception:
-        return None, None
+def format_size(size):
+    if size is None:
+        return ""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class SessionTableModel(QAbstractTableModel):
+    """Rows of the session catalog for the DB Files tab.
+
+    The view only asks for the cells it shows, so thousands of sessions cost
+    no widgets. The file name column is editable and renames the file,
+    except for a session still being recorded (no end time yet): its
+    logger keeps writing to the old path.
+    """
+
+    HEADERS = ["File Name", "Start Time", "End Time", "Samples", "Size"]
+
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.sessions = []
+
+    def reload(self):
+        self.beginResetModel()
+        self.sessions = self.catalog.sessions()
+        self.endResetModel()
+
+    def path(self, row):
+        return os.path.join(self.catalog.db_dir, self.sessions[row]["filename"])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.sessions)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        session = self.sessions[index.row()]
+        column = index.column()
+        if column == 0:
+            return os.path.splitext(session["filename"])[0]  # without the extension
+        if column == 1:
+            # Without metadata, the start time is the file name
+            return parse_datetime_from_filename(session["start_time"] or session["filename"])
+        if column == 2:
+            return parse_datetime_from_filename(session["end_time"] or "")
+        if column == 3:
+            return f"{session['sample_rows'] or 0:,}"
+        return format_size(session["size"])
+
+    def renamable(self, row):
+        return self.sessions[row]["end_time"] is not None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == 0 and self.renamable(index.row()):
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or index.column() != 0:
+            return False
+        if not self.renamable(index.row()):
+            print(f"Cannot rename {self.path(index.row())} while it is being recorded")
+            return False
+        new_name = str(value).strip()
+        if not new_name:
+            return False
+        old_path = self.path(index.row())
+        # Sessions keep their extension: .db, or .pcarc for archives
+        extension = os.path.splitext(old_path)[1]
+        if not new_name.endswith(extension):
+            new_name += extension
+        new_path = os.path.join(self.catalog.db_dir, new_name)
+        if new_path == old_path:
+            return False
+        if os.path.exists(new_path) or not os.path.exists(old_path):
+            print(f"Cannot rename {old_path} to {new_path}")
+            return False
+        # Rename file on disk (with its WAL files) and in the catalog
+        os.rename(old_path, new_path)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(old_path + suffix):
+                os.rename(old_path + suffix, new_path + suffix)
+        self.catalog.rename(old_path, new_path)
+        self.sessions[index.row()]["filename"] = new_name
+        self.dataChanged.emit(index, index)
+        return True
+
+class ExportWorker(QThread):
+    """Runs export.export on a background thread; progress is emitted after every chunk."""
+    progress = pyqtSignal(str, int)
+    finished_export = pyqtSignal(object)
+
+    def __init__(self, source, output_dir, fmt):
+        super().__init__()
+        self.source = source
+        self.output_dir = output_dir
+        self.fmt = fmt
+
+    def run(self):
+        try:
+            results = export(self.source, self.output_dir, self.fmt, progress=self.progress.emit)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            results = e
+        self.finished_export.emit(results)
+
+class SampleBridge(QObject):
+    # Emitted from the collector thread; Qt queues delivery onto the GUI thread
+    sample_ready = pyqtSignal(object)
 
 class SystemMonitor(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("System Monitor")
         self.setGeometry(100, 100, 1200, 800)
-        
-        self.backend = BackendLogger()
+
+        # Sampling and logging run on the collector thread; the GUI only draws
+        # the samples it is handed
+        self.sample_bridge = SampleBridge()
+        self.sample_bridge.sample_ready.connect(self.on_sample)
+        self.collector = MetricsCollector(on_sample=self.sample_bridge.sample_ready.emit)
 
         self.layout = QVBoxLayout(self)
         self.tabs = QTabWidget()
         self.layout.addWidget(self.tabs)
 
-        # Create tabs
-        self.create_cpu_tab()
-        self.create_gpu_tab()
-        self.create_ram_tab()
-        self.create_network_tab()
-        self.create_disk_tab()
-        self.create_system_info_tab()
-        self.create_db_files_tab()
+        # Live series are kept for every source, whether or not its tab exists
+        self.create_series()
+        self.latest_samples = {}
+        # Ring buffer updates per source
+        self.sample_handlers = {
+            "cpu": self.update_cpu_metrics,
+            "temps": self.update_temp_metrics,
+            "fans": self.update_fan_metrics,
+            "gpu": self.update_gpu_metrics,
+            "ram": self.update_ram_metrics,
+            "network": self.update_network_metrics,
+            "disk": self.update_disk_metrics,
+            "overhead": self.update_overhead_metrics,
+        }
+
+        # Tabs are built the first time they are shown
+        self.tab_builders = {}
+        self.built_tabs = set()
+        self.cpu_tab = self.add_lazy_tab("CPU", self.create_cpu_tab)
+        self.gpu_tab = self.add_lazy_tab("GPU", self.create_gpu_tab)
+        self.ram_tab = self.add_lazy_tab("RAM", self.create_ram_tab)
+        self.network_tab = self.add_lazy_tab("Network", self.create_network_tab)
+        self.disk_tab = self.add_lazy_tab("Disk", self.create_disk_tab)
+        self.processes_tab = self.add_lazy_tab("Processes", self.create_processes_tab)
+        self.sys_tab = self.add_lazy_tab("System Info", self.create_system_info_tab)
+        self.db_tab = self.add_lazy_tab("DB Files", self.create_db_files_tab)
+        self.overhead_tab = self.add_lazy_tab("Overhead", self.create_overhead_tab)
+
+        # Only the visible tab is redrawn when samples arrive
+        self.tab_draws = {
+            self.cpu_tab: ("cpu", self.draw_cpu_metrics),
+            self.gpu_tab: ("gpu", self.draw_gpu_metrics),
+            self.ram_tab: ("ram", self.draw_ram_metrics),
+            self.network_tab: ("network", self.draw_network_metrics),
+            self.disk_tab: ("disk", self.draw_disk_metrics),
+            self.processes_tab: ("processes", self.draw_process_metrics),
+            self.overhead_tab: ("overhead", self.draw_overhead_metrics),
+        }
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.on_tab_changed(self.tabs.currentIndex())
 
         # Start timers for dynamic updates
         self.start_timers()
 
-    def create_cpu_tab(self):
-        self.cpu_tab = QWidget()
-        self.tabs.addTab(self.cpu_tab, "CPU")
-        layout = QVBoxLayout(self.cpu_tab)
+    def create_series(self):
+        # One ring buffer row per core
+        num_cores = psutil.cpu_count(logical=True)
+        self.cpu_data = RingBuffer(PLOT_LENGTH, rows=num_cores)
+        self.cpu_temp_data = RingBuffer(PLOT_LENGTH)
+        # One ring buffer row per fan of the chip the fans source found, if any
+        fans = self.collector.sources.get("fans")
+        self.cpu_fan_data = RingBuffer(PLOT_LENGTH, rows=fans.count if fans else 0)
+
+        if "gpu" in self.collector.sources:
+            self.gpu_data = RingBuffer(PLOT_LENGTH)
+            self.gpu_memory_data = RingBuffer(PLOT_LENGTH)
+            self.gpu_temp_data = RingBuffer(PLOT_LENGTH)
+            self.gpu_fan_data = RingBuffer(PLOT_LENGTH)
+
+        self.ram_data = RingBuffer(PLOT_LENGTH)
+        self.net_download_data = RingBuffer(PLOT_LENGTH)
+        self.net_upload_data = RingBuffer(PLOT_LENGTH)
+        self.disk_read_data = RingBuffer(PLOT_LENGTH)
+        self.disk_write_data = RingBuffer(PLOT_LENGTH)
+        # Per-interface and per-disk speeds: {device: ring buffer with one row per speed}
+        self.net_device_data = {}
+        self.disk_device_data = {}
+        self.overhead_cpu_data = RingBuffer(PLOT_LENGTH)
+        self.overhead_rss_data = RingBuffer(PLOT_LENGTH)
+
+    def add_lazy_tab(self, name, builder):
+        """Add an empty tab that builder(tab) fills in the first time it is shown."""
+        tab = QWidget()
+        self.tabs.addTab(tab, name)
+        self.tab_builders[tab] = builder
+        return tab
+
+    def on_tab_changed(self, index):
+        tab = self.tabs.widget(index)
+        if tab not in self.built_tabs:
+            self.built_tabs.add(tab)
+            self.tab_builders[tab](tab)
+        # Catch up on the samples that arrived while the tab was hidden
+        self.draw_tab(tab)
+
+    def draw_tab(self, tab):
+        if tab not in self.tab_draws:
+            return
+        source, draw = self.tab_draws[tab]
+        if source in self.latest_samples:
+            draw()
+
+    def create_cpu_tab(self, tab):
+        layout = QVBoxLayout(tab)
 
         # Static CPU Info
         cpu_info_layout = QGridLayout()
@@ -113,7 +291,6 @@ class SystemMonitor(QWidget):
         self.cpu_plot.setMouseEnabled(x=False)  # Disable y-axis zoom and pan
         layout.addWidget(self.cpu_plot)
         # self.cpu_plot.addLegend()
-        self.cpu_data = [[] for _ in range(num_cores)]
         self.cpu_curves = []
         # colors = ['r', 'g', 'b', 'c', 'm', 'y', 'w', 'k']
         colors = [
@@ -126,19 +303,22 @@ class SystemMonitor(QWidget):
         
         for i in range(num_cores):
             color = colors[i % len(colors)]
-            curve = self.cpu_plot.plot(self.cpu_data[i], pen=color, name=f"Core {i}")
+            curve = self.cpu_plot.plot(pen=color, name=f"Core {i}")
             self.cpu_curves.append(curve)
         
-        # Temperature plot
-        self.cpu_temp_plot = pg.PlotWidget(title="CPU Temperature (°C)")
+        # Temperature plot, of the sensor found by the temps source
+        temps = self.collector.sources.get("temps")
+        if temps is None:
+            layout.addWidget(QLabel("No CPU temperature sensor found."))
+        self.cpu_temp_plot = pg.PlotWidget(
+            title=f"CPU Temperature (°C, {temps.chip} {temps.label})" if temps else "CPU Temperature (°C)")
         self.cpu_temp_plot.setYRange(0, 110)
         self.cpu_temp_plot.setXRange(0, PLOT_LENGTH)
         self.cpu_temp_plot.setLimits(yMin=0, yMax=110)
         self.cpu_temp_plot.setLimits(xMin=0, xMax=PLOT_LENGTH)
         self.cpu_temp_plot.setMouseEnabled(x=False)  # Disable zoom and pan
         layout.addWidget(self.cpu_temp_plot)
-        self.cpu_temp_data = []
-        self.cpu_temp_curve = self.cpu_temp_plot.plot(self.cpu_temp_data, pen='r')
+        self.cpu_temp_curve = self.cpu_temp_plot.plot(pen='r')
         
         # Dashed line at 80°C
         # self.cpu_temp_threshold_line = pg.InfiniteLine(pos=80, angle=0, pen=pg.mkPen('y', style=pg.QtCore.Qt.DashLine))
@@ -149,9 +329,11 @@ class SystemMonitor(QWidget):
         self.cpu_temp_shade.setMovable(False)
         self.cpu_temp_plot.addItem(self.cpu_temp_shade)
         
-        # Fan plot
-        # Updated to handle multiple fans
-        self.cpu_fan_plot = pg.PlotWidget(title="CPU Fan Speeds (RPM)")
+        # Fan plot, one curve per fan of the chip found by the fans source
+        fans = self.collector.sources.get("fans")
+        if fans is None:
+            layout.addWidget(QLabel("No fan sensors found."))
+        self.cpu_fan_plot = pg.PlotWidget(title=f"CPU Fan Speeds (RPM, {fans.chip})" if fans else "CPU Fan Speeds (RPM)")
         self.cpu_fan_plot.setYRange(0, 4000)  # Adjust the max RPM as per your fans
         self.cpu_fan_plot.setXRange(0, PLOT_LENGTH)
         self.cpu_fan_plot.setLimits(yMin=0, yMax=4000)
@@ -159,18 +341,12 @@ class SystemMonitor(QWidget):
         self.cpu_fan_plot.setMouseEnabled(x=False)  # Disable zoom and pan
         layout.addWidget(self.cpu_fan_plot)
 
-        # Dictionary to store data for each fan
-        self.cpu_fan_data = []
         self.cpu_fan_curves = []
         
-        # Initialize data and curves for each fan
-        for i in range(len(psutil.sensors_fans()[io_chip_name])):
+        # Initialize curves for each fan
+        for i in range(self.cpu_fan_data.rows):
             color = colors[i % len(colors)]
-            
-            self.cpu_fan_data.append([])
-            curve = self.cpu_fan_plot.plot(
-                self.cpu_fan_data[i], pen=color, name=f"Fan{i}"
-            )  # Unique pen color and label
+            curve = self.cpu_fan_plot.plot(pen=color, name=fans.labels[i])  # Unique pen color and label
             self.cpu_fan_curves.append(curve)
 
         
@@ -183,19 +359,16 @@ class SystemMonitor(QWidget):
         #     curve = self.cpu_plot.plot(self.cpu_data[i], pen=pen_color, name=f"Core {i}")
         #     self.cpu_curves.append(curve)
 
-    def create_gpu_tab(self):
-        self.gpu_tab = QWidget()
-        self.tabs.addTab(self.gpu_tab, "GPU")
-        layout = QVBoxLayout(self.gpu_tab)
+    def create_gpu_tab(self, tab):
+        layout = QVBoxLayout(tab)
 
-        if NVML_AVAILABLE:
+        if "gpu" in self.collector.sources:
             # Static GPU Info
+            gpu_info = self.collector.sources["gpu"].info()
             gpu_info_layout = QGridLayout()
             layout.addLayout(gpu_info_layout)
-            gpu_name = pynvml.nvmlDeviceGetName(gpu_handle).encode('utf-8')
-            # print(str(gpu_name))
             gpu_info_layout.addWidget(QLabel("GPU Model:"), 0, 0)
-            gpu_info_layout.addWidget(QLabel(str(gpu_name)[2:-1]), 0, 1)
+            gpu_info_layout.addWidget(QLabel(gpu_info["name"]), 0, 1)
 
             # Dynamic GPU Usage
             self.gpu_usage_label = QLabel("GPU Usage: 0%")
@@ -210,9 +383,8 @@ class SystemMonitor(QWidget):
             self.gpu_fan_label = QLabel("GPU Fan Speed: 0%")
             gpu_info_layout.addWidget(self.gpu_fan_label, 1, 3)
             
-            # Get total GPU memory (in MB)
-            memory_info = pynvml.nvmlDeviceGetMemoryInfo(gpu_handle)
-            total_memory_mb = memory_info.total / (1024 ** 2)  # Convert bytes to MB
+            # Total GPU memory (in MB)
+            total_memory_mb = gpu_info["total_memory_mb"]
 
             # GPU Usage Graph
             self.gpu_plot = pg.PlotWidget(title="GPU Usage (%)")
@@ -222,8 +394,7 @@ class SystemMonitor(QWidget):
             self.gpu_plot.setLimits(xMin=0, xMax=PLOT_LENGTH)
             self.gpu_plot.setMouseEnabled(x=False)
             layout.addWidget(self.gpu_plot)
-            self.gpu_data = []
-            self.gpu_curve = self.gpu_plot.plot(self.gpu_data, pen='g')
+            self.gpu_curve = self.gpu_plot.plot(pen='g')
             
             # GPU Memory Usage Graph
             self.gpu_memory_plot = pg.PlotWidget(title="GPU Memory Usage (MB)")
@@ -233,8 +404,7 @@ class SystemMonitor(QWidget):
             self.gpu_memory_plot.setLimits(xMin=0, xMax=PLOT_LENGTH)
             self.gpu_memory_plot.setMouseEnabled(x=False)
             layout.addWidget(self.gpu_memory_plot)
-            self.gpu_memory_data = []
-            self.gpu_memory_curve = self.gpu_memory_plot.plot(self.gpu_memory_data, pen='g')
+            self.gpu_memory_curve = self.gpu_memory_plot.plot(pen='g')
             
             # GPU Temperature Graph
             self.gpu_temp_plot = pg.PlotWidget(title="GPU Temperature (°C)")
@@ -244,8 +414,7 @@ class SystemMonitor(QWidget):
             self.gpu_temp_plot.setLimits(xMin=0, xMax=PLOT_LENGTH)
             self.gpu_temp_plot.setMouseEnabled(x=False)
             layout.addWidget(self.gpu_temp_plot)
-            self.gpu_temp_data = []
-            self.gpu_temp_curve = self.gpu_temp_plot.plot(self.gpu_temp_data, pen='r')
+            self.gpu_temp_curve = self.gpu_temp_plot.plot(pen='r')
             
             # Shade the area above 80°C
             self.gpu_temp_shade = pg.LinearRegionItem([80, 111], orientation='horizontal', brush=(255, 0, 0, 50))
@@ -260,16 +429,13 @@ class SystemMonitor(QWidget):
             self.gpu_fan_plot.setLimits(xMin=0, xMax=PLOT_LENGTH)
             self.gpu_fan_plot.setMouseEnabled(x=False)
             layout.addWidget(self.gpu_fan_plot)
-            self.gpu_fan_data = []
-            self.gpu_fan_curve = self.gpu_fan_plot.plot(self.gpu_fan_data, pen='b')
+            self.gpu_fan_curve = self.gpu_fan_plot.plot(pen='b')
 
         else:
             layout.addWidget(QLabel("NVIDIA NVML library not found. GPU monitoring is unavailable."))
 
-    def create_ram_tab(self):
-        self.ram_tab = QWidget()
-        self.tabs.addTab(self.ram_tab, "RAM")
-        layout = QVBoxLayout(self.ram_tab)
+    def create_ram_tab(self, tab):
+        layout = QVBoxLayout(tab)
 
         # Static RAM Info
         ram_info_layout = QGridLayout()
@@ -291,13 +457,10 @@ class SystemMonitor(QWidget):
         self.ram_plot.setLimits(xMin=0, xMax=PLOT_LENGTH)
         # self.ram_plot.setMouseEnabled(y=False)  # Disable y-axis zoom and pan
         layout.addWidget(self.ram_plot)
-        self.ram_data = []
-        self.ram_curve = self.ram_plot.plot(self.ram_data, pen='g')
+        self.ram_curve = self.ram_plot.plot(pen='g')
 
-    def create_network_tab(self):
-        self.network_tab = QWidget()
-        self.tabs.addTab(self.network_tab, "Network")
-        layout = QVBoxLayout(self.network_tab)
+    def create_network_tab(self, tab):
+        layout = QVBoxLayout(tab)
 
         # Network Interface Info
         net_info_layout = QGridLayout()
@@ -319,18 +482,18 @@ class SystemMonitor(QWidget):
         self.net_plot.setLimits(xMin=0, xMax=PLOT_LENGTH)
         self.net_plot.setLimits(yMin=0)
         self.net_plot.setMouseEnabled(y=False)  # Disable y-axis zoom and pan
-        self.net_download_data = []
-        self.net_upload_data = []
-        self.net_download_curve = self.net_plot.plot(self.net_download_data, pen='c', name='Download')
-        self.net_upload_curve = self.net_plot.plot(self.net_upload_data, pen='m', name='Upload')
+        self.net_download_curve = self.net_plot.plot(pen='c', name='Download')
+        self.net_upload_curve = self.net_plot.plot(pen='m', name='Upload')
 
-        # For calculating network speed
-        self.last_net_io = psutil.net_io_counters()
+        # One curve per interface, added as interfaces appear
+        self.net_device_plots = []
+        for title in ("Download per Interface (KB/s)", "Upload per Interface (KB/s)"):
+            plot = self.create_device_plot(title)
+            layout.addWidget(plot)
+            self.net_device_plots.append((plot, {}))
 
-    def create_disk_tab(self):
-        self.disk_tab = QWidget()
-        self.tabs.addTab(self.disk_tab, "Disk")
-        layout = QVBoxLayout(self.disk_tab)
+    def create_disk_tab(self, tab):
+        layout = QVBoxLayout(tab)
 
         # Disk Partitions Info
         partitions = psutil.disk_partitions()
@@ -356,18 +519,79 @@ class SystemMonitor(QWidget):
         self.disk_plot.setLimits(yMin=0)
         # self.cpu_plot.setXRange(0, 60)
         self.disk_plot.setMouseEnabled(y=False)  # Disable y-axis zoom and pan
-        self.disk_read_data = []
-        self.disk_write_data = []
-        self.disk_read_curve = self.disk_plot.plot(self.disk_read_data, pen='y', name='Read')
-        self.disk_write_curve = self.disk_plot.plot(self.disk_write_data, pen='w', name='Write')
-
-        # For calculating disk speed
-        self.last_disk_io = psutil.disk_io_counters()
-
-    def create_system_info_tab(self):
-        self.sys_tab = QWidget()
-        self.tabs.addTab(self.sys_tab, "System Info")
-        layout = QVBoxLayout(self.sys_tab)
+        self.disk_read_curve = self.disk_plot.plot(pen='y', name='Read')
+        self.disk_write_curve = self.disk_plot.plot(pen='w', name='Write')
+
+        # One curve per disk, added as disks appear
+        self.disk_device_plots = []
+        for title in ("Read per Disk (KB/s)", "Write per Disk (KB/s)"):
+            plot = self.create_device_plot(title)
+            layout.addWidget(plot)
+            self.disk_device_plots.append((plot, {}))
+
+    def create_device_plot(self, title):
+        plot = pg.PlotWidget(title=title)
+        plot.addLegend()
+        plot.setXRange(0, 60)
+        plot.setLimits(xMin=0, xMax=PLOT_LENGTH, yMin=0)
+        plot.setMouseEnabled(y=False)
+        return plot
+
+    def create_processes_tab(self, tab):
+        layout = QVBoxLayout(tab)
+        if "processes" not in self.collector.sources:
+            layout.addWidget(QLabel("Process sampling is not available."))
+            return
+
+        # The top processes by each metric of the latest sample
+        self.process_count_label = QLabel("Processes: 0")
+        layout.addWidget(self.process_count_label)
+
+        self.process_table = QTableWidget()
+        self.process_table.setColumnCount(6)
+        self.process_table.setHorizontalHeaderLabels(["PID", "Name", "CPU %", "Memory (MB)", "Read KB/s", "Write KB/s"])
+        self.process_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.process_table.verticalHeader().setVisible(False)
+        self.process_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.process_table.setSortingEnabled(True)
+        layout.addWidget(self.process_table)
+
+    def create_overhead_tab(self, tab):
+        layout = QVBoxLayout(tab)
+
+        # What the monitor itself costs: CPU as a share of the whole machine
+        self.overhead_label = QLabel("Monitor CPU: 0% | Memory: 0 MB | Late ticks: 0 | Skipped ticks: 0")
+        layout.addWidget(self.overhead_label)
+
+        self.overhead_cpu_plot = pg.PlotWidget(title="Monitor CPU Usage (% of all cores)")
+        self.overhead_cpu_plot.setXRange(0, 60)
+        self.overhead_cpu_plot.setLimits(xMin=0, xMax=PLOT_LENGTH, yMin=0)
+        layout.addWidget(self.overhead_cpu_plot)
+        self.overhead_cpu_curve = self.overhead_cpu_plot.plot(pen='y')
+
+        self.overhead_rss_plot = pg.PlotWidget(title="Monitor Memory (RSS, MB)")
+        self.overhead_rss_plot.setXRange(0, 60)
+        self.overhead_rss_plot.setLimits(xMin=0, xMax=PLOT_LENGTH, yMin=0)
+        layout.addWidget(self.overhead_rss_plot)
+        self.overhead_rss_curve = self.overhead_rss_plot.plot(pen='g')
+
+        # Timings of the hot paths over their last instrumentation window
+        self.overhead_table = QTableWidget()
+        self.overhead_table.setColumnCount(6)
+        self.overhead_table.setHorizontalHeaderLabels(["Operation", "Count", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)"])
+        self.overhead_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.overhead_table.verticalHeader().setVisible(False)
+        self.overhead_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.overhead_table)
+
+        # Distribution of tick durations
+        self.tick_histogram_plot = pg.PlotWidget(title="Tick Duration Histogram (ms)")
+        self.tick_histogram = pg.BarGraphItem(x0=[], x1=[], height=[], brush='c')
+        self.tick_histogram_plot.addItem(self.tick_histogram)
+        layout.addWidget(self.tick_histogram_plot)
+
+    def create_system_info_tab(self, tab):
+        layout = QVBoxLayout(tab)
 
         # Static System Info
         sys_info_layout = QGridLayout()
@@ -382,244 +606,323 @@ class SystemMonitor(QWidget):
         layout.addWidget(self.uptime_label)
         self.update_uptime()
 
-    def create_db_files_tab(self):
-        self.db_tab = QWidget()
-        self.tabs.addTab(self.db_tab, "DB Files")
-        layout = QVBoxLayout(self.db_tab)
+    def create_db_files_tab(self, tab):
+        layout = QVBoxLayout(tab)
 
         layout.addWidget(QLabel("Recorded Sessions:"))
 
-        table = QTableWidget()
-        table.setColumnCount(4)
-        table.setHorizontalHeaderLabels(["File Name", "Start Time", "End Time", "View Data"])
-
-        header = table.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.Stretch)
-
         db_directory = "db"
         if not os.path.exists(db_directory):
             os.makedirs(db_directory)
 
-        files = sorted([f for f in os.listdir(db_directory) if f.endswith(".db")])
-
-        rows = []
-        for f in files:
-            db_path = os.path.join(db_directory, f)
-            start_time, end_time = get_session_times_from_db(db_path)
-            # If times are None, just display filename in Start Time cell
-            start_str = start_time if start_time else f
-            end_str = end_time if end_time else ""
-            rows.append((f, start_str, end_str))
-
-        table.setRowCount(len(rows))
-        for i, (filename, start_str, end_str) in enumerate(rows):
-            # File name column: editable, without the .db extension displayed
-            display_name = filename[:-3]  # remove .db for display
-            filename_item = QTableWidgetItem(display_name)
-            filename_item.setFlags(filename_item.flags() | Qt.ItemIsEditable)
-            # Store original path in user data
-            original_path = os.path.join(db_directory, filename)
-            filename_item.setData(Qt.UserRole, original_path)
-
-            start_item = QTableWidgetItem(parse_datetime_from_filename(start_str))
-            start_item.setFlags(start_item.flags() & ~Qt.ItemIsEditable)  # Make uneditable
-
-            end_item = QTableWidgetItem(parse_datetime_from_filename(end_str))
-            end_item.setFlags(end_item.flags() & ~Qt.ItemIsEditable)  # Make uneditable
-            
-            view_button = QPushButton("Open GUI")
-            view_button.clicked.connect(lambda checked, path=original_path: self.open_old_data_viewer(path))
-
-            table.setItem(i, 0, filename_item)
-            table.setItem(i, 1, start_item)
-            table.setItem(i, 2, end_item)
-            
-            if end_str != "":
-                table.setCellWidget(i, 3, view_button)
-
-        # Assign the table to self for access in the slot
+        # Sessions are listed from the catalog; only files that changed since
+        # it was last updated are opened
+        self.catalog = SessionCatalog(db_directory)
+        self.db_model = SessionTableModel(self.catalog, self)
+
+        table = QTableView()
+        table.setModel(self.db_model)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SingleSelection)
+        table.setEditTriggers(QAbstractItemView.EditKeyPressed | QAbstractItemView.SelectedClicked)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.doubleClicked.connect(lambda index: self.open_session_row(index.row()))
+        table.selectionModel().currentRowChanged.connect(self.on_session_selected)
         self.db_table = table
-
-        # Connect signal for filename changes
-        self.db_table.itemChanged.connect(self.on_filename_changed)
-
         layout.addWidget(table)
-        
-    def on_filename_changed(self, item):
-        # Check if it's the filename column
-        if item.column() == 0:
-            new_name = item.text().strip()
-            if not new_name.endswith(".db"):
-                new_name += ".db"
-
-            old_path = item.data(Qt.UserRole)
-            if old_path and os.path.exists(old_path):
-                db_directory = os.path.dirname(old_path)
-                new_path = os.path.join(db_directory, new_name)
-                # Rename file on disk
-                os.rename(old_path, new_path)
-                # Update the stored path
-                item.setData(Qt.UserRole, new_path)
-    
-    def start_timers(self):
-        # Timers for updating dynamic metrics
-        self.cpu_timer = QTimer()
-        self.cpu_timer.timeout.connect(self.update_cpu_metrics)
-        self.cpu_timer.start(1000)  # Update every 1 second
-
-        if NVML_AVAILABLE:
-            self.gpu_timer = QTimer()
-            self.gpu_timer.timeout.connect(self.update_gpu_metrics)
-            self.gpu_timer.start(1000)
-
-        self.ram_timer = QTimer()
-        self.ram_timer.timeout.connect(self.update_ram_metrics)
-        self.ram_timer.start(1000)
 
-        self.net_timer = QTimer()
-        self.net_timer.timeout.connect(self.update_network_metrics)
-        self.net_timer.start(1000)
+        buttons = QHBoxLayout()
+        self.open_session_button = QPushButton("Open GUI")
+        self.open_session_button.setEnabled(False)
+        self.open_session_button.clicked.connect(
+            lambda: self.open_session_row(self.db_table.currentIndex().row()))
+        buttons.addWidget(self.open_session_button)
+        self.export_button = QPushButton("Export...")
+        self.export_button.setEnabled(False)
+        self.export_button.clicked.connect(
+            lambda: self.export_session_row(self.db_table.currentIndex().row()))
+        buttons.addWidget(self.export_button)
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh_sessions)
+        buttons.addWidget(refresh_button)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+        self.export_label = QLabel("")
+        layout.addWidget(self.export_label)
+        self.export_worker = None
+
+        self.refresh_sessions()
+
+    def refresh_sessions(self):
+        self.catalog.refresh()
+        self.db_model.reload()
+        self.open_session_button.setEnabled(False)
+        self.export_button.setEnabled(False)
+
+    def session_openable(self, row):
+        return 0 <= row < self.db_model.rowCount()
+
+    def session_live(self, row):
+        # Sessions still being recorded (or cut short) have no end time yet;
+        # they are opened in tail mode and follow the recording
+        return self.db_model.sessions[row]["end_time"] is None
+
+    def on_session_selected(self, current, previous):
+        row = current.row()
+        self.open_session_button.setEnabled(self.session_openable(row))
+        live = self.session_openable(row) and self.session_live(row)
+        self.open_session_button.setText("Open Live" if live else "Open GUI")
+        self.export_button.setEnabled(self.session_openable(row) and self.export_worker is None)
+
+    def open_session_row(self, row):
+        if self.session_openable(row):
+            self.open_old_data_viewer(self.db_model.path(row), tail=self.session_live(row))
+
+    def export_session_row(self, row):
+        if not self.session_openable(row) or self.export_worker is not None:
+            return
+        fmt, ok = QInputDialog.getItem(self, "Export Session", "Format:", list(FORMATS), 0, False)
+        if not ok:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Export To")
+        if not output_dir:
+            return
+        path = self.db_model.path(row)
+        # Each session gets its own directory of per-table files
+        output_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0])
+        self.export_started = time.perf_counter()
+        self.export_worker = ExportWorker(path, output_dir, fmt)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.finished_export.connect(self.on_export_finished)
+        self.export_button.setEnabled(False)
+        self.export_label.setText(f"Exporting to {output_dir}...")
+        self.export_worker.start()
+
+    def on_export_progress(self, table, rows):
+        seconds = time.perf_counter() - self.export_started
+        self.export_label.setText(f"Exporting {table}: {rows:,} rows ({rows / max(seconds, 1e-9):,.0f} rows/s overall)")
+
+    def on_export_finished(self, results):
+        self.export_worker.wait()
+        self.export_worker = None
+        self.export_button.setEnabled(self.session_openable(self.db_table.currentIndex().row()))
+        if isinstance(results, Exception):
+            self.export_label.setText(f"Export failed: {results}")
+            return
+        rows = sum(result["rows"] for result in results.values())
+        seconds = sum(result["seconds"] for result in results.values())
+        rate = f" ({rows / seconds:,.0f} rows/s)" if seconds > 0 else ""
+        self.export_label.setText(f"Exported {rows:,} rows of {len(results)} tables in {seconds:.1f} s{rate}")
 
-        self.disk_timer = QTimer()
-        self.disk_timer.timeout.connect(self.update_disk_metrics)
-        self.disk_timer.start(1000)
+    def start_timers(self):
+        # Metrics are sampled on the collector thread, all sources on one tick
+        self.collector.start()
 
         self.uptime_timer = QTimer()
         self.uptime_timer.timeout.connect(self.update_uptime)
         self.uptime_timer.start(60000)  # Update every 1 minute
 
-    def update_cpu_metrics(self):
-        cpu_usages = psutil.cpu_percent(interval=None, percpu=True)
+    def on_sample(self, snapshot):
+        with instruments.timed("gui.on_sample"):
+            # A snapshot only holds the sources that were due on that tick
+            for source, handler in self.sample_handlers.items():
+                if source in snapshot:
+                    handler(snapshot[source])
+            # Sources without a tab (e.g. plugins) are kept as well
+            for source in self.collector.sources:
+                if source in snapshot:
+                    self.latest_samples[source] = snapshot[source]
+
+            # Hidden tabs (and a minimized window) are not redrawn; they catch up
+            # from the ring buffers when shown
+            if self.isVisible() and not self.isMinimized():
+                tab = self.tabs.currentWidget()
+                if tab in self.tab_draws and self.tab_draws[tab][0] in snapshot:
+                    with instruments.timed("gui.draw"):
+                        self.draw_tab(tab)
+
+    # update_*_metrics store a sample in the ring buffers; draw_*_metrics
+    # refresh the labels and curves of a tab from them.
+
+    def update_cpu_metrics(self, sample):
+        self.cpu_data.append(sample["core_usage"])
+
+    def update_temp_metrics(self, sample):
+        self.cpu_temp_data.append(sample["cpu_temp"])
+
+    def update_fan_metrics(self, sample):
+        fan_speeds = sample["fan_speeds"]
+        if len(fan_speeds) == self.cpu_fan_data.rows:
+            self.cpu_fan_data.append(fan_speeds)
+
+    def draw_cpu_metrics(self):
+        cpu_usages = self.latest_samples["cpu"]["core_usage"]
         for i, usage in enumerate(cpu_usages):
             self.cpu_usage_labels[i].setText(f"Core {i} Usage: {usage}%")
-            self.cpu_data[i].append(usage)
-            if len(self.cpu_data[i]) > PLOT_LENGTH:
-                self.cpu_data[i].pop(0)
-            self.cpu_curves[i].setData(self.cpu_data[i])
-            
-        temps = psutil.sensors_temperatures()
-        cpu_temp = None
-        if 'k10temp' in temps:
-            cpu_temp = temps['k10temp'][1].current
-            self.cpu_temp_data.append(cpu_temp)
-            if len(self.cpu_temp_data) > PLOT_LENGTH:
-                self.cpu_temp_data.pop(0)
-            self.cpu_temp_curve.setData(self.cpu_temp_data)
-        else:
-            # No CPU temperature data available
-            cpu_temp = None
-
-        fan_speeds = psutil.sensors_fans()
-        fan_values = []
-        if io_chip_name in fan_speeds:
-            fans = fan_speeds[io_chip_name]
-            for i, fan in enumerate(fans):
-                fan_values.append(fan.current)
-                self.cpu_fan_data[i].append(fan.current)
-                if len(self.cpu_fan_data[i]) > PLOT_LENGTH:
-                    self.cpu_fan_data[i].pop(0)
-                self.cpu_fan_curves[i].setData(self.cpu_fan_data[i])
-
-        # Log CPU metrics to the database
-        # If temp is None, just pass None or 0
-        self.backend.log_cpu_metrics(core_usage_list=cpu_usages, 
-                                     cpu_temp=cpu_temp if cpu_temp is not None else 0,
-                                     fan_speeds=fan_values)
-
-    def update_gpu_metrics(self):
-        gpu_util = pynvml.nvmlDeviceGetUtilizationRates(gpu_handle).gpu
-        self.gpu_usage_label.setText(f"GPU Usage: {gpu_util}%")
-        self.gpu_data.append(gpu_util)
-        if len(self.gpu_data) > PLOT_LENGTH:
-            self.gpu_data.pop(0)
-        self.gpu_curve.setData(self.gpu_data)
+        cpu_series = self.cpu_data.view()
+        for i, curve in enumerate(self.cpu_curves):
+            curve.setData(cpu_series[i])
 
-        # GPU Memory Usage Data
-        gpu_memory = pynvml.nvmlDeviceGetMemoryInfo(gpu_handle)
-        used_memory_mb = gpu_memory.used / (1024 ** 2)  # Convert bytes to MB
-        self.gpu_mem_usage_label.setText(f"GPU Memory Usage: {used_memory_mb:.2f} MiB")
-        self.gpu_memory_data.append(used_memory_mb)
-        if len(self.gpu_memory_data) > PLOT_LENGTH:
-            self.gpu_memory_data.pop(0)
-        self.gpu_memory_curve.setData(self.gpu_memory_data)
-        
-        gpu_temp = pynvml.nvmlDeviceGetTemperature(gpu_handle, pynvml.NVML_TEMPERATURE_GPU)
-        self.gpu_temp_label.setText(f"GPU Temperature: {gpu_temp} F")
-        self.gpu_temp_data.append(gpu_temp)
-        if len(self.gpu_temp_data) > PLOT_LENGTH:
-            self.gpu_temp_data.pop(0)
-        self.gpu_temp_curve.setData(self.gpu_temp_data)
-        
-        gpu_fan = pynvml.nvmlDeviceGetFanSpeed(gpu_handle)
-        self.gpu_fan_label.setText(f"GPU Fan Speed: {gpu_fan}%")
-        self.gpu_fan_data.append(gpu_fan)
-        if len(self.gpu_fan_data) > PLOT_LENGTH:
-            self.gpu_fan_data.pop(0)
-        self.gpu_fan_curve.setData(self.gpu_fan_data)
-
-        # Log GPU metrics
-        self.backend.log_gpu_metrics(gpu_usage=gpu_util, 
-                                     gpu_mem_usage=used_memory_mb, 
-                                     gpu_temp=gpu_temp, 
-                                     gpu_fan=gpu_fan)
-
-    def update_ram_metrics(self):
-        ram = psutil.virtual_memory()
-        ram_usage = ram.percent
-        self.ram_usage_label.setText(f"RAM Usage: {ram_usage}%")
-
-        self.ram_data.append(ram_usage)
-        if len(self.ram_data) > PLOT_LENGTH:
-            self.ram_data.pop(0)
-        self.ram_curve.setData(self.ram_data)
-
-        # Log RAM metrics
-        self.backend.log_ram_metrics(ram_usage=ram_usage)
-
-    def update_network_metrics(self):
-        net_io = psutil.net_io_counters()
-        download_speed = (net_io.bytes_recv - self.last_net_io.bytes_recv) / 1024.0  # KB/s
-        upload_speed = (net_io.bytes_sent - self.last_net_io.bytes_sent) / 1024.0   # KB/s
-        self.last_net_io = net_io
+        self.cpu_temp_curve.setData(self.cpu_temp_data.view())
 
-        self.net_usage_label.setText(f"Download: {download_speed:.2f} KB/s | Upload: {upload_speed:.2f} KB/s")
+        fan_series = self.cpu_fan_data.view()
+        for i, curve in enumerate(self.cpu_fan_curves):
+            curve.setData(fan_series[i])
 
-        self.net_download_data.append(download_speed)
-        self.net_upload_data.append(upload_speed)
-        if len(self.net_download_data) > PLOT_LENGTH:
-            self.net_download_data.pop(0)
-            self.net_upload_data.pop(0)
-        self.net_download_curve.setData(self.net_download_data)
-        self.net_upload_curve.setData(self.net_upload_data)
+    def update_gpu_metrics(self, sample):
+        self.gpu_data.append(sample["gpu_usage"])
+        self.gpu_memory_data.append(sample["gpu_mem_usage"])
+        self.gpu_temp_data.append(sample["gpu_temp"])
+        self.gpu_fan_data.append(sample["gpu_fan"])
 
-        # Log Network metrics
-        self.backend.log_network_metrics(download_speed=download_speed, upload_speed=upload_speed)
+    def draw_gpu_metrics(self):
+        sample = self.latest_samples["gpu"]
+        self.gpu_usage_label.setText(f"GPU Usage: {sample['gpu_usage']}%")
+        self.gpu_curve.setData(self.gpu_data.view())
 
-    def update_disk_metrics(self):
-        disk_io = psutil.disk_io_counters()
-        read_speed = (disk_io.read_bytes - self.last_disk_io.read_bytes) / 1024.0  # KB/s
-        write_speed = (disk_io.write_bytes - self.last_disk_io.write_bytes) / 1024.0 # KB/s
-        self.last_disk_io = disk_io
-
-        self.disk_usage_label.setText(f"Read Speed: {read_speed:.2f} KB/s | Write Speed: {write_speed:.2f} KB/s")
+        # GPU Memory Usage Data
+        self.gpu_mem_usage_label.setText(f"GPU Memory Usage: {sample['gpu_mem_usage']:.2f} MiB")
+        self.gpu_memory_curve.setData(self.gpu_memory_data.view())
+        
+        self.gpu_temp_label.setText(f"GPU Temperature: {sample['gpu_temp']} F")
+        self.gpu_temp_curve.setData(self.gpu_temp_data.view())
+        
+        self.gpu_fan_label.setText(f"GPU Fan Speed: {sample['gpu_fan']}%")
+        self.gpu_fan_curve.setData(self.gpu_fan_data.view())
 
-        self.disk_read_data.append(read_speed)
-        self.disk_write_data.append(write_speed)
-        if len(self.disk_read_data) > PLOT_LENGTH:
-            self.disk_read_data.pop(0)
-            self.disk_write_data.pop(0)
-        self.disk_read_curve.setData(self.disk_read_data)
-        self.disk_write_curve.setData(self.disk_write_data)
+    def update_ram_metrics(self, sample):
+        self.ram_data.append(sample["ram_usage"])
 
-        # Log Disk metrics
-        self.backend.log_disk_metrics(read_speed=read_speed, write_speed=write_speed)
+    def draw_ram_metrics(self):
+        ram_usage = self.latest_samples["ram"]["ram_usage"]
+        self.ram_usage_label.setText(f"RAM Usage: {ram_usage}%")
+        self.ram_curve.setData(self.ram_data.view())
+
+    def update_network_metrics(self, sample):
+        self.net_download_data.append(sample["download_speed"])
+        self.net_upload_data.append(sample["upload_speed"])
+        self.update_device_series(self.net_device_data, sample, len(self.net_download_data))
+
+    def draw_network_metrics(self):
+        sample = self.latest_samples["network"]
+        self.net_usage_label.setText(
+            f"Download: {sample['download_speed']:.2f} KB/s | Upload: {sample['upload_speed']:.2f} KB/s"
+        )
+        self.net_download_curve.setData(self.net_download_data.view())
+        self.net_upload_curve.setData(self.net_upload_data.view())
+        self.draw_device_series(self.net_device_plots, self.net_device_data)
+
+    def update_disk_metrics(self, sample):
+        self.disk_read_data.append(sample["read_speed"])
+        self.disk_write_data.append(sample["write_speed"])
+        self.update_device_series(self.disk_device_data, sample, len(self.disk_read_data))
+
+    def draw_disk_metrics(self):
+        sample = self.latest_samples["disk"]
+        self.disk_usage_label.setText(
+            f"Read Speed: {sample['read_speed']:.2f} KB/s | Write Speed: {sample['write_speed']:.2f} KB/s"
+        )
+        self.disk_read_curve.setData(self.disk_read_data.view())
+        self.disk_write_curve.setData(self.disk_write_data.view())
+        self.draw_device_series(self.disk_device_plots, self.disk_device_data)
+
+    def update_device_series(self, series, sample, length):
+        """Append a sample's per-device speeds to the ring buffers of series.
+
+        A device that appears later is padded with NaN so its curve lines up
+        with the totals (length samples); one that disappears gets NaN, and is
+        dropped once it has no values left in the plot window.
+        """
+        for name, speeds in zip(sample["devices"], sample["device_speeds"]):
+            buffer = series.get(name)
+            if buffer is None:
+                buffer = series[name] = RingBuffer(PLOT_LENGTH, rows=len(speeds))
+                for _ in range(length - 1):
+                    buffer.append(np.nan)
+            buffer.append(speeds)
+        if len(series) > len(sample["devices"]):
+            present = set(sample["devices"])
+            for name in [name for name in series if name not in present]:
+                series[name].append(np.nan)
+                if np.isnan(series[name].view()).all():
+                    del series[name]
+
+    def draw_device_series(self, plots, series):
+        # plots holds (plot, {device: curve}) per row of the device buffers
+        for row, (plot, curves) in enumerate(plots):
+            for name in [name for name in curves if name not in series]:
+                plot.removeItem(curves.pop(name))
+            for name in sorted(series):
+                curve = curves.get(name)
+                if curve is None:
+                    pen = pg.intColor(len(curves), hues=max(len(series), 8))
+                    curve = curves[name] = plot.plot(pen=pen, name=name)
+                curve.setData(series[name].view()[row], connect="finite")
+
+    def draw_process_metrics(self):
+        if "processes" not in self.collector.sources:
+            return
+        sample = self.latest_samples["processes"]
+        self.process_count_label.setText(f"Processes: {sample['count']}")
+
+        # Sorting is suspended while the rows are replaced, then reapplied
+        self.process_table.setSortingEnabled(False)
+        self.process_table.setRowCount(len(sample["top"]))
+        for row, (pid, name, cpu_percent, rss_mb, read_speed, write_speed) in enumerate(sample["top"]):
+            # Unknown values (e.g. unreadable I/O counters) are NaN and shown empty
+            values = [pid, name] + ["" if value != value else round(value, 1)
+                                    for value in (cpu_percent, rss_mb, read_speed, write_speed)]
+            for column, value in enumerate(values):
+                item = self.process_table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    self.process_table.setItem(row, column, item)
+                # Numbers are set as data so that columns sort numerically
+                item.setData(Qt.DisplayRole, value)
+        self.process_table.setSortingEnabled(True)
+
+    def update_overhead_metrics(self, sample):
+        self.overhead_cpu_data.append(sample["cpu_percent"])
+        self.overhead_rss_data.append(sample["rss_mb"])
+
+    def draw_overhead_metrics(self):
+        sample = self.latest_samples["overhead"]
+        # NaN until the CPU use has been measured over long enough
+        cpu = "-" if np.isnan(sample["cpu_percent"]) else f"{sample['cpu_percent']:.2f}%"
+        self.overhead_label.setText(
+            f"Monitor CPU: {cpu} | Memory: {sample['rss_mb']:.1f} MB | "
+            f"Late ticks: {sample['late_ticks']} | Skipped ticks: {sample['skipped_ticks']}"
+        )
+        self.overhead_cpu_curve.setData(self.overhead_cpu_data.view(), connect="finite")
+        self.overhead_rss_curve.setData(self.overhead_rss_data.view())
+
+        # Durations are in seconds; process.* are not timings
+        timings = {name: summary for name, summary in instruments.summaries().items()
+                   if not name.startswith("process.")}
+        self.overhead_table.setRowCount(len(timings))
+        for row, (name, summary) in enumerate(timings.items()):
+            cells = [name, str(summary["count"])]
+            cells += [f"{summary[key] * 1000:.3f}" if key in summary else "" for key in ("p50", "p95", "p99", "max")]
+            for column, text in enumerate(cells):
+                item = self.overhead_table.item(row, column)
+                if item is None:
+                    self.overhead_table.setItem(row, column, QTableWidgetItem(text))
+                else:
+                    item.setText(text)
+
+        counts, edges = instruments.histogram("tick")
+        if len(counts):
+            self.tick_histogram.setOpts(x0=edges[:-1] * 1000, x1=edges[1:] * 1000, height=counts)
 
     def closeEvent(self, event):
-        # Close the database connection when the GUI is closed
-        self.backend.close()
+        # Stop sampling; the collector closes the database connection on exit
+        self.collector.stop()
         event.accept()
 
     def update_uptime(self):
+        if self.sys_tab not in self.built_tabs:
+            return
         uptime_seconds = time.time() - psutil.boot_time()
         uptime_string = time.strftime("%H:%M:%S", time.gmtime(uptime_seconds))
         self.uptime_label.setText(f"System Uptime: {uptime_string}")
@@ -658,8 +961,8 @@ class SystemMonitor(QWidget):
         except Exception as e:
             return f"Unknown ({e})"
         
-    def open_old_data_viewer(self, db_path):
-        self.viewer = OldDataViewer(db_path)  # Store as an instance variable
+    def open_old_data_viewer(self, db_path, tail=False):
+        self.viewer = OldDataViewer(db_path, tail=tail)  # Store as an instance variable
         self.viewer.show()
 
 
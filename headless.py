@@ -0,0 +1,132 @@
+"""Headless collector: samples metrics and logs them to db/ without any GUI.
+
+Only psutil (and pynvml when the GPU is sampled) are imported, never PyQt5 or
+pyqtgraph, so this can run as a service on machines without a display. The
+resulting session files open in the GUI's DB Files tab like any other.
+
+Example:
+    python headless.py --interval 1 --db-dir /var/lib/pc-monitor --sources cpu,ram,disk
+    python headless.py --aggregator monitor-host:9470
+"""
+import argparse
+import os
+import signal
+import sys
+from collector import MetricsCollector
+from network_sink import DEFAULT_PORT, DEFAULT_SPOOL_LIMIT, NetworkSink, parse_address
+from sources import SOURCES, default_rates, load_plugins
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record system metrics to a session database without a GUI.")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between samples of every source (default: 1)")
+    parser.add_argument("--db-dir", default="./db/",
+                        help="directory the session database is written to (default: ./db/)")
+    parser.add_argument("--sources", default=None,
+                        help=f"comma-separated sources to sample (default: all, i.e. {','.join(SOURCES)} "
+                             f"and those of plugins)")
+    parser.add_argument("--plugin", action="append", default=[], metavar="MODULE",
+                        help="import a module that registers extra sources (repeatable)")
+    parser.add_argument("--temp-chip", default=None,
+                        help="sensor chip to read the CPU temperature from (default: the first known one)")
+    parser.add_argument("--fan-chip", default=None,
+                        help="sensor chip to read fan speeds from (default: the first one with fans)")
+    parser.add_argument("--no-procfs", dest="procfs", action="store_false",
+                        help="sample through psutil even on Linux, instead of reading /proc and /sys directly")
+    parser.add_argument("--rate", action="append", default=[], metavar="SOURCE=HZ",
+                        help="override the rate of one source, e.g. --rate disk=0.2 (repeatable)")
+    parser.add_argument("--flush-interval", type=float, default=5.0,
+                        help="seconds between database commits (default: 5)")
+    parser.add_argument("--raw-retention", type=float, default=None, metavar="HOURS",
+                        help="delete raw samples older than this, keeping only the 10s/1m/1h rollups "
+                             "(default: keep everything)")
+    parser.add_argument("--log-overhead", action="store_true",
+                        help="also log the monitor's own CPU, memory and timing stats to overhead_metrics")
+    parser.add_argument("--aggregator", default=None, metavar="HOST[:PORT]",
+                        help=f"also push every flush to an aggregator (aggregator.py, default port {DEFAULT_PORT})")
+    parser.add_argument("--host-name", default=None,
+                        help="name of this machine in the aggregator's store (default: the hostname)")
+    parser.add_argument("--spool-dir", default=None,
+                        help="where batches wait while the aggregator is unreachable (default: DB_DIR/spool)")
+    parser.add_argument("--spool-limit", type=float, default=DEFAULT_SPOOL_LIMIT / 1048576, metavar="MB",
+                        help="most unsent data kept; the oldest batches are dropped beyond it "
+                             f"(default: {DEFAULT_SPOOL_LIMIT // 1048576})")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="stop after this many seconds instead of running until signalled")
+    args = parser.parse_args(argv)
+
+    if args.interval <= 0:
+        parser.error("--interval must be positive")
+    if args.raw_retention is not None and args.raw_retention <= 0:
+        parser.error("--raw-retention must be positive")
+    if args.aggregator is not None:
+        try:
+            args.aggregator = parse_address(args.aggregator)
+        except ValueError:
+            parser.error(f"invalid --aggregator: {args.aggregator}")
+    if args.spool_limit <= 0:
+        parser.error("--spool-limit must be positive")
+    try:
+        load_plugins(args.plugin)
+    except ImportError as e:
+        parser.error(f"cannot import plugin: {e}")
+    rates = default_rates()
+    if args.sources is None:
+        sources = list(rates)
+    else:
+        sources = [source.strip() for source in args.sources.split(",") if source.strip()]
+    unknown = [source for source in sources if source not in rates]
+    if unknown or not sources:
+        parser.error(f"unknown sources: {', '.join(unknown) or '(none given)'}")
+
+    if args.log_overhead and "overhead" not in sources:
+        parser.error("--log-overhead needs the overhead source")
+    rates = {source: (1.0 / args.interval if source in sources else 0) for source in rates}
+    for override in args.rate:
+        source, _, hz = override.partition("=")
+        if source not in sources:
+            parser.error(f"--rate given for a source that is not sampled: {source}")
+        try:
+            rates[source] = float(hz)
+        except ValueError:
+            parser.error(f"invalid --rate: {override}")
+    args.rates = rates
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.db_dir, exist_ok=True)
+    sinks = []
+    if args.aggregator is not None:
+        sinks.append(NetworkSink(args.aggregator, args.spool_dir or os.path.join(args.db_dir, "spool"),
+                                 spool_limit=int(args.spool_limit * 1048576), host_name=args.host_name))
+
+    collector = MetricsCollector(rates=args.rates, base_dir=args.db_dir,
+                                 flush_interval=args.flush_interval,
+                                 raw_retention=args.raw_retention * 3600 if args.raw_retention else None,
+                                 log_overhead=args.log_overhead,
+                                 source_options={"temp_chip": args.temp_chip, "fan_chip": args.fan_chip,
+                                                 "procfs": args.procfs},
+                                 sinks=sinks)
+
+    # SIGTERM (service stop) and Ctrl+C end the session cleanly: the collector
+    # flushes its buffer and writes session_metadata.end_time before exiting
+    def handle_signal(signum, frame):
+        collector.stop_event.set()
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    collector.start()
+    print(f"Recording {', '.join(collector.sources)} to {args.db_dir}", flush=True)
+    if args.duration is not None:
+        collector.stop_event.wait(args.duration)
+        collector.stop_event.set()
+    # Wake up regularly so signal handlers run in the main thread
+    while collector.is_alive():
+        collector.join(0.5)
+    if collector.backend is not None:
+        print(f"Session saved to {collector.backend.db_path}", flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
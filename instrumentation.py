@@ -0,0 +1,138 @@
+"""Measurements of the monitor's own overhead.
+
+The hot paths (each sampler's psutil/NVML calls, every collector tick, SQLite
+commits, the GUI's sample callback and redraws) record their duration here
+through the module-level `instruments`. Only the latest `window` values of
+each are kept, in ring buffers, so memory stays flat however long the monitor
+runs; summaries and histograms are computed from them on demand.
+
+The collector's "overhead" source samples the process's own CPU and RSS once
+per tick of that source, shows them in the GUI's Overhead tab and can log
+them to the overhead_metrics table.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+import psutil
+from ring_buffer import RingBuffer
+
+# Values kept per measurement
+DEFAULT_WINDOW = 1000
+# CPU use measured over less than this many seconds is mostly the rounding
+# of the CPU times; sample_process reports NaN instead
+MIN_CPU_INTERVAL = 0.1
+
+class RollingStats:
+    """The latest `window` values of one measurement."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.values = RingBuffer(window)
+        self.count = 0
+
+    def add(self, value):
+        self.values.append(value)
+        self.count += 1
+
+    def summary(self):
+        values = self.values.view()
+        if len(values) == 0:
+            return {"count": self.count}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"count": self.count, "mean": float(values.mean()), "p50": float(p50),
+                "p95": float(p95), "p99": float(p99), "max": float(values.max())}
+
+    def histogram(self, bins=20):
+        """(counts, edges) of the kept values."""
+        values = self.values.view()
+        if len(values) == 0:
+            return np.zeros(0), np.zeros(0)
+        return np.histogram(values, bins=bins)
+
+class Instrumentation:
+    """Rolling timings and counters shared by the collector, the logger and the GUI. Thread-safe."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.stats = {}
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.process = psutil.Process()
+        self.num_cpus = psutil.cpu_count() or 1
+        self.start_cpu_measurement()
+
+    def record(self, name, value):
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = RollingStats(self.window)
+            stats.add(value)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    @contextmanager
+    def timed(self, name):
+        """Record the duration of the with block, in seconds, under name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def start_cpu_measurement(self):
+        """Measure this process's CPU use from now on."""
+        self.cpu_start = (self._cpu_time(), time.monotonic())
+
+    def _cpu_time(self):
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+    def sample_process(self):
+        """Record and return this process's CPU use (percent of the whole machine) and RSS in MB.
+
+        The CPU use is over the time since the previous sample, or since
+        start_cpu_measurement; it is NaN, and not recorded, when that is
+        less than MIN_CPU_INTERVAL.
+        """
+        with self.process.oneshot():
+            cpu_time = self._cpu_time()
+            rss_mb = self.process.memory_info().rss / (1024 ** 2)
+        now = time.monotonic()
+        start_cpu, start_time = self.cpu_start
+        if now - start_time < MIN_CPU_INTERVAL:
+            # Too short to measure; the next sample covers this one too
+            cpu_percent = float("nan")
+        else:
+            percent = (cpu_time - start_cpu) / (now - start_time) / self.num_cpus * 100.0
+            cpu_percent = min(max(percent, 0.0), 100.0)
+            self.cpu_start = (cpu_time, now)
+            self.record("process.cpu_percent", cpu_percent)
+        self.record("process.rss_mb", rss_mb)
+        return {"cpu_percent": cpu_percent, "rss_mb": rss_mb}
+
+    def summary(self, name):
+        with self.lock:
+            stats = self.stats.get(name)
+            return stats.summary() if stats is not None else {"count": 0}
+
+    def summaries(self, prefix=""):
+        """{name: summary} of every measurement whose name starts with prefix."""
+        with self.lock:
+            return {name: stats.summary() for name, stats in sorted(self.stats.items())
+                    if name.startswith(prefix)}
+
+    def histogram(self, name, bins=20):
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                return np.zeros(0), np.zeros(0)
+            return stats.histogram(bins)
+
+    def counter(self, name):
+        with self.lock:
+            return self.counters[name]
+
+instruments = Instrumentation()
@@ -0,0 +1,240 @@
+"""Pushes a logger's flushed rows to an aggregator (aggregator.py) over TCP.
+
+NetworkSink is an extra sink of BackendLogger (see backend.Sink): every
+flush becomes one batch, compressed and written to a spool directory, and a
+background thread sends the spooled batches in order over one persistent
+connection. A batch is deleted once the aggregator acknowledges it, so
+batches written while the aggregator is unreachable are sent when it comes
+back. The spool is bounded; when it is full the oldest batches are dropped.
+
+On the wire every batch is one frame: FRAME (magic, payload length, batch
+sequence number) followed by the zlib-compressed JSON payload
+
+    {"host": "desk", "session": "2024-12-18_22-12-18",
+     "batches": {table: [rows in backend.INSERT_COLUMNS order]}}
+
+with BLOB values as {"$b": base64}. The aggregator answers with ACK (the
+sequence number) once the batch is committed to its store. Sequence numbers
+are microseconds since the epoch, unique per host, so a batch sent again
+after a lost acknowledgement is recognised and not stored twice.
+"""
+import base64
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from backend import Sink
+
+FRAME = struct.Struct("<4sIQ")
+FRAME_MAGIC = b"PCMN"
+ACK = struct.Struct("<Q")
+# Larger frames, and batches that decompress to more than MAX_BATCH bytes,
+# are refused by the aggregator
+MAX_FRAME = 64 * 1024 * 1024
+MAX_BATCH = 256 * 1024 * 1024
+DEFAULT_PORT = 9470
+SPOOL_SUFFIX = ".batch"
+DEFAULT_SPOOL_LIMIT = 100 * 1024 * 1024
+CONNECT_TIMEOUT = 5.0
+ACK_TIMEOUT = 30.0
+# Reconnect delays double from RECONNECT_MIN up to RECONNECT_MAX seconds
+RECONNECT_MIN = 0.5
+RECONNECT_MAX = 30.0
+
+def _encode_value(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$b": base64.b64encode(bytes(value)).decode("ascii")}
+    raise TypeError(f"cannot send {type(value).__name__}")
+
+def _decode_object(obj):
+    if len(obj) == 1 and "$b" in obj:
+        return base64.b64decode(obj["$b"])
+    return obj
+
+def encode_batch(host, session, batches, level=6):
+    message = {"host": host, "session": session, "batches": batches}
+    return zlib.compress(json.dumps(message, default=_encode_value, separators=(",", ":")).encode("utf-8"), level)
+
+def decode_batch(payload, max_size=MAX_BATCH):
+    """(host, session, batches) of an encode_batch payload.
+
+    Raises ValueError when it decompresses to more than max_size bytes or
+    is cut short, zlib.error when it is not zlib data.
+    """
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(payload, max_size)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"batch larger than {max_size} bytes")
+    if not decompressor.eof:
+        raise ValueError("truncated batch")
+    message = json.loads(data, object_hook=_decode_object)
+    if not isinstance(message, dict) or not isinstance(message.get("batches"), dict):
+        raise ValueError("not a batch")
+    return message["host"], message["session"], message["batches"]
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+def parse_address(text, default_port=DEFAULT_PORT):
+    """(host, port) of "host", "host:port" or "[v6 address]:port"."""
+    if text.startswith("["):
+        host, _, rest = text[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif text.count(":") == 1:
+        host, _, port = text.partition(":")
+    else:
+        host, port = text, ""
+    return host, int(port) if port else default_port
+
+class NetworkSink(Sink):
+    """Spools every flush and sends it to the aggregator at address (host, port).
+
+    host_name identifies this machine in the aggregator's store (the
+    hostname by default). At most spool_limit bytes of unsent batches are
+    kept in spool_dir; batches left there when the monitor stops are sent
+    by the next run.
+    """
+
+    def __init__(self, address, spool_dir, spool_limit=DEFAULT_SPOOL_LIMIT, host_name=None, level=6):
+        self.address = address
+        self.spool_dir = spool_dir
+        self.spool_limit = spool_limit
+        self.host_name = host_name or socket.gethostname()
+        self.level = level
+        self.session = None
+        os.makedirs(spool_dir, exist_ok=True)
+
+        # Size of every spooled batch by sequence number, oldest first
+        self.spooled = {}
+        for filename in sorted(os.listdir(spool_dir)):
+            if filename.endswith(SPOOL_SUFFIX):
+                seq = int(filename[:-len(SPOOL_SUFFIX)])
+                self.spooled[seq] = os.path.getsize(os.path.join(spool_dir, filename))
+        self.spooled_bytes = sum(self.spooled.values())
+        self.last_seq = max(self.spooled, default=0)
+        self.lock = threading.Lock()
+
+        self.sent_batches = 0
+        self.dropped_batches = 0
+        self.connected = False
+        self.sock = None
+        self.wake = threading.Event()
+        self.closing = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="NetworkSink", daemon=True)
+        self.thread.start()
+
+    def open_session(self, session):
+        self.session = session
+
+    def write(self, batches):
+        payload = encode_batch(self.host_name, self.session, batches, self.level)
+        with self.lock:
+            seq = self.last_seq = max(self.last_seq + 1, time.time_ns() // 1000)
+        path = self._spool_path(seq)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(payload)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print("Error spooling metrics for the aggregator:", e)
+            return
+        with self.lock:
+            self.spooled[seq] = len(payload)
+            self.spooled_bytes += len(payload)
+            # Over the limit the oldest batches go, but never the new one
+            while self.spooled_bytes > self.spool_limit and len(self.spooled) > 1:
+                oldest = next(iter(self.spooled))
+                self._discard(oldest)
+                if self.dropped_batches == 0:
+                    print(f"Aggregator spool full ({self.spool_limit / 1048576:.0f} MB); dropping the oldest batches")
+                self.dropped_batches += 1
+        self.wake.set()
+
+    def _spool_path(self, seq):
+        return os.path.join(self.spool_dir, f"{seq:020d}{SPOOL_SUFFIX}")
+
+    def _discard(self, seq):
+        # Called with the lock held
+        self.spooled_bytes -= self.spooled.pop(seq, 0)
+        try:
+            os.remove(self._spool_path(seq))
+        except FileNotFoundError:
+            pass
+
+    def _oldest(self):
+        with self.lock:
+            return next(iter(self.spooled), None)
+
+    def _connect(self):
+        self.sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.sock.settimeout(ACK_TIMEOUT)
+        self.connected = True
+        print(f"Connected to aggregator {self.address[0]}:{self.address[1]}")
+
+    def _disconnect(self, error):
+        if self.connected:
+            print(f"Lost connection to aggregator {self.address[0]}:{self.address[1]}:", error)
+        self.connected = False
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _send(self, seq):
+        try:
+            with open(self._spool_path(seq), "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            # Dropped from a full spool meanwhile
+            with self.lock:
+                self._discard(seq)
+            return
+        if self.sock is None:
+            self._connect()
+        self.sock.sendall(FRAME.pack(FRAME_MAGIC, len(payload), seq) + payload)
+        acked, = ACK.unpack(recv_exact(self.sock, ACK.size))
+        if acked != seq:
+            raise ConnectionError(f"aggregator acknowledged batch {acked} instead of {seq}")
+        with self.lock:
+            self._discard(seq)
+        self.sent_batches += 1
+
+    def run(self):
+        delay = RECONNECT_MIN
+        while True:
+            seq = self._oldest()
+            if seq is None:
+                if self.closing.is_set():
+                    break
+                self.wake.wait(1.0)
+                self.wake.clear()
+                continue
+            try:
+                self._send(seq)
+                delay = RECONNECT_MIN
+            except OSError as e:
+                self._disconnect(e)
+                # What is left stays spooled for the next run
+                if self.closing.is_set():
+                    break
+                self.closing.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.connected = False
+
+    def close(self, timeout=5.0):
+        """Send what is spooled for up to timeout seconds, then stop."""
+        self.closing.set()
+        self.wake.set()
+        self.thread.join(timeout)
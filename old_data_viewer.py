@@ -1,13 +1,288 @@
 import sqlite3
 import os
+import numpy as np
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QTabWidget
+from PyQt5.QtCore import QTimer, QThread, pyqtSignal
 import pyqtgraph as pg
+from backend import migrate_session, DEVICE_TABLES
+from session_query import SessionReader, SERIES, DEFAULT_MAX_POINTS
+from archive import ARCHIVE_SUFFIX, ArchiveReader
+
+# How often a viewer tailing a live session looks for new rows; the recorder
+# commits every few seconds (BackendLogger flush_interval)
+TAIL_INTERVAL_MS = 1000
+
+class SessionLoader(QThread):
+    """Loads the initial view of every table on a background thread.
+
+    table_loaded is emitted once per table, as soon as that table is ready, with
+    the payload of SessionReader.load_table (None for a table without data).
+
+    With migrate set, a session recorded by an older version is upgraded
+    first (backend.migrate_session), which may rebuild its rollups; the
+    queries read raw rows where the rollups do not exist yet.
+    """
+    table_loaded = pyqtSignal(str, object)
+
+    def __init__(self, reader, requests, max_points, migrate=False):
+        super().__init__()
+        self.reader = reader
+        self.requests = requests  # [(table, columns, cores, devices), ...]
+        self.max_points = max_points
+        self.migrate = migrate
+
+    def run(self):
+        if self.migrate:
+            migrate_session(self.reader.db_path)
+        for table, columns, cores, devices in self.requests:
+            if self.isInterruptionRequested():
+                return
+            try:
+                payload = self.reader.load_table(table, columns, cores, self.max_points, devices)
+            except (sqlite3.Error, ValueError) as e:
+                print(f"Error reading {table}:", e)
+                payload = None
+            self.table_loaded.emit(table, payload)
+
+class TablePlots:
+    """The plots of one metric table, with linked time axes.
+
+    Data is fetched through the session_query bucket queries, so only about
+    max_points points per curve are ever loaded. The first view arrives from the
+    SessionLoader through apply(); after that, zooming or panning re-queries the
+    visible time range once the view has settled.
+
+    When tailing a live session, tail() appends the rows recorded since the
+    last poll to the arrays already drawn instead of querying the range
+    again; they are only re-bucketed once they hold twice max_points.
+    """
+
+    def __init__(self, reader, table, max_points=DEFAULT_MAX_POINTS):
+        self.reader = reader
+        self.table = table
+        self.max_points = max_points
+        self.bounds = None
+        self.plots = []
+        self.series = []  # (column, mean_curve, min_curve, max_curve)
+        self.core_curves = None
+        self.device_plots = []  # (column, plot, {device: curve})
+        self.updating = False
+        # What the curves show, kept for tail() to append to
+        self.bucket_data = None
+        self.core_data = None
+        self.device_data = None
+        # Last rowids of the table and its device table that were drawn
+        self.rowids = [0, 0]
+
+        # Debounce range changes so a drag issues one query, not dozens
+        self.requery_timer = QTimer()
+        self.requery_timer.setSingleShot(True)
+        self.requery_timer.setInterval(150)
+        self.requery_timer.timeout.connect(self.refresh_visible)
+
+    def add_plot(self, title, columns):
+        """Add a plot with one curve per (column, pen, name) in columns; returns the PlotWidget."""
+        plot = pg.PlotWidget(title=title, axisItems={"bottom": pg.DateAxisItem()})
+        if self.plots:
+            plot.setXLink(self.plots[0])
+        else:
+            plot.getViewBox().sigXRangeChanged.connect(self.on_range_changed)
+        if len(columns) > 1:
+            plot.addLegend()
+
+        for column, pen, name in columns:
+            # Shade between the min and max of each bucket, mean on top
+            min_curve = plot.plot(pen=None)
+            max_curve = plot.plot(pen=None)
+            brush = pg.mkColor(pen)
+            brush.setAlpha(60)
+            plot.addItem(pg.FillBetweenItem(min_curve, max_curve, brush=brush))
+            mean_curve = plot.plot(pen=pen, name=name)
+            self.series.append((column, mean_curve, min_curve, max_curve))
+        self.plots.append(plot)
+        return plot
+
+    def add_core_plot(self, title):
+        # Only valid for cpu_metrics: one curve per core
+        plot = self.add_plot(title, [])
+        self.core_curves = (plot, [])
+        return plot
+
+    def add_device_plot(self, title, column):
+        """Add a plot of column with one mean curve per device (see backend.DEVICE_TABLES)."""
+        plot = self.add_plot(title, [])
+        plot.addLegend()
+        self.device_plots.append((column, plot, {}))
+        return plot
+
+    def apply(self, payload):
+        """Show the loaded whole-session view and fit the time axis to it."""
+        self.bounds = payload["bounds"]
+        self.rowids = list(payload.get("rowids", (0, 0)))
+        self.updating = True
+        try:
+            if payload["buckets"] is not None:
+                self.set_buckets(payload["buckets"])
+            if payload["cores"] is not None:
+                self.set_cores(*payload["cores"])
+            if payload.get("devices") is not None:
+                self.set_devices(payload["devices"])
+            for plot in self.plots:
+                plot.enableAutoRange(x=False)
+            self.plots[0].setXRange(self.bounds[0], self.bounds[1], padding=0)
+        finally:
+            self.updating = False
+
+    def on_range_changed(self, *args):
+        if not self.updating and self.bounds is not None:
+            self.requery_timer.start()
+
+    def refresh_visible(self):
+        start, end = self.plots[0].getViewBox().viewRange()[0]
+        # Only the part of the view that overlaps the session has data
+        start = max(start, self.bounds[0])
+        end = min(end, self.bounds[1])
+        if end > start:
+            self.refresh(start, end)
+
+    def refresh(self, start, end):
+        self.updating = True
+        try:
+            columns = [column for column, _, _, _ in self.series]
+            if columns:
+                self.set_buckets(self.reader.buckets(self.table, columns, start, end, self.max_points))
+            if self.core_curves is not None:
+                self.set_cores(*self.reader.core_usage(start, end, self.max_points))
+            if self.device_plots:
+                columns = [column for column, _, _ in self.device_plots]
+                self.set_devices(self.reader.device_buckets(self.table, columns, start, end, self.max_points))
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error reading {self.table}:", e)
+        finally:
+            self.updating = False
+
+    def tail(self):
+        """Append the rows recorded since the last call; returns whether there were any."""
+        columns = [column for column, _, _, _ in self.series]
+        device_columns = [column for column, _, _ in self.device_plots]
+        try:
+            self.rowids[0], rows = self.reader.new_rows(self.table, columns, self.rowids[0],
+                                                        self.core_curves is not None)
+            devices = {}
+            if device_columns:
+                self.rowids[1], devices = self.reader.new_device_rows(self.table, device_columns, self.rowids[1])
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error reading {self.table}:", e)
+            return False
+        times = rows["time"]
+        if len(times) == 0 and not devices:
+            return False
+
+        self.updating = True
+        try:
+            if len(times):
+                self.set_buckets(self.append_buckets(rows))
+                if self.core_curves is not None:
+                    self.append_cores(times, rows["core_usage"])
+            if devices:
+                self.set_devices(self.append_devices(devices))
+            if len(times):
+                self.follow(times[0], times[-1])
+        finally:
+            self.updating = False
+        # Keep the drawn arrays bounded: re-bucket the view once they grow
+        if self.bucket_data is not None and len(self.bucket_data["time"]) > 2 * self.max_points:
+            self.refresh_visible()
+        return True
+
+    def append_buckets(self, rows):
+        # A raw row is a bucket of one sample: its mean, min and max are the value
+        data = self.bucket_data
+        merged = {"time": rows["time"] if data is None else np.concatenate((data["time"], rows["time"]))}
+        for column, _, _, _ in self.series:
+            merged[column] = {stat: rows[column] if data is None else np.concatenate((data[column][stat], rows[column]))
+                              for stat in ("mean", "min", "max")}
+        return merged
+
+    def append_cores(self, times, usage):
+        if self.core_data is not None and len(self.core_data[1]) == len(usage):
+            times = np.concatenate((self.core_data[0], times))
+            usage = np.concatenate((self.core_data[1], usage), axis=1)
+        self.set_cores(times, usage)
+
+    def append_devices(self, devices):
+        merged = dict(self.device_data or {})
+        for device, rows in devices.items():
+            if device in merged:
+                rows = {key: np.concatenate((merged[device][key], values)) for key, values in rows.items()}
+            merged[device] = rows
+        return merged
+
+    def follow(self, first, last):
+        """Extend the bounds to the new rows and keep the end in view if it was shown."""
+        if self.bounds is None:
+            # The first rows of a table that was empty when opened
+            self.bounds = (first, last)
+            for plot in self.plots:
+                plot.enableAutoRange(x=False)
+            self.plots[0].setXRange(first, last, padding=0)
+            return
+        start, end = self.plots[0].getViewBox().viewRange()[0]
+        previous_end = self.bounds[1]
+        self.bounds = (self.bounds[0], max(last, previous_end))
+        if end >= previous_end:
+            # A view of the whole session grows with it; a zoomed one slides
+            if start > self.bounds[0]:
+                start += self.bounds[1] - previous_end
+            self.plots[0].setXRange(start, self.bounds[1], padding=0)
+
+    def set_buckets(self, data):
+        self.bucket_data = data
+        times = data["time"]
+        for column, mean_curve, min_curve, max_curve in self.series:
+            min_curve.setData(times, data[column]["min"])
+            max_curve.setData(times, data[column]["max"])
+            mean_curve.setData(times, data[column]["mean"])
+
+    def set_devices(self, data):
+        self.device_data = data
+        for column, plot, curves in self.device_plots:
+            for device in sorted(data):
+                if device not in curves:
+                    pen = pg.intColor(len(curves), hues=max(len(data), 8))
+                    curves[device] = plot.plot(pen=pen, name=device)
+            for device, curve in curves.items():
+                if device in data:
+                    curve.setData(data[device]["time"], data[device][column])
+                else:
+                    # No samples of this device in the visible range
+                    curve.setData([], [])
+
+    def set_cores(self, times, usage):
+        if usage is None:
+            return
+        self.core_data = (times, usage)
+        plot, curves = self.core_curves
+        while len(curves) < len(usage):
+            curves.append(plot.plot(pen=pg.intColor(len(curves), hues=len(usage))))
+        for curve, series in zip(curves, usage):
+            curve.setData(times, series)
 
 class OldDataViewer(QWidget):
-    def __init__(self, db_path):
+    """Plots of a recorded session.
+
+    With tail set, the session is one still being recorded: it is read
+    through the same read-only connection, and every TAIL_INTERVAL_MS the
+    tabs that are built append the rows written since (TablePlots.tail).
+    """
+
+    def __init__(self, db_path, max_points=DEFAULT_MAX_POINTS, tail=False):
         super().__init__()
         self.db_path = db_path
-        self.setWindowTitle(f"Old Data Viewer - {os.path.basename(db_path)}")
+        self.max_points = max_points
+        self.tail = tail and not db_path.endswith(ARCHIVE_SUFFIX)
+        title = "Live Session" if self.tail else "Old Data Viewer"
+        self.setWindowTitle(f"{title} - {os.path.basename(db_path)}")
         self.setGeometry(200, 200, 800, 600)
 
         self.layout = QVBoxLayout(self)
@@ -19,217 +294,143 @@ class OldDataViewer(QWidget):
             self.layout.addWidget(QLabel("Database file not found."))
             return
 
-        # Create all tabs
-        self.create_cpu_tab()
-        self.create_gpu_tab()
-        self.create_ram_tab()
-        self.create_network_tab()
-        self.create_disk_tab()
-
-    def create_cpu_tab(self):
-        cpu_tab = QWidget()
-        vlayout = QVBoxLayout(cpu_tab)
-        cpu_data = self.get_cpu_data()
-
-        if not cpu_data:
-            vlayout.addWidget(QLabel("No CPU data available."))
-            self.tabs.addTab(cpu_tab, "CPU")
-            return
-
-        # Plot average CPU usage over time
-        times = []
-        avg_usages = []
-        for row in cpu_data:
-            usage_vals = [float(x) for x in row[1].split(',') if x.strip()]
-            if usage_vals:
-                avg_usage = sum(usage_vals) / len(usage_vals)
-                avg_usages.append(avg_usage)
-                times.append(row[0])
-
-        if times and avg_usages:
-            indices = list(range(len(times)))
-            plot_widget = pg.PlotWidget(title="Historical CPU Usage (%)")
-            plot_widget.plot(indices, avg_usages, pen='y')
-            vlayout.addWidget(plot_widget)
+        if self.db_path.endswith(ARCHIVE_SUFFIX):
+            # Archives (archive.py) answer the same queries from NumPy arrays
+            try:
+                self.reader = ArchiveReader(self.db_path)
+            except (OSError, ValueError) as e:
+                self.layout.addWidget(QLabel(f"Could not open archive: {e}"))
+                return
         else:
-            vlayout.addWidget(QLabel("No valid CPU usage data to plot."))
-        self.tabs.addTab(cpu_tab, "CPU")
-
-    def create_gpu_tab(self):
-        gpu_tab = QWidget()
-        vlayout = QVBoxLayout(gpu_tab)
-        gpu_data = self.get_gpu_data()
-
-        if not gpu_data:
-            vlayout.addWidget(QLabel("No GPU data available."))
-            self.tabs.addTab(gpu_tab, "GPU")
+            self.reader = SessionReader(self.db_path)
+        self.table_plots = {}
+        self.payloads = {}
+
+        # Tabs start empty and their plots are built the first time they are
+        # shown. The data of every table is loaded in the background meanwhile,
+        # and a built tab fills in as soon as its table is ready.
+        self.tab_pages = {}
+        self.add_lazy_tab("cpu_metrics", "CPU", self.create_cpu_tab)
+        self.add_lazy_tab("gpu_metrics", "GPU", self.create_gpu_tab)
+        self.add_lazy_tab("ram_metrics", "RAM", self.create_ram_tab)
+        self.add_lazy_tab("network_metrics", "Network", self.create_network_tab)
+        self.add_lazy_tab("disk_metrics", "Disk", self.create_disk_tab)
+
+        requests = [(table, list(SERIES[table]), table == "cpu_metrics", table in DEVICE_TABLES)
+                    for table in self.tab_pages]
+        # Sessions recorded by older versions are upgraded by the loader, off
+        # the GUI thread; a live session is already current and only ever read
+        migrate = not self.tail and isinstance(self.reader, SessionReader)
+        self.loader = SessionLoader(self.reader, requests, self.max_points, migrate)
+        self.loader.table_loaded.connect(self.on_table_loaded)
+        self.loader.start()
+
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.on_tab_changed(self.tabs.currentIndex())
+
+        if self.tail:
+            self.tail_timer = QTimer()
+            self.tail_timer.timeout.connect(self.poll_session)
+            self.tail_timer.start(TAIL_INTERVAL_MS)
+
+    def poll_session(self):
+        # Tabs that were never shown catch up from their payload's rowids when built
+        for table, plots in self.table_plots.items():
+            if table in self.payloads and plots.tail():
+                self.tab_pages[table]["loading_label"].hide()
+
+    def add_lazy_tab(self, table, tab_name, builder):
+        tab = QWidget()
+        vlayout = QVBoxLayout(tab)
+        loading_label = QLabel(f"Loading {tab_name} data...")
+        vlayout.addWidget(loading_label)
+        self.tabs.addTab(tab, tab_name)
+        self.tab_pages[table] = {"tab": tab, "name": tab_name, "layout": vlayout,
+                                 "loading_label": loading_label, "builder": builder}
+
+    def on_tab_changed(self, index):
+        tab = self.tabs.widget(index)
+        for table, page in self.tab_pages.items():
+            if page["tab"] is tab and table not in self.table_plots:
+                page["builder"]()
+                if table in self.payloads:
+                    self.show_table(table)
+
+    def create_table_tab(self, table):
+        """Set up the plots of a metric table's tab. Returns (layout, TablePlots)."""
+        plots = TablePlots(self.reader, table, self.max_points)
+        self.table_plots[table] = plots
+        return self.tab_pages[table]["layout"], plots
+
+    def on_table_loaded(self, table, payload):
+        self.payloads[table] = payload
+        if table in self.table_plots:
+            self.show_table(table)
+
+    def show_table(self, table):
+        page = self.tab_pages[table]
+        page["loading_label"].hide()
+        plots = self.table_plots[table]
+        payload = self.payloads[table]
+        if payload is None and self.tail:
+            # Nothing recorded yet; rows are picked up as they arrive
+            page["loading_label"].setText(f"Waiting for {page['name']} data...")
+            page["loading_label"].show()
             return
+        if payload is None:
+            for plot in plots.plots:
+                plot.hide()
+            page["layout"].addWidget(QLabel(f"No {page['name']} data available."))
+            return
+        plots.apply(payload)
 
-        # gpu_data = [(timestamp, gpu_usage, gpu_mem_usage, gpu_temp, gpu_fan), ...]
-        # We'll plot GPU usage and memory usage on separate graphs for example
-        times = list(range(len(gpu_data)))
-        gpu_usages = [row[1] for row in gpu_data]
-        gpu_mem_usages = [row[2] for row in gpu_data]
-        gpu_temps = [row[3] for row in gpu_data]
-        gpu_fans = [row[4] for row in gpu_data]
-
-        # GPU usage
-        usage_plot = pg.PlotWidget(title="GPU Usage (%)")
-        usage_plot.plot(times, gpu_usages, pen='r')
-        vlayout.addWidget(usage_plot)
-
-        # GPU Memory Usage
-        mem_plot = pg.PlotWidget(title="GPU Memory Usage (MB)")
-        mem_plot.plot(times, gpu_mem_usages, pen='g')
-        vlayout.addWidget(mem_plot)
+    def create_cpu_tab(self):
+        vlayout, plots = self.create_table_tab("cpu_metrics")
 
-        # GPU Temperature
-        temp_plot = pg.PlotWidget(title="GPU Temperature (°C)")
-        temp_plot.plot(times, gpu_temps, pen='b')
-        vlayout.addWidget(temp_plot)
+        # Average CPU usage over time, then usage of every core
+        vlayout.addWidget(plots.add_plot("Historical CPU Usage (%)", [("avg_usage", 'y', "Usage")]))
+        vlayout.addWidget(plots.add_core_plot("Historical CPU Usage per Core (%)"))
+        vlayout.addWidget(plots.add_plot("CPU Temperature (°C)", [("cpu_temp", 'r', "Temperature")]))
 
-        # GPU Fan Speed
-        fan_plot = pg.PlotWidget(title="GPU Fan Speed (%)")
-        fan_plot.plot(times, gpu_fans, pen='c')
-        vlayout.addWidget(fan_plot)
+    def create_gpu_tab(self):
+        vlayout, plots = self.create_table_tab("gpu_metrics")
 
-        self.tabs.addTab(gpu_tab, "GPU")
+        vlayout.addWidget(plots.add_plot("GPU Usage (%)", [("gpu_usage", 'r', "Usage")]))
+        vlayout.addWidget(plots.add_plot("GPU Memory Usage (MB)", [("gpu_mem_usage", 'g', "Memory")]))
+        vlayout.addWidget(plots.add_plot("GPU Temperature (°C)", [("gpu_temp", 'b', "Temperature")]))
+        vlayout.addWidget(plots.add_plot("GPU Fan Speed (%)", [("gpu_fan", 'c', "Fan")]))
 
     def create_ram_tab(self):
-        ram_tab = QWidget()
-        vlayout = QVBoxLayout(ram_tab)
-        ram_data = self.get_ram_data()
-
-        if not ram_data:
-            vlayout.addWidget(QLabel("No RAM data available."))
-            self.tabs.addTab(ram_tab, "RAM")
-            return
+        vlayout, plots = self.create_table_tab("ram_metrics")
 
-        times = list(range(len(ram_data)))
-        usages = [row[1] for row in ram_data]
-
-        if usages:
-            plot_widget = pg.PlotWidget(title="Historical RAM Usage (%)")
-            plot_widget.plot(times, usages, pen='g')
-            vlayout.addWidget(plot_widget)
-        else:
-            vlayout.addWidget(QLabel("No valid RAM usage data to plot."))
-
-        self.tabs.addTab(ram_tab, "RAM")
+        vlayout.addWidget(plots.add_plot("Historical RAM Usage (%)", [("ram_usage", 'g', "Usage")]))
 
     def create_network_tab(self):
-        network_tab = QWidget()
-        vlayout = QVBoxLayout(network_tab)
-        net_data = self.get_network_data()
-
-        if not net_data:
-            vlayout.addWidget(QLabel("No Network data available."))
-            self.tabs.addTab(network_tab, "Network")
-            return
-
-        # net_data = [(timestamp, download_speed, upload_speed), ...]
-        times = list(range(len(net_data)))
-        downloads = [row[1] for row in net_data]
-        uploads = [row[2] for row in net_data]
-
-        if downloads or uploads:
-            plot_widget = pg.PlotWidget(title="Network Speeds (KB/s)")
-            plot_widget.addLegend()
-            plot_widget.plot(times, downloads, pen='c', name='Download')
-            plot_widget.plot(times, uploads, pen='m', name='Upload')
-            vlayout.addWidget(plot_widget)
-        else:
-            vlayout.addWidget(QLabel("No valid Network data to plot."))
+        vlayout, plots = self.create_table_tab("network_metrics")
 
-        self.tabs.addTab(network_tab, "Network")
+        vlayout.addWidget(plots.add_plot("Network Speeds (KB/s)", [
+            ("download_speed", 'c', "Download"),
+            ("upload_speed", 'm', "Upload"),
+        ]))
+        vlayout.addWidget(plots.add_device_plot("Download per Interface (KB/s)", "download_speed"))
+        vlayout.addWidget(plots.add_device_plot("Upload per Interface (KB/s)", "upload_speed"))
 
     def create_disk_tab(self):
-        disk_tab = QWidget()
-        vlayout = QVBoxLayout(disk_tab)
-        disk_data = self.get_disk_data()
-
-        if not disk_data:
-            vlayout.addWidget(QLabel("No Disk data available."))
-            self.tabs.addTab(disk_tab, "Disk")
-            return
-
-        # disk_data = [(timestamp, read_speed, write_speed), ...]
-        times = list(range(len(disk_data)))
-        reads = [row[1] for row in disk_data]
-        writes = [row[2] for row in disk_data]
-
-        if reads or writes:
-            plot_widget = pg.PlotWidget(title="Disk I/O Speeds (KB/s)")
-            plot_widget.addLegend()
-            plot_widget.plot(times, reads, pen='y', name='Read')
-            plot_widget.plot(times, writes, pen='w', name='Write')
-            vlayout.addWidget(plot_widget)
-        else:
-            vlayout.addWidget(QLabel("No valid Disk data to plot."))
-
-        self.tabs.addTab(disk_tab, "Disk")
-
-    def get_cpu_data(self):
-        # Retrieve CPU metrics from the DB
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT timestamp, core_usage, cpu_temp, fan_speeds FROM cpu_metrics ORDER BY timestamp ASC")
-            rows = cursor.fetchall()
-            conn.close()
-            return rows
-        except Exception as e:
-            print("Error reading CPU data:", e)
-            return []
-
-    def get_gpu_data(self):
-        # Retrieve GPU metrics from the DB
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT timestamp, gpu_usage, gpu_mem_usage, gpu_temp, gpu_fan FROM gpu_metrics ORDER BY timestamp ASC")
-            rows = cursor.fetchall()
-            conn.close()
-            return rows
-        except Exception as e:
-            print("Error reading GPU data:", e)
-            return []
-
-    def get_ram_data(self):
-        # Retrieve RAM metrics from the DB
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT timestamp, ram_usage FROM ram_metrics ORDER BY timestamp ASC")
-            rows = cursor.fetchall()
-            conn.close()
-            return rows
-        except Exception as e:
-            print("Error reading RAM data:", e)
-            return []
-
-    def get_network_data(self):
-        # Retrieve Network metrics from the DB
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT timestamp, download_speed, upload_speed FROM network_metrics ORDER BY timestamp ASC")
-            rows = cursor.fetchall()
-            conn.close()
-            return rows
-        except Exception as e:
-            print("Error reading Network data:", e)
-            return []
-
-    def get_disk_data(self):
-        # Retrieve Disk metrics from the DB
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT timestamp, read_speed, write_speed FROM disk_metrics ORDER BY timestamp ASC")
-            rows = cursor.fetchall()
-            conn.close()
-            return rows
-        except Exception as e:
-            print("Error reading Disk data:", e)
-            return []
+        vlayout, plots = self.create_table_tab("disk_metrics")
+
+        vlayout.addWidget(plots.add_plot("Disk I/O Speeds (KB/s)", [
+            ("read_speed", 'y', "Read"),
+            ("write_speed", 'w', "Write"),
+        ]))
+        vlayout.addWidget(plots.add_device_plot("Read per Disk (KB/s)", "read_speed"))
+        vlayout.addWidget(plots.add_device_plot("Write per Disk (KB/s)", "write_speed"))
+
+    def closeEvent(self, event):
+        if getattr(self, "tail_timer", None) is not None:
+            self.tail_timer.stop()
+        if getattr(self, "reader", None) is not None:
+            self.loader.requestInterruption()
+            self.loader.wait()
+            self.reader.close()
+            self.reader = None
+        event.accept()
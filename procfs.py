@@ -0,0 +1,163 @@
+"""Direct readers of /proc and /sys for the Linux sampling hot path.
+
+psutil reopens and re-parses its files on every call and builds namedtuples
+of every value; sensors_temperatures() and sensors_fans() walk every hwmon
+device each time. The readers here open the files a source needs once, in
+discover(), and re-read them every tick with a single preadv() into a
+preallocated buffer, parsing only the values the source uses.
+
+Only Linux has these files; elsewhere AVAILABLE is False and the sources use
+psutil. The values match the psutil calls they replace (see sources.py);
+bench.py --only procfs compares the two paths.
+"""
+import glob
+import os
+import re
+import sys
+import numpy as np
+
+AVAILABLE = sys.platform.startswith("linux") and hasattr(os, "preadv") and os.path.exists("/proc/stat")
+
+# Like psutil.PROCFS_PATH, e.g. a host's /proc mounted into a container
+PROC_ROOT = "/proc"
+HWMON_ROOT = "/sys/class/hwmon"
+# Block devices count in 512-byte sectors, whatever their sector size
+SECTOR_SIZE = 512
+INPUT_RE = re.compile(r"^(temp|fan)(\d+)_input$")
+
+class ProcFile:
+    """A file kept open and re-read from the start with preadv into a reused buffer."""
+
+    def __init__(self, path, size=4096):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buffer = bytearray(size)
+
+    def read(self):
+        while True:
+            n = os.preadv(self.fd, [self.buffer], 0)
+            if n < len(self.buffer):
+                return bytes(memoryview(self.buffer)[:n])
+            # The file outgrew the buffer (e.g. more interfaces); read it again
+            self.buffer = bytearray(len(self.buffer) * 2)
+
+    def read_int(self):
+        return int(self.read())
+
+    def close(self):
+        os.close(self.fd)
+
+class CpuTimes:
+    """Usage of every logical core from /proc/stat, as psutil.cpu_percent(percpu=True) reports it."""
+
+    def __init__(self):
+        self.file = ProcFile(os.path.join(PROC_ROOT, "stat"))
+        self.last = self._times()
+
+    def _times(self):
+        # cpuN lines: user nice system idle iowait irq softirq steal guest guest_nice;
+        # guest time is already counted in user and nice
+        lines = self.file.read().split(b"\n")
+        return np.array([line.split()[1:9] for line in lines if line[:3] == b"cpu" and line[3:4].isdigit()],
+                        dtype=np.int64)
+
+    def usage(self):
+        times = self._times()
+        if times.shape != self.last.shape:
+            # A core went on- or offline; start over
+            self.last = times
+            return [0.0] * len(times)
+        delta = times - self.last
+        self.last = times
+        total = delta.sum(axis=1)
+        # Busy is all but idle and iowait; computed in place, this runs every tick
+        percent = (total - delta[:, 3] - delta[:, 4]) * 100.0
+        percent /= np.maximum(total, 1)
+        np.clip(percent, 0.0, 100.0, out=percent)
+        return np.round(percent, 1, out=percent).tolist()
+
+class MemInfo:
+    """Used RAM in percent from /proc/meminfo, as psutil.virtual_memory().percent reports it."""
+
+    def __init__(self):
+        self.file = ProcFile(os.path.join(PROC_ROOT, "meminfo"))
+        # The lines keep their order, so their positions are looked up once
+        lines = self.file.read().split(b"\n")
+        keys = [line.split(b":", 1)[0] for line in lines]
+        self.total_line = keys.index(b"MemTotal")
+        self.available_line = keys.index(b"MemAvailable")
+
+    def percent(self):
+        lines = self.file.read().split(b"\n")
+        total = int(lines[self.total_line].split()[1])
+        available = int(lines[self.available_line].split()[1])
+        return round((total - available) / total * 100, 1)
+
+class NetDev:
+    """Byte counters of every interface from /proc/net/dev.
+
+    read() returns (names, int64 array of (bytes_recv, bytes_sent) per
+    interface), the shape DeviceCounters takes.
+    """
+
+    def __init__(self):
+        self.file = ProcFile(os.path.join(PROC_ROOT, "net", "dev"))
+
+    def read(self):
+        names, rows = [], []
+        # Two header lines, then "name: 8 receive counters, 8 transmit counters"
+        for line in self.file.read().split(b"\n")[2:]:
+            if not line:
+                continue
+            name, counters = line.split(b":", 1)
+            counters = counters.split()
+            names.append(name.strip().decode())
+            rows.append((counters[0], counters[8]))
+        return names, np.array(rows, dtype=np.int64).reshape(len(names), 2)
+
+class DiskStats:
+    """Byte counters of every block device from /proc/diskstats.
+
+    read() returns (names, int64 array of (read_bytes, write_bytes) per
+    device), the shape DeviceCounters takes.
+    """
+
+    def __init__(self):
+        self.file = ProcFile(os.path.join(PROC_ROOT, "diskstats"))
+
+    def read(self):
+        names, rows = [], []
+        # major minor name reads merged sectors_read ms writes merged sectors_written ...
+        for line in self.file.read().split(b"\n"):
+            fields = line.split()
+            if len(fields) < 10:
+                continue
+            names.append(fields[2].decode())
+            rows.append((fields[5], fields[9]))
+        sectors = np.array(rows, dtype=np.int64).reshape(len(names), 2)
+        return names, sectors * SECTOR_SIZE
+
+def hwmon_inputs(chip, kind, root=HWMON_ROOT):
+    """[(label, path)] of the kind ("temp" or "fan") inputs of the hwmon devices named chip, in index order.
+
+    Labels are those of the *_label files, or "" as in psutil.
+    """
+    inputs = []
+    for name_path in sorted(glob.glob(os.path.join(root, "hwmon*", "name"))):
+        with open(name_path) as f:
+            if f.read().strip() != chip:
+                continue
+        directory = os.path.dirname(name_path)
+        found = []
+        for filename in os.listdir(directory):
+            match = INPUT_RE.match(filename)
+            if match and match.group(1) == kind:
+                found.append((int(match.group(2)), filename))
+        for index, filename in sorted(found):
+            label_path = os.path.join(directory, f"{kind}{index}_label")
+            label = ""
+            if os.path.exists(label_path):
+                with open(label_path) as f:
+                    label = f.read().strip()
+            inputs.append((label, os.path.join(directory, filename)))
+    return inputs
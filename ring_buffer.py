@@ -0,0 +1,47 @@
+import numpy as np
+
+class RingBuffer:
+    """Fixed-size series backed by a preallocated NumPy array.
+
+    Every value is written twice, at index i and i + capacity, so the latest
+    `capacity` values always sit in one contiguous slice. view() returns that
+    slice in oldest-to-newest order without copying, which can be handed straight
+    to pyqtgraph's setData. Appending is O(1) regardless of capacity.
+
+    With rows set, the buffer holds that many series side by side (e.g. one row
+    per CPU core) and append() takes one value per row; view() then returns a
+    (rows, n) array whose row i is series i.
+    """
+
+    def __init__(self, capacity, rows=None, dtype=np.float64):
+        self.capacity = capacity
+        self.rows = rows
+        shape = (2 * capacity,) if rows is None else (rows, 2 * capacity)
+        self.data = np.zeros(shape, dtype=dtype)
+        self.index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        i = self.index
+        self.data[..., i] = value
+        self.data[..., i + self.capacity] = value
+        self.index = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def view(self):
+        """Return the buffered values, oldest first, as a view into the buffer."""
+        end = self.index + self.capacity if self.count == self.capacity else self.index
+        return self.data[..., end - self.count:end]
+
+    def latest(self):
+        if self.count == 0:
+            return None
+        return self.data[..., self.index - 1 + self.capacity]
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
@@ -0,0 +1,194 @@
+"""Persistent index of the session databases in a db/ directory.
+
+The catalog lives next to the sessions in _catalog.sqlite (not .db, so it is
+never listed as a session). Session databases and their columnar archives
+(archive.py) are both listed. It holds each session's start/end time, sample
+counts, time bounds per table and file size, so the DB Files tab and
+cross-session queries can list sessions with one query instead of opening
+every file. BackendLogger records sessions as they open and close; files
+changed, added or removed behind its back are picked up by refresh(), which
+compares each file's mtime and size with the catalog.
+"""
+import os
+import sqlite3
+import threading
+from backend import METRIC_TABLES
+from archive import ARCHIVE_SUFFIX, ArchiveReader
+
+CATALOG_NAME = "_catalog.sqlite"
+
+def file_stat(path):
+    """(mtime_ns, size) of a session file, or None if it does not exist.
+
+    A live session mostly grows its -wal file, so that is included: the
+    latest mtime and the total size of both.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    mtime_ns, size = st.st_mtime_ns, st.st_size
+    try:
+        wal = os.stat(path + "-wal")
+        mtime_ns, size = max(mtime_ns, wal.st_mtime_ns), size + wal.st_size
+    except OSError:
+        pass
+    return mtime_ns, size
+
+def scan_session(conn):
+    """Read the catalog details of one session through an open connection."""
+    from session_query import get_time_bounds
+    info = {"start_time": None, "end_time": None, "tables": {}}
+    try:
+        row = conn.execute(
+            "SELECT start_time, end_time FROM session_metadata ORDER BY id DESC LIMIT 1").fetchone()
+        if row:
+            info["start_time"], info["end_time"] = row
+    except sqlite3.Error:
+        pass
+    for table in METRIC_TABLES:
+        try:
+            rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            bounds = get_time_bounds(conn, table)
+        except sqlite3.Error:
+            continue
+        info["tables"][table] = (rows,) + (bounds or (None, None))
+    return info
+
+def scan_archive(path):
+    """The catalog details of a session archive, from its index."""
+    info = {"start_time": None, "end_time": None, "tables": {}}
+    try:
+        reader = ArchiveReader(path)
+    except (OSError, ValueError) as e:
+        print(f"Could not read {path}:", e)
+        return info
+    try:
+        info["start_time"] = reader.metadata["start_time"]
+        info["end_time"] = reader.metadata["end_time"]
+        for table in METRIC_TABLES:
+            info["tables"][table] = (reader.rows(table),) + (reader.time_bounds(table) or (None, None))
+    finally:
+        reader.close()
+    return info
+
+def is_session_file(name):
+    return name.endswith(".db") or name.endswith(ARCHIVE_SUFFIX)
+
+class SessionCatalog:
+    """The catalog of one db/ directory. Safe to share between threads."""
+
+    def __init__(self, db_dir="db"):
+        self.db_dir = db_dir
+        os.makedirs(db_dir, exist_ok=True)
+        self.path = os.path.join(db_dir, CATALOG_NAME)
+        self.lock = threading.Lock()
+        # The GUI and a headless collector may write at the same time
+        self.conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                filename TEXT PRIMARY KEY,
+                start_time TEXT,
+                end_time TEXT,
+                sample_rows INTEGER,
+                first_sample REAL,
+                last_sample REAL,
+                size INTEGER,
+                mtime_ns INTEGER
+            )
+            """)
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_tables (
+                filename TEXT,
+                table_name TEXT,
+                sample_rows INTEGER,
+                first_sample REAL,
+                last_sample REAL,
+                PRIMARY KEY (filename, table_name)
+            )
+            """)
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def record(self, db_path, info):
+        """Store the details of a session (as returned by scan_session) with the file's current stat."""
+        filename = os.path.basename(db_path)
+        stat = file_stat(db_path) or (None, None)
+        tables = info["tables"]
+        firsts = [t[1] for t in tables.values() if t[1] is not None]
+        lasts = [t[2] for t in tables.values() if t[2] is not None]
+        with self.lock, self.conn:
+            self.conn.execute("""
+            INSERT OR REPLACE INTO sessions
+                (filename, start_time, end_time, sample_rows, first_sample, last_sample, size, mtime_ns)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (filename, info["start_time"], info["end_time"], sum(t[0] for t in tables.values()),
+                  min(firsts) if firsts else None, max(lasts) if lasts else None, stat[1], stat[0]))
+            self.conn.execute("DELETE FROM session_tables WHERE filename = ?", (filename,))
+            self.conn.executemany("""
+            INSERT INTO session_tables (filename, table_name, sample_rows, first_sample, last_sample)
+            VALUES (?, ?, ?, ?, ?)
+            """, [(filename, table) + values for table, values in tables.items()])
+
+    def record_file(self, db_path):
+        """Scan a session file read-only and store its details."""
+        if db_path.endswith(ARCHIVE_SUFFIX):
+            self.record(db_path, scan_archive(db_path))
+            return
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            try:
+                info = scan_session(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Could not read {db_path}:", e)
+            info = {"start_time": None, "end_time": None, "tables": {}}
+        self.record(db_path, info)
+
+    def rename(self, old_path, new_path):
+        with self.lock, self.conn:
+            old, new = os.path.basename(old_path), os.path.basename(new_path)
+            self.conn.execute("DELETE FROM sessions WHERE filename = ?", (new,))
+            self.conn.execute("DELETE FROM session_tables WHERE filename = ?", (new,))
+            self.conn.execute("UPDATE sessions SET filename = ? WHERE filename = ?", (new, old))
+            self.conn.execute("UPDATE session_tables SET filename = ? WHERE filename = ?", (new, old))
+
+    def refresh(self):
+        """Bring the catalog in line with the directory: rescan new and changed files, drop deleted ones."""
+        with self.lock:
+            known = {row[0]: (row[1], row[2])
+                     for row in self.conn.execute("SELECT filename, mtime_ns, size FROM sessions")}
+        present = set()
+        for entry in os.scandir(self.db_dir):
+            if not is_session_file(entry.name) or not entry.is_file():
+                continue
+            present.add(entry.name)
+            if known.get(entry.name) != file_stat(entry.path):
+                self.record_file(entry.path)
+        gone = [(name,) for name in known if name not in present]
+        if gone:
+            with self.lock, self.conn:
+                self.conn.executemany("DELETE FROM sessions WHERE filename = ?", gone)
+                self.conn.executemany("DELETE FROM session_tables WHERE filename = ?", gone)
+
+    def sessions(self):
+        """All sessions, oldest filename first, as dicts of the sessions columns."""
+        with self.lock:
+            cursor = self.conn.execute("SELECT * FROM sessions ORDER BY filename")
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def table_bounds(self, table):
+        """{filename: (first, last)} of every session with samples of table."""
+        with self.lock:
+            return {row[0]: (row[1], row[2]) for row in self.conn.execute("""
+            SELECT filename, first_sample, last_sample FROM session_tables
+            WHERE table_name = ? AND first_sample IS NOT NULL
+            """, (table,))}
@@ -0,0 +1,471 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from backend import unpack_floats, core_average, ROLLUP_RESOLUTIONS, rollup_table, DEVICE_TABLES, DEVICES_TABLE
+
+# Seconds since the Unix epoch for a stored (UTC) timestamp. julianday() is
+# off by some microseconds; timestamps have milliseconds, so rounding to
+# them gives the exact value and rows on a range bound are not dropped.
+EPOCH_EXPR = "ROUND((julianday(timestamp) - 2440587.5) * 86400.0, 3)"
+
+# Plottable series of every metric table, as SQL expressions. core_avg() is
+# registered by open_session and covers rows written before avg_usage existed.
+SERIES = {
+    "cpu_metrics": {
+        "avg_usage": "COALESCE(avg_usage, core_avg(core_usage))",
+        "cpu_temp": "cpu_temp",
+    },
+    "gpu_metrics": {
+        "gpu_usage": "gpu_usage",
+        "gpu_mem_usage": "gpu_mem_usage",
+        "gpu_temp": "gpu_temp",
+        "gpu_fan": "gpu_fan",
+    },
+    "ram_metrics": {"ram_usage": "ram_usage"},
+    "network_metrics": {"download_speed": "download_speed", "upload_speed": "upload_speed"},
+    "disk_metrics": {"read_speed": "read_speed", "write_speed": "write_speed"},
+}
+
+DEFAULT_MAX_POINTS = 2000
+
+# Rows converted at a time when filling arrays from a cursor
+FETCH_CHUNK_ROWS = 4096
+
+# Columns holding one packed float list per row
+LIST_COLUMNS = ("core_usage", "fan_speeds")
+
+def open_session(db_path):
+    """Open a session database read-only with the SQL helpers the queries below need."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False,
+                           cached_statements=256)
+    conn.create_function("core_avg", 1, core_average, deterministic=True)
+    return conn
+
+def to_timestamp_text(epoch_seconds):
+    """Format epoch seconds like a stored timestamp, truncated to whole seconds."""
+    return datetime.fromtimestamp(epoch_seconds, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def series_expr(conn, table, column):
+    expr = SERIES[table][column]
+    if table == "cpu_metrics" and column == "avg_usage":
+        # Sessions that could not be migrated have no avg_usage column
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(cpu_metrics)")]
+        if "avg_usage" not in columns:
+            expr = "core_avg(core_usage)"
+    return expr
+
+def range_clause(start, end):
+    # Timestamps are compared as text so the timestamp index is used; the
+    # bounds are widened to whole seconds and refined on the epoch value
+    text_start = to_timestamp_text(start)
+    text_end = to_timestamp_text(end + 1)
+    return "timestamp >= ? AND timestamp < ?", (text_start, text_end)
+
+def get_rollups(conn, table):
+    """Rollup tables of a metric table present in this session, as (name, seconds), coarsest first."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    rollups = [(rollup_table(table, resolution), seconds)
+               for resolution, seconds in ROLLUP_RESOLUTIONS.items()
+               if rollup_table(table, resolution) in existing]
+    return sorted(rollups, key=lambda rollup: -rollup[1])
+
+def _table_bounds(conn, table):
+    row = conn.execute(f"""
+    SELECT ROUND((julianday(MIN(timestamp)) - 2440587.5) * 86400.0, 3),
+           ROUND((julianday(MAX(timestamp)) - 2440587.5) * 86400.0, 3)
+    FROM {table}
+    """).fetchone()
+    if row is None or row[0] is None:
+        return None
+    return row[0], row[1]
+
+def get_time_bounds(conn, table):
+    """Return (first, last) sample time of a table in epoch seconds, or None if it is empty.
+
+    Old raw rows may have been pruned, so the finest rollup is consulted too.
+    """
+    bounds = _table_bounds(conn, table)
+    rollups = get_rollups(conn, table)
+    if rollups:
+        name, seconds = rollups[-1]
+        rollup_bounds = _table_bounds(conn, name)
+        # Rollup times are bucket starts; they only extend the range when
+        # whole buckets of raw rows are gone
+        if rollup_bounds is not None and (bounds is None or rollup_bounds[0] + seconds <= bounds[0]):
+            bounds = (rollup_bounds[0], bounds[1] if bounds is not None else rollup_bounds[1])
+    return bounds
+
+def _pick_rollup(conn, table, start, width):
+    """The coarsest rollup no coarser than one bucket, or None to read raw rows.
+
+    A rollup is also used when the raw rows at the start of the range were pruned.
+    """
+    rollups = get_rollups(conn, table)
+    for name, seconds in rollups:
+        if seconds <= width:
+            return name, seconds
+    if rollups:
+        raw = _table_bounds(conn, table)
+        if raw is None or raw[0] > start + rollups[-1][1]:
+            return rollups[-1]
+    return None
+
+def query_buckets(conn, table, columns, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+    """Downsample columns of a table over [start, end] into at most max_points buckets.
+
+    Buckets are equal slices of time; each one reports the mean time of its
+    samples and the mean, min and max of every column (min-max decimation), so
+    short spikes stay visible however far the view is zoomed out. Everything is
+    computed in SQL, from the coarsest rollup table that is still finer than a
+    bucket when there is one, and from the raw rows after its last complete
+    bucket. Returns a dict of NumPy arrays:
+
+        {"time": t, "avg_usage": {"mean": ..., "min": ..., "max": ...}, ...}
+    """
+    if start is None or end is None:
+        bounds = get_time_bounds(conn, table)
+        if bounds is None:
+            return None
+        start = bounds[0] if start is None else start
+        end = bounds[1] if end is None else end
+    width = max((end - start) / max_points, 1e-3)
+
+    rollup = _pick_rollup(conn, table, start, width)
+    if rollup is None:
+        exprs = [series_expr(conn, table, column) for column in columns]
+        inner = ", ".join(f"{expr} AS c{i}" for i, expr in enumerate(exprs))
+        aggregates = ", ".join(f"AVG(c{i}), MIN(c{i}), MAX(c{i})" for i in range(len(exprs)))
+        where, params = range_clause(start, end)
+        rows = conn.execute(f"""
+        SELECT AVG(t), {aggregates}
+        FROM (SELECT {EPOCH_EXPR} AS t, {inner} FROM {table} WHERE {where})
+        WHERE t >= ? AND t <= ?
+        GROUP BY MIN(CAST((t - ?) / ? AS INTEGER), ?)
+        ORDER BY 1
+        """, params + (start, end, start, width, max_points - 1)).fetchall()
+    else:
+        # Rollup rows are merged into the wider buckets: means weighted by the
+        # sample count, min of the mins and max of the maxes. Each rollup row
+        # is placed at the middle of its bucket.
+        name, seconds = rollup
+        inner = ", ".join(f"{column}_avg * sample_count AS s{i}, {column}_min AS lo{i}, {column}_max AS hi{i}"
+                          for i, column in enumerate(columns))
+        aggregates = ", ".join(f"SUM(s{i}) / SUM(n), MIN(lo{i}), MAX(hi{i})" for i in range(len(columns)))
+        where, params = range_clause(start - seconds, end)
+        # The logger writes a rollup row once its bucket is over, so in a
+        # session still being recorded the rows after the last one are only
+        # raw; they are merged in as buckets of one sample each
+        last = conn.execute(f"SELECT {EPOCH_EXPR} FROM {name} ORDER BY timestamp DESC LIMIT 1").fetchone()
+        covered = max(last[0] + seconds if last else start, start)
+        raw_inner = ", ".join(f"{expr} AS s{i}, {expr} AS lo{i}, {expr} AS hi{i}"
+                              for i, expr in enumerate(series_expr(conn, table, column) for column in columns))
+        raw_where, raw_params = range_clause(covered, end)
+        rows = conn.execute(f"""
+        SELECT AVG(t), {aggregates}
+        FROM (SELECT {EPOCH_EXPR} + {seconds / 2} AS t, sample_count AS n, {inner} FROM {name} WHERE {where}
+              UNION ALL
+              SELECT {EPOCH_EXPR} AS t, 1 AS n, {raw_inner} FROM {table}
+              WHERE {raw_where} AND {EPOCH_EXPR} BETWEEN ? AND ?)
+        WHERE t >= ? AND t <= ?
+        GROUP BY MIN(MAX(CAST((t - ?) / ? AS INTEGER), 0), ?)
+        ORDER BY 1
+        """, params + raw_params + (covered, end, start - seconds / 2, end + seconds / 2, start, width,
+                                    max_points - 1)).fetchall()
+
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), 1 + 3 * len(columns))
+    result = {"time": values[:, 0]}
+    for i, column in enumerate(columns):
+        result[column] = {
+            "mean": values[:, 1 + 3 * i],
+            "min": values[:, 2 + 3 * i],
+            "max": values[:, 3 + 3 * i],
+        }
+    return result
+
+def query_core_usage(conn, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+    """Per-core CPU usage over [start, end] as (times, array of shape (cores, n)).
+
+    Per-core values are packed per row, so instead of averaging, one row (the
+    earliest) is taken from each bucket.
+    """
+    if start is None or end is None:
+        bounds = get_time_bounds(conn, "cpu_metrics")
+        if bounds is None:
+            return None, None
+        start = bounds[0] if start is None else start
+        end = bounds[1] if end is None else end
+    width = max((end - start) / max_points, 1e-3)
+
+    where, params = range_clause(start, end)
+    # SQLite returns the bare column from the row that supplied MIN(t)
+    times, usage = fetch_arrays(conn, f"""
+    SELECT MIN(t), core_usage
+    FROM (SELECT {EPOCH_EXPR} AS t, core_usage FROM cpu_metrics WHERE {where})
+    WHERE t >= ? AND t <= ?
+    GROUP BY MIN(CAST((t - ?) / ? AS INTEGER), ?)
+    ORDER BY 1
+    """, params + (start, end, start, width, max_points - 1), [np.float64, None], max_points)
+    if len(times) == 0:
+        return None, None
+    return times, usage.T
+
+def query_device_buckets(conn, table, columns, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+    """Per-device breakdown of columns of a metric table (see backend.DEVICE_TABLES) over [start, end].
+
+    Every device is downsampled to at most max_points bucket means. Returns
+    {device name: {"time": t, column: mean, ...}} of NumPy arrays; empty for
+    tables without devices and sessions recorded before device tables existed.
+    """
+    device_table = DEVICE_TABLES.get(table)
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if device_table not in existing:
+        return {}
+    if start is None or end is None:
+        bounds = _table_bounds(conn, device_table)
+        if bounds is None:
+            return {}
+        start = bounds[0] if start is None else start
+        end = bounds[1] if end is None else end
+    width = max((end - start) / max_points, 1e-3)
+
+    where, params = range_clause(start, end)
+    inner = ", ".join(f"{column} AS c{i}" for i, column in enumerate(columns))
+    aggregates = ", ".join(f"AVG(c{i})" for i in range(len(columns)))
+    ids, times, *values = fetch_arrays(conn, f"""
+    SELECT device_id, AVG(t), {aggregates}
+    FROM (SELECT device_id, {EPOCH_EXPR} AS t, {inner} FROM {device_table} WHERE {where})
+    WHERE t >= ? AND t <= ?
+    GROUP BY device_id, MIN(CAST((t - ?) / ? AS INTEGER), ?)
+    ORDER BY device_id, 2
+    """, params + (start, end, start, width, max_points - 1), [np.int64] + [np.float64] * (1 + len(columns)))
+    return _split_devices(conn, ids, times, values, columns)
+
+def _split_devices(conn, ids, times, values, columns):
+    """{device name: {"time": ..., column: ...}} of rows ordered by device id."""
+    names = dict(conn.execute(f"SELECT id, name FROM {DEVICES_TABLE}"))
+    result = {}
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1, [len(ids)])) if len(ids) else []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        device = {"time": times[lo:hi]}
+        for column, array in zip(columns, values):
+            device[column] = array[lo:hi]
+        result[names.get(int(ids[lo]), str(ids[lo]))] = device
+    return result
+
+# Tailing a session that is still being recorded. Metric rows are only ever
+# appended (pruning deletes the oldest), so the rows written since a poll are
+# those with a higher rowid: a range scan of the table's primary key, which
+# costs the writer nothing.
+
+def max_rowid(conn, table):
+    """The rowid of the last row of table; 0 when it is empty or missing."""
+    try:
+        return conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+def query_new_rows(conn, table, columns, after_rowid, cores=False):
+    """Rows of a metric table after rowid after_rowid, at full resolution.
+
+    Returns (last rowid, {"time": ..., column: ...}) of NumPy arrays, with
+    the per-core usage as a 2-D "core_usage" array (cores, n) when cores is
+    set. The rowid stays after_rowid when nothing is new.
+    """
+    exprs = [series_expr(conn, table, column) for column in columns] + (["core_usage"] if cores else [])
+    rowids, times, *values = fetch_arrays(conn, f"""
+    SELECT rowid, {EPOCH_EXPR}, {", ".join(exprs)} FROM {table} WHERE rowid > ? ORDER BY rowid
+    """, (after_rowid,), [np.int64, np.float64] + [np.float64] * len(columns) + ([None] if cores else []))
+    result = {"time": times}
+    for column, array in zip(columns, values):
+        result[column] = array
+    if cores:
+        result["core_usage"] = values[-1].T
+    return (int(rowids[-1]) if len(rowids) else after_rowid), result
+
+def query_new_device_rows(conn, table, columns, after_rowid):
+    """Per-device rows of a metric table (see backend.DEVICE_TABLES) after rowid after_rowid.
+
+    Returns (last rowid, {device name: {"time": ..., column: ...}}).
+    """
+    device_table = DEVICE_TABLES.get(table)
+    try:
+        rowids, ids, times, *values = fetch_arrays(conn, f"""
+        SELECT rowid, device_id, {EPOCH_EXPR}, {", ".join(columns)}
+        FROM {device_table} WHERE rowid > ? ORDER BY device_id, rowid
+        """, (after_rowid,), [np.int64, np.int64] + [np.float64] * (1 + len(columns)))
+    except sqlite3.OperationalError:
+        # Recorded before device tables existed
+        return after_rowid, {}
+    last = int(rowids.max()) if len(rowids) else after_rowid
+    return last, _split_devices(conn, ids, times, values, columns)
+
+def _grow(array, rows, width=0):
+    """A copy of array with room for rows rows (and width columns if 2-D), padded with NaN."""
+    shape = (rows,) if array.ndim == 1 else (rows, max(width, array.shape[1]))
+    grown = np.full(shape, np.nan, dtype=array.dtype) if array.dtype.kind == "f" else np.zeros(shape, array.dtype)
+    grown[(slice(0, len(array)),) + tuple(slice(0, n) for n in array.shape[1:])] = array
+    return grown
+
+def fetch_arrays(conn, sql, params=(), dtypes=(), count=None, chunk_rows=FETCH_CHUNK_ROWS):
+    """Run a query and return one NumPy array per result column.
+
+    dtypes has the dtype of every result column; None marks a column of packed
+    float lists, which becomes a 2-D float32 array (NaN-padded). Rows are
+    fetched and converted chunk_rows at a time straight into arrays
+    preallocated for count rows (grown if more arrive), so there is never more
+    than one chunk of Python objects alive.
+    """
+    cursor = conn.execute(sql, params)
+    capacity = count if count is not None else chunk_rows
+    arrays = [np.empty((capacity,) if dtype is not None else (capacity, 0),
+                       dtype=dtype if dtype is not None else np.float32) for dtype in dtypes]
+    scalar = [i for i, dtype in enumerate(dtypes) if dtype is not None]
+    n = 0
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        m = len(rows)
+        if n + m > capacity:
+            capacity = max(2 * capacity, n + m)
+            arrays = [_grow(array[:n], capacity) for array in arrays]
+        if len(scalar) == len(dtypes) and len({dtypes[i] for i in scalar}) == 1:
+            # Every column has the same dtype: the whole chunk converts in one call
+            # (None becomes NaN for float columns)
+            block = np.array(rows, dtype=dtypes[0]).reshape(m, len(dtypes))
+            for i, array in enumerate(arrays):
+                array[n:n + m] = block[:, i]
+        else:
+            for i, dtype in enumerate(dtypes):
+                if dtype is None:
+                    block = float_lists_to_array([row[i] for row in rows])
+                    if block.shape[1] > arrays[i].shape[1]:
+                        arrays[i] = _grow(arrays[i], capacity, block.shape[1])
+                    arrays[i][n:n + m] = np.nan
+                    arrays[i][n:n + m, :block.shape[1]] = block
+                else:
+                    arrays[i][n:n + m] = np.array([row[i] for row in rows], dtype=dtype)
+        n += m
+    return [array[:n] for array in arrays]
+
+def query_columns(conn, table, columns, start=None, end=None):
+    """Every sample of columns of a table in [start, end] at full resolution.
+
+    Returns {"time": epoch seconds, column: values, ...} as NumPy arrays;
+    per-core and per-fan lists are 2-D arrays with one row per sample.
+    """
+    where, params = "1", ()
+    if start is not None or end is not None:
+        bounds = get_time_bounds(conn, table)
+        if bounds is None:
+            where, params = "0", ()
+        else:
+            start = bounds[0] if start is None else start
+            end = bounds[1] if end is None else end
+            where, params = range_clause(start, end)
+            where += f" AND {EPOCH_EXPR} BETWEEN ? AND ?"
+            params += (start, end)
+    count = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+    exprs = [column if column in LIST_COLUMNS else series_expr(conn, table, column) for column in columns]
+    arrays = fetch_arrays(conn, f"""
+    SELECT {EPOCH_EXPR}, {", ".join(exprs)} FROM {table} WHERE {where} ORDER BY timestamp
+    """, params, [np.float64] + [None if column in LIST_COLUMNS else np.float64 for column in columns], count)
+    return dict(zip(["time"] + list(columns), arrays))
+
+def float_lists_to_array(values):
+    """Stack packed (or legacy comma-joined) float lists into a float32 array of shape (n, width).
+
+    Shorter lists are padded with NaN.
+    """
+    blob_sizes = {len(value) if isinstance(value, bytes) else -1 for value in values}
+    if len(blob_sizes) == 1 and -1 not in blob_sizes:
+        # Packed float32 rows of the same length decode in one pass
+        return np.frombuffer(b"".join(values), dtype=np.float32).reshape(len(values), -1)
+    parsed = [unpack_floats(value) if value is not None else [] for value in values]
+    width = max((len(v) for v in parsed), default=0)
+    array = np.full((len(values), width), np.nan, dtype=np.float32)
+    for i, v in enumerate(parsed):
+        array[i, :len(v)] = v
+    return array
+
+class SessionReader:
+    """A single read-only connection to one session database.
+
+    Every query of a viewer goes through here, so opening a session costs one
+    connection no matter how many tables are read. The connection may be used
+    from a background loader and the GUI thread; calls are serialized.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = open_session(db_path)
+        self.lock = threading.Lock()
+        self.bounds_cache = {}
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def time_bounds(self, table):
+        with self.lock:
+            if table not in self.bounds_cache:
+                self.bounds_cache[table] = get_time_bounds(self.conn, table)
+            return self.bounds_cache[table]
+
+    def buckets(self, table, columns, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+        with self.lock:
+            return query_buckets(self.conn, table, columns, start, end, max_points)
+
+    def core_usage(self, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+        with self.lock:
+            return query_core_usage(self.conn, start, end, max_points)
+
+    def device_buckets(self, table, columns, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+        with self.lock:
+            return query_device_buckets(self.conn, table, columns, start, end, max_points)
+
+    def columns(self, table, columns, start=None, end=None):
+        with self.lock:
+            return query_columns(self.conn, table, columns, start, end)
+
+    def new_rows(self, table, columns, after_rowid, cores=False):
+        with self.lock:
+            return query_new_rows(self.conn, table, columns, after_rowid, cores)
+
+    def new_device_rows(self, table, columns, after_rowid):
+        with self.lock:
+            return query_new_device_rows(self.conn, table, columns, after_rowid)
+
+    def load_table(self, table, columns, cores=False, max_points=DEFAULT_MAX_POINTS, devices=False):
+        """Everything needed to first show a table: its time bounds and the
+        whole session downsampled to max_points, per device too with devices.
+        Returns None for an empty table.
+
+        "rowids" are the last rowids of the table and of its device table:
+        rows after them are new to a viewer tailing the session. Everything
+        is read in one transaction, so the buckets hold exactly the rows up
+        to those rowids even while the session is being written.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                rowids = (max_rowid(self.conn, table),
+                          max_rowid(self.conn, DEVICE_TABLES[table]) if table in DEVICE_TABLES else 0)
+                # Not cached: it has to come from this snapshot
+                bounds = self.bounds_cache[table] = get_time_bounds(self.conn, table)
+                if bounds is None:
+                    return None
+                payload = {"bounds": bounds, "buckets": None, "cores": None, "devices": None, "rowids": rowids}
+                if columns:
+                    payload["buckets"] = query_buckets(self.conn, table, columns, bounds[0], bounds[1], max_points)
+                if cores:
+                    payload["cores"] = query_core_usage(self.conn, bounds[0], bounds[1], max_points)
+                if devices:
+                    payload["devices"] = query_device_buckets(self.conn, table, columns, bounds[0], bounds[1],
+                                                              max_points)
+            finally:
+                self.conn.execute("COMMIT")
+        return payload
@@ -0,0 +1,613 @@
+"""Metric sources the collector can sample.
+
+Each source is a class registered under a name (the key of its rate and of
+its values in a collector snapshot). It declares the fields its samples hold
+and a rough cost of one sample, finds its sensors or devices once in
+discover() and keeps the handles it needs, so sample() only reads values.
+
+discover_sources() instantiates the registered sources, keeps the ones whose
+hardware is present and takes one trial sample of each, timing it. A source
+that is missing or fails here never reaches the collector's schedule. Sources
+of rates read their counters once in discover(), so their trial sample comes
+too soon to report anything (see MetricSource.sample).
+
+Other modules can add sources with the register_source decorator; headless.py
+imports them with --plugin:
+
+    from sources import MetricSource, register_source
+
+    @register_source
+    class LoadSource(MetricSource):
+        name = "load"
+        fields = ("load_1m",)
+
+        def sample(self, period):
+            return {"load_1m": os.getloadavg()[0]}
+"""
+import importlib
+import re
+import time
+import numpy as np
+import psutil
+import procfs
+from instrumentation import MIN_CPU_INTERVAL, instruments
+
+# Relative cost of one sample, declared by each source
+COST_LOW = "low"        # a counter or two from /proc
+COST_MEDIUM = "medium"  # walks /sys, e.g. every hwmon sensor
+COST_HIGH = "high"      # driver calls or per-process scans
+
+# CPU temperature chips in order of preference (AMD, Intel, ARM boards, ACPI)
+# and the labels preferred within a chip
+CPU_TEMP_CHIPS = ("k10temp", "zenpower", "coretemp", "cpu_thermal", "soc_thermal", "acpitz")
+CPU_TEMP_LABELS = ("Tdie", "Tccd1", "Tctl", "Package id 0")
+
+# NVML is only loaded by the GPU source, so processes that do not sample the
+# GPU never import it
+pynvml = None
+
+SOURCES = {}
+
+def register_source(cls):
+    """Class decorator adding a MetricSource subclass to the registry, under cls.name."""
+    SOURCES[cls.name] = cls
+    return cls
+
+def load_plugins(modules):
+    """Import modules that register extra sources."""
+    for module in modules:
+        importlib.import_module(module)
+
+def default_rates():
+    """{name: default rate in Hz} of every registered source."""
+    return {name: cls.default_rate for name, cls in SOURCES.items()}
+
+def use_procfs(options):
+    """Whether sources read /proc and /sys directly (Linux, unless the procfs option is False)."""
+    return procfs.AVAILABLE and options.get("procfs", True)
+
+def discover_sources(names=None, **options):
+    """{name: source} of the sources (all registered ones by default) present on this machine.
+
+    options are passed to every source's constructor; each takes the ones it knows.
+    """
+    found = {}
+    for name, cls in SOURCES.items():
+        if names is not None and name not in names:
+            continue
+        source = cls(**options)
+        try:
+            if not source.discover():
+                continue
+            start = time.perf_counter()
+            source.sample(1.0)
+            source.sample_seconds = time.perf_counter() - start
+        except Exception as e:
+            print(f"Source {name} unavailable:", e)
+            continue
+        found[name] = source
+    return found
+
+class MetricSource:
+    """Base class of the sources.
+
+    name is the key of the source's rate and snapshot values, fields the keys
+    of the dicts sample() returns, cost one of the COST_* values and
+    default_rate its sampling rate in Hz unless configured otherwise.
+    """
+    name = None
+    fields = ()
+    cost = COST_LOW
+    default_rate = 1.0
+
+    def __init__(self, **options):
+        self.options = options
+        # Measured duration of the trial sample taken by discover_sources
+        self.sample_seconds = None
+
+    def discover(self):
+        """Look for the source's sensors once and keep their handles; False if there are none."""
+        return True
+
+    def sample(self, period):
+        """Read the current values as a dict of fields.
+
+        period is the nominal number of seconds since the previous sample;
+        ticks can be late or skipped, so rates should be computed over the
+        time actually elapsed, measured with time.monotonic(). A source of
+        rates returns None when less than MIN_CPU_INTERVAL has passed (e.g.
+        on the first tick, right after the trial sample of discover_sources);
+        the collector then neither shows nor logs it, and the next sample
+        covers that time too.
+        """
+        raise NotImplementedError
+
+    def info(self):
+        """Static details of the source, for display."""
+        return {}
+
+    def log(self, backend, timestamp, sample, latest):
+        """Write a sample to the database.
+
+        latest holds the most recent sample of every source, so a table can
+        combine several sources. Sources without a table only feed snapshots.
+        """
+
+@register_source
+class CpuSource(MetricSource):
+    """Usage of every logical core. The cpu_metrics row also takes the latest temps and fans."""
+    name = "cpu"
+    fields = ("core_usage",)
+
+    def discover(self):
+        # The first call only starts the measurement
+        self.times = procfs.CpuTimes() if use_procfs(self.options) else None
+        if self.times is not None:
+            self.num_cores = len(self.times.last)
+        else:
+            self.num_cores = len(psutil.cpu_percent(interval=None, percpu=True))
+        self.last_time = time.monotonic()
+        return self.num_cores > 0
+
+    def sample(self, period):
+        now = time.monotonic()
+        if now - self.last_time < MIN_CPU_INTERVAL:
+            # Left unread, so the next sample is measured from the last one
+            return None
+        self.last_time = now
+        if self.times is not None:
+            return {"core_usage": self.times.usage()}
+        return {"core_usage": psutil.cpu_percent(interval=None, percpu=True)}
+
+    def log(self, backend, timestamp, sample, latest):
+        cpu_temp = latest.get("temps", {}).get("cpu_temp")
+        backend.log_cpu_metrics(core_usage_list=sample["core_usage"],
+                                cpu_temp=cpu_temp if cpu_temp is not None else 0,
+                                fan_speeds=latest.get("fans", {}).get("fan_speeds", []),
+                                timestamp=timestamp)
+
+@register_source
+class TemperatureSource(MetricSource):
+    """CPU temperature from the first known sensor chip, or the temp_chip option."""
+    name = "temps"
+    fields = ("cpu_temp",)
+    cost = COST_MEDIUM
+
+    def discover(self):
+        if not hasattr(psutil, "sensors_temperatures"):
+            return False
+        temps = psutil.sensors_temperatures()
+        chips = [self.options["temp_chip"]] if self.options.get("temp_chip") else CPU_TEMP_CHIPS
+        for chip in chips:
+            entries = temps.get(chip)
+            if not entries:
+                continue
+            labels = [entry.label for entry in entries]
+            preferred = [label for label in CPU_TEMP_LABELS if label in labels]
+            self.chip = chip
+            self.index = labels.index(preferred[0]) if preferred else 0
+            self.label = labels[self.index] or chip
+            self.input = self._find_input(labels[self.index])
+            return True
+        return False
+
+    def _find_input(self, label):
+        # The hwmon file of the chosen sensor, if its label identifies it
+        if not use_procfs(self.options):
+            return None
+        paths = [path for input_label, path in procfs.hwmon_inputs(self.chip, "temp") if input_label == label]
+        return procfs.ProcFile(paths[0], size=64) if len(paths) == 1 else None
+
+    def sample(self, period):
+        if self.input is not None:
+            return {"cpu_temp": self.input.read_int() / 1000.0}
+        return {"cpu_temp": psutil.sensors_temperatures()[self.chip][self.index].current}
+
+    def info(self):
+        return {"chip": self.chip, "label": self.label}
+
+@register_source
+class FanSource(MetricSource):
+    """Speeds of the fans of one chip: the fan_chip option, or the first chip reporting fans."""
+    name = "fans"
+    fields = ("fan_speeds",)
+    cost = COST_MEDIUM
+
+    def discover(self):
+        if not hasattr(psutil, "sensors_fans"):
+            return False
+        fans = psutil.sensors_fans()
+        chip = self.options.get("fan_chip") or next((name for name, entries in fans.items() if entries), None)
+        if not fans.get(chip):
+            return False
+        self.chip = chip
+        self.labels = [fan.label or f"Fan{i}" for i, fan in enumerate(fans[chip])]
+        self.inputs = None
+        if use_procfs(self.options):
+            inputs = procfs.hwmon_inputs(chip, "fan")
+            if len(inputs) == len(self.labels):
+                # In the hwmon index order, which psutil does not keep past fan9
+                self.labels = [label or f"Fan{i}" for i, (label, path) in enumerate(inputs)]
+                self.inputs = [procfs.ProcFile(path, size=64) for label, path in inputs]
+        self.count = len(self.labels)
+        return True
+
+    def sample(self, period):
+        if self.inputs is not None:
+            return {"fan_speeds": [fan.read_int() for fan in self.inputs]}
+        return {"fan_speeds": [fan.current for fan in psutil.sensors_fans()[self.chip]]}
+
+    def info(self):
+        return {"chip": self.chip, "labels": self.labels}
+
+@register_source
+class GpuSource(MetricSource):
+    """Usage, memory, temperature and fan of the first NVIDIA GPU, through NVML."""
+    name = "gpu"
+    fields = ("gpu_usage", "gpu_mem_usage", "gpu_temp", "gpu_fan")
+    cost = COST_HIGH
+
+    def discover(self):
+        global pynvml
+        try:
+            if pynvml is None:
+                import pynvml as module
+                pynvml = module
+            pynvml.nvmlInit()
+            self.handle = pynvml.nvmlDeviceGetHandleByIndex(0)  # Assuming a single GPU
+        except Exception:
+            print("GPU not available")
+            return False
+        return True
+
+    def sample(self, period):
+        memory = pynvml.nvmlDeviceGetMemoryInfo(self.handle)
+        return {
+            "gpu_usage": pynvml.nvmlDeviceGetUtilizationRates(self.handle).gpu,
+            "gpu_mem_usage": memory.used / (1024 ** 2),  # Convert bytes to MB
+            "gpu_temp": pynvml.nvmlDeviceGetTemperature(self.handle, pynvml.NVML_TEMPERATURE_GPU),
+            "gpu_fan": pynvml.nvmlDeviceGetFanSpeed(self.handle),
+        }
+
+    def info(self):
+        """Model name and total memory in MB."""
+        gpu_name = pynvml.nvmlDeviceGetName(self.handle)
+        if isinstance(gpu_name, bytes):
+            gpu_name = gpu_name.decode('utf-8')
+        memory_info = pynvml.nvmlDeviceGetMemoryInfo(self.handle)
+        return {"name": gpu_name, "total_memory_mb": memory_info.total / (1024 ** 2)}
+
+    def log(self, backend, timestamp, sample, latest):
+        backend.log_gpu_metrics(gpu_usage=sample["gpu_usage"], gpu_mem_usage=sample["gpu_mem_usage"],
+                                gpu_temp=sample["gpu_temp"], gpu_fan=sample["gpu_fan"], timestamp=timestamp)
+
+@register_source
+class RamSource(MetricSource):
+    name = "ram"
+    fields = ("ram_usage",)
+
+    def discover(self):
+        self.meminfo = procfs.MemInfo() if use_procfs(self.options) else None
+        return True
+
+    def sample(self, period):
+        if self.meminfo is not None:
+            return {"ram_usage": self.meminfo.percent()}
+        return {"ram_usage": psutil.virtual_memory().percent}
+
+    def log(self, backend, timestamp, sample, latest):
+        backend.log_ram_metrics(ram_usage=sample["ram_usage"], timestamp=timestamp)
+
+# Counters read without psutil's wraparound tracking (DeviceCounters does it
+# in one NumPy pass) are at most 64 bits; 32-bit ones wrap at this value
+COUNTER_WRAP = 2 ** 32
+
+# Block devices that are partitions of another (counted in their disk) or
+# not disks at all
+PARTITION_RE = re.compile(r"^((sd|hd|vd|xvd)[a-z]+\d+|(nvme\d+n\d+|mmcblk\d+)p\d+)$")
+IGNORED_DISK_PREFIXES = ("loop", "ram")
+
+def psutil_counters(call, fields):
+    """A DeviceCounters read function over a psutil per-device call, which returns {name: namedtuple}."""
+    columns = []
+
+    def read():
+        counters = call()
+        keys = list(counters)
+        if not keys:
+            return keys, np.zeros((0, len(fields)), dtype=np.int64)
+        if not columns:
+            template = next(iter(counters.values()))
+            columns.extend(template._fields.index(field) for field in fields)
+        values = np.array(list(counters.values()), dtype=np.int64).reshape(len(keys), -1)
+        return keys, values[:, columns]
+    return read
+
+class DeviceCounters:
+    """Rates of the byte counters of every device of a system.
+
+    read() returns (names, int64 array with one row of counters per device):
+    procfs.NetDev/DiskStats read /proc directly, psutil_counters() wraps the
+    psutil calls. include(name) selects devices. The deltas of all devices
+    are computed in one vectorized pass. Which rows belong to which
+    device is worked out only when the list of names changes (a device added
+    or removed), so steady-state reads cost no per-device Python work beyond
+    the array conversion.
+
+    A counter lower than before has wrapped (32-bit counters) or was reset
+    (driver reloaded); the delta then counts from the wrap or from zero. A
+    hot-plugged device reports from its second read on. sample() returns
+    None, without reading, less than MIN_CPU_INTERVAL after the last read.
+
+    Rates are per second of time.monotonic() elapsed between two reads, so
+    they stay right when ticks are late, skipped or change rate.
+    """
+
+    def __init__(self, read, include):
+        self.read = read
+        self.include = include
+        self.keys = None    # names of the last read, in the order read
+        self.names = []     # the included devices
+        self.rows = None    # their rows in the read
+        self.last = None    # counters of the last read, one row per device
+        self.known = None   # whether each device has a previous read
+        self.last_time = None  # time.monotonic() of the last read
+
+    def discover(self):
+        keys, values = self.read()
+        if not keys:
+            return False
+        self.rates(keys, values, time.monotonic())
+        return True
+
+    def _rediscover(self, keys, columns):
+        old = dict(zip(self.names, self.last)) if self.last is not None else {}
+        self.keys = keys
+        self.names = [name for name in keys if self.include(name)]
+        self.rows = np.array([keys.index(name) for name in self.names], dtype=np.intp)
+        self.known = np.array([name in old for name in self.names], dtype=bool)
+        last = np.zeros((len(self.names), columns), dtype=np.int64)
+        for i, name in enumerate(self.names):
+            if name in old:
+                last[i] = old[name]
+        self.last = last
+
+    def rates(self, keys, values, now):
+        """(names, array of shape (devices, counters), interval) of the counter rates in KB/s.
+
+        now is the time.monotonic() of the read and interval the seconds since
+        the previous one. Devices read for the first time have NaN rates.
+        """
+        interval = now - self.last_time if self.last_time is not None else np.nan
+        self.last_time = now
+        if keys != self.keys:
+            self._rediscover(keys, values.shape[1])
+        current = values[self.rows]
+        delta = current - self.last
+        wrapped = delta < 0
+        if wrapped.any():
+            delta = np.where(wrapped, np.where(self.last < COUNTER_WRAP, delta + COUNTER_WRAP, current), delta)
+        rates = delta / 1024.0 / interval if interval > 0 else np.full(delta.shape, np.nan)
+        if not self.known.all():
+            rates[~self.known] = np.nan
+            self.known[:] = True
+        self.last = current
+        return self.names, rates, interval
+
+    def sample(self):
+        if self.last_time is not None and time.monotonic() - self.last_time < MIN_CPU_INTERVAL:
+            return None
+        keys, values = self.read()
+        return self.rates(keys, values, time.monotonic())
+
+def is_disk(name):
+    """Whether a perdisk name is a whole disk rather than a partition, loop or RAM device."""
+    return not PARTITION_RE.match(name) and not name.startswith(IGNORED_DISK_PREFIXES)
+
+@register_source
+class NetworkSource(MetricSource):
+    """Download and upload speed of every interface but loopback, and their totals, in KB/s."""
+    name = "network"
+    fields = ("download_speed", "upload_speed", "sample_interval", "devices", "device_speeds")
+
+    def discover(self):
+        if use_procfs(self.options):
+            read = procfs.NetDev().read
+        else:
+            read = psutil_counters(lambda: psutil.net_io_counters(pernic=True, nowrap=False),
+                                   ("bytes_recv", "bytes_sent"))
+        self.counters = DeviceCounters(read, lambda name: name != "lo")
+        return self.counters.discover()
+
+    def sample(self, period):
+        rates = self.counters.sample()
+        if rates is None:
+            return None
+        devices, speeds, interval = rates
+        download_speed, upload_speed = np.nansum(speeds, axis=0) if len(devices) else (0.0, 0.0)
+        return {"download_speed": float(download_speed), "upload_speed": float(upload_speed),
+                "sample_interval": interval, "devices": devices, "device_speeds": speeds}
+
+    def log(self, backend, timestamp, sample, latest):
+        backend.log_network_metrics(download_speed=sample["download_speed"], upload_speed=sample["upload_speed"],
+                                    timestamp=timestamp, sample_interval=sample["sample_interval"])
+        log_devices(backend.log_network_device_metrics, sample, timestamp)
+
+@register_source
+class DiskSource(MetricSource):
+    """Read and write speed of every disk, and their totals, in KB/s."""
+    name = "disk"
+    fields = ("read_speed", "write_speed", "sample_interval", "devices", "device_speeds")
+
+    def discover(self):
+        # Empty on machines without disk statistics (some containers)
+        if use_procfs(self.options):
+            read = procfs.DiskStats().read
+        else:
+            read = psutil_counters(lambda: psutil.disk_io_counters(perdisk=True, nowrap=False),
+                                   ("read_bytes", "write_bytes"))
+        self.counters = DeviceCounters(read, is_disk)
+        return self.counters.discover()
+
+    def sample(self, period):
+        rates = self.counters.sample()
+        if rates is None:
+            return None
+        devices, speeds, interval = rates
+        read_speed, write_speed = np.nansum(speeds, axis=0) if len(devices) else (0.0, 0.0)
+        return {"read_speed": float(read_speed), "write_speed": float(write_speed),
+                "sample_interval": interval, "devices": devices, "device_speeds": speeds}
+
+    def log(self, backend, timestamp, sample, latest):
+        backend.log_disk_metrics(read_speed=sample["read_speed"], write_speed=sample["write_speed"],
+                                 timestamp=timestamp, sample_interval=sample["sample_interval"])
+        log_devices(backend.log_disk_device_metrics, sample, timestamp)
+
+def log_devices(log, sample, timestamp):
+    # Devices seen for the first time have no rate yet
+    speeds = sample["device_speeds"]
+    valid = ~np.isnan(speeds).any(axis=1)
+    if valid.all():
+        log(sample["devices"], speeds, timestamp=timestamp)
+    else:
+        log([name for name, ok in zip(sample["devices"], valid) if ok], speeds[valid], timestamp=timestamp)
+
+# Per-process values read in one oneshot() batch by process_iter; I/O
+# counters where the platform has them
+PROCESS_ATTRS = ["name", "create_time", "cpu_times", "memory_info"]
+if hasattr(psutil.Process, "io_counters"):
+    PROCESS_ATTRS.append("io_counters")
+# Metrics the process source ranks by; the top N of each are kept
+PROCESS_METRICS = ("cpu_percent", "rss_mb", "read_speed", "write_speed")
+DEFAULT_TOP_N = 10
+
+@register_source
+class ProcessSource(MetricSource):
+    """The processes using the most CPU, memory or disk I/O (the process_top option, default 10 per metric).
+
+    psutil.process_iter keeps its Process objects between calls and yields
+    them in PID order, reading the PROCESS_ATTRS of each in one batch. CPU
+    time and I/O counters are kept as arrays sorted by PID, so the deltas of
+    all processes are matched to the previous sample and computed in one
+    NumPy pass; a PID reused by a new process (different create time)
+    starts over. Only processes with a CPU time from the previous sample are
+    ranked, and samples less than MIN_CPU_INTERVAL apart (e.g. the first
+    tick right after the trial sample of discover_sources) rank none, so
+    every listed process has a measured CPU use. Processes whose I/O
+    counters are not readable (other users'; process_iter gives None) have
+    no I/O rates; io_denied holds them by PID and create time while they
+    live.
+    """
+    name = "processes"
+    fields = ("count", "sample_interval", "top")
+    cost = COST_HIGH
+    default_rate = 0.5
+
+    def discover(self):
+        self.top_n = self.options.get("process_top") or DEFAULT_TOP_N
+        self.io_denied = set()
+        self.last = None
+        self.last_time = None
+        return bool(psutil.pids())
+
+    def sample(self, period):
+        pids, names, starts, cpu, rss, io = [], [], [], [], [], []
+        denied = set()
+        for proc in psutil.process_iter(PROCESS_ATTRS, ad_value=None):
+            info = proc.info
+            if info["cpu_times"] is None or info["memory_info"] is None:
+                continue
+            pid = proc.pid
+            start = info["create_time"] or 0.0
+            counters = info.get("io_counters")
+            if counters is None and "io_counters" in info:
+                denied.add((pid, start))
+            pids.append(pid)
+            names.append(info["name"] or "")
+            starts.append(start)
+            cpu.append(info["cpu_times"].user + info["cpu_times"].system)
+            rss.append(info["memory_info"].rss)
+            io.append((counters.read_bytes, counters.write_bytes) if counters is not None else (-1, -1))
+        # Only the processes still alive stay in the set
+        self.io_denied = denied
+        now = time.monotonic()
+        interval = now - self.last_time if self.last_time is not None else np.nan
+        if interval < MIN_CPU_INTERVAL:
+            # Too close to the previous sample to measure; the next one is
+            # measured from that one instead
+            return {"count": len(pids), "sample_interval": interval, "top": []}
+        self.last_time = now
+
+        current = {
+            "pid": np.array(pids, dtype=np.int64),
+            "start": np.array(starts, dtype=np.float64),
+            "cpu": np.array(cpu, dtype=np.float64),
+            "io": np.array(io, dtype=np.int64).reshape(len(pids), 2),
+        }
+        values = {"rss_mb": np.array(rss, dtype=np.float64) / (1024 ** 2)}
+        values["cpu_percent"], io_rates = self._deltas(current, interval)
+        values["read_speed"], values["write_speed"] = io_rates[:, 0], io_rates[:, 1]
+        self.last = current
+
+        # The union of the top N of every metric among the processes with a
+        # CPU baseline, busiest CPU first
+        primed = np.flatnonzero(~np.isnan(values["cpu_percent"]))
+        top = set()
+        for metric in PROCESS_METRICS:
+            ranked = np.nan_to_num(values[metric][primed], nan=-1.0)
+            if len(ranked) > self.top_n:
+                top.update(primed[np.argpartition(-ranked, self.top_n - 1)[:self.top_n]].tolist())
+            else:
+                top.update(primed.tolist())
+        order = sorted(top, key=lambda i: -values["cpu_percent"][i])
+        rows = [(pids[i], names[i]) + tuple(float(values[metric][i]) for metric in PROCESS_METRICS)
+                for i in order]
+        return {"count": len(pids), "sample_interval": interval, "top": rows}
+
+    def _deltas(self, current, interval):
+        """CPU percent (of one core) and I/O rates in KB/s since the last sample; NaN where unknown."""
+        n = len(current["pid"])
+        cpu_percent = np.full(n, np.nan)
+        io_rates = np.full((n, 2), np.nan)
+        last = self.last
+        if last is None or len(last["pid"]) == 0 or not interval > 0:
+            return cpu_percent, io_rates
+        # Both PID arrays are sorted (process_iter yields in PID order)
+        index = np.minimum(np.searchsorted(last["pid"], current["pid"]), len(last["pid"]) - 1)
+        same = (last["pid"][index] == current["pid"]) & (last["start"][index] == current["start"])
+        cpu_percent[same] = (current["cpu"][same] - last["cpu"][index[same]]) / interval * 100.0
+        previous = last["io"][index]
+        known = same[:, None] & (current["io"] >= 0) & (previous >= 0)
+        io_rates[known] = (current["io"][known] - previous[known]) / 1024.0 / interval
+        return cpu_percent, io_rates
+
+    def log(self, backend, timestamp, sample, latest):
+        if sample["top"]:
+            backend.log_process_top(sample["top"], timestamp=timestamp)
+
+@register_source
+class OverheadSource(MetricSource):
+    """The monitor's own CPU and memory use and timing stats, see instrumentation.py.
+
+    Written to overhead_metrics only with the log_overhead option.
+    """
+    name = "overhead"
+    fields = ("cpu_percent", "rss_mb", "tick_p99_ms", "commit_p99_ms", "late_ticks", "skipped_ticks")
+
+    def sample(self, period):
+        usage = instruments.sample_process()
+        tick = instruments.summary("tick")
+        commit = instruments.summary("sqlite.commit")
+        return {
+            "cpu_percent": usage["cpu_percent"],
+            "rss_mb": usage["rss_mb"],
+            "tick_p99_ms": tick["p99"] * 1000.0 if "p99" in tick else None,
+            "commit_p99_ms": commit["p99"] * 1000.0 if "p99" in commit else None,
+            "late_ticks": instruments.counter("late_ticks"),
+            "skipped_ticks": instruments.counter("skipped_ticks"),
+        }
+
+    def log(self, backend, timestamp, sample, latest):
+        if self.options.get("log_overhead"):
+            backend.log_overhead_metrics(sample["cpu_percent"], sample["rss_mb"], sample["tick_p99_ms"],
+                                         sample["commit_p99_ms"], sample["late_ticks"], timestamp=timestamp)
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+V0_START = datetime(2024, 12, 18, 22, 0, 0)
+V0_ROWS = 600
+
+def write_v0_session(path, rows=V0_ROWS):
+    """A session in the original layout: comma-joined TEXT lists, no indexes, user_version 0."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE session_metadata (id INTEGER PRIMARY KEY AUTOINCREMENT, start_time TEXT, end_time TEXT);
+    CREATE TABLE cpu_metrics (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, core_usage TEXT,
+                              cpu_temp REAL, fan_speeds TEXT);
+    CREATE TABLE gpu_metrics (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, gpu_usage REAL,
+                              gpu_mem_usage REAL, gpu_temp REAL, gpu_fan REAL);
+    CREATE TABLE ram_metrics (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, ram_usage REAL);
+    CREATE TABLE network_metrics (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, download_speed REAL,
+                                  upload_speed REAL);
+    CREATE TABLE disk_metrics (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, read_speed REAL,
+                               write_speed REAL);
+    """)
+    conn.execute("INSERT INTO session_metadata (start_time, end_time) VALUES (?, ?)",
+                 (V0_START.strftime("%Y-%m-%d %H:%M:%S"),
+                  (V0_START + timedelta(seconds=rows)).strftime("%Y-%m-%d %H:%M:%S")))
+    for i in range(rows):
+        timestamp = (V0_START + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute("INSERT INTO cpu_metrics VALUES (?, ?, ?, ?)",
+                     (timestamp, f"{i % 100}.0,{(i * 7) % 100}.0", 40.0 + i % 20, "1200.0"))
+        conn.execute("INSERT INTO ram_metrics VALUES (?, ?)", (timestamp, float(i % 50)))
+        conn.execute("INSERT INTO network_metrics VALUES (?, ?, ?)", (timestamp, float(i), float(2 * i)))
+        conn.execute("INSERT INTO disk_metrics VALUES (?, ?, ?)", (timestamp, float(i % 13), 0.0))
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def v0_session(tmp_path):
+    return write_v0_session(str(tmp_path / "2024-12-18_22-00-00.db"))
+
+RECORDED_SECONDS = 300
+
+def record_session(base_dir, seconds=RECORDED_SECONDS):
+    """Record a closed session through BackendLogger with one sample per second of every kind."""
+    from backend import BackendLogger, format_timestamp
+    logger = BackendLogger(base_dir=str(base_dir) + os.sep, flush_interval=1e9, flush_rows=10000)
+    start = V0_START
+    for i in range(seconds):
+        timestamp = format_timestamp(start + timedelta(seconds=i, milliseconds=250))
+        logger.log_cpu_metrics([float(i % 100), float((i * 3) % 100)], 40.0 + i % 30, [1000.0 + i], timestamp)
+        logger.log_ram_metrics(float(i % 70), timestamp)
+        logger.log_network_metrics(float(i), float(i) / 2, timestamp, sample_interval=1.0)
+        logger.log_disk_metrics(float(i % 9), 1.0, timestamp, sample_interval=1.0)
+        logger.log_network_device_metrics(["lo", "eth0"], [(1.0, 1.0), (float(i), 2.0)], timestamp)
+        logger.log_process_top([(100 + i % 3, f"proc{i % 3}", 1.5, 20.0, 0.0, 0.0)], timestamp)
+        logger.log_overhead_metrics(0.5, 30.0, 1.0, 2.0, 0, timestamp)
+    logger.close()
+    return logger.db_path
+
+@pytest.fixture
+def recorded_session(tmp_path):
+    return record_session(tmp_path)
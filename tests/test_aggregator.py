@@ -0,0 +1,102 @@
+import os
+import socket
+import sqlite3
+import time
+import zlib
+import pytest
+import network_sink
+from aggregator import serve
+from backend import BackendLogger, INSERT_COLUMNS, DEVICES_TABLE
+from network_sink import ACK, FRAME, FRAME_MAGIC, NetworkSink, decode_batch, encode_batch, recv_exact
+
+def wait(condition, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+def send_frame(sock, seq, payload):
+    sock.sendall(FRAME.pack(FRAME_MAGIC, len(payload), seq) + payload)
+
+@pytest.fixture
+def aggregator(tmp_path):
+    server = serve(("127.0.0.1", 0), str(tmp_path / "aggregate.db"))
+    yield server
+    server.stop()
+
+def test_loopback_with_outage(tmp_path, monkeypatch):
+    monkeypatch.setattr(network_sink, "RECONNECT_MIN", 0.05)
+    store_path = str(tmp_path / "aggregate.db")
+    server = serve(("127.0.0.1", 0), store_path)
+    address = server.server_address
+    os.makedirs(tmp_path / "db")
+    sink = NetworkSink(address, str(tmp_path / "spool"), host_name="loopback")
+    logger = BackendLogger(base_dir=str(tmp_path / "db") + os.sep, flush_interval=1e9, sinks=[sink])
+
+    def log_samples(count):
+        for i in range(count):
+            logger.log_cpu_metrics([12.5, 50.0, float(i)], 55.0, [1200.0])
+            logger.log_ram_metrics(float(i))
+            logger.log_network_device_metrics(["lo", "eth0"], [(10.0, 10.0), (900.0, float(i))])
+        logger.flush()
+
+    log_samples(50)
+    assert wait(lambda: not sink.spooled)
+
+    # While the aggregator is down the batches wait in the spool
+    server.stop()
+    log_samples(50)
+    assert wait(lambda: not sink.connected)
+    log_samples(50)
+    assert sink.spooled
+    server = serve(address, store_path)
+    try:
+        assert wait(lambda: not sink.spooled)
+        db_path = logger.db_path
+        logger.close()
+    finally:
+        server.stop()
+
+    local = sqlite3.connect(db_path)
+    store = sqlite3.connect(store_path)
+    for table in ("cpu_metrics", "ram_metrics", "network_device_metrics", DEVICES_TABLE):
+        expected = local.execute(f"SELECT {', '.join(INSERT_COLUMNS[table])} FROM {table} ORDER BY rowid").fetchall()
+        received = store.execute(f"SELECT {', '.join(INSERT_COLUMNS[table])} FROM {table} "
+                                 f"WHERE host = 'loopback' ORDER BY rowid").fetchall()
+        assert received == expected, table
+    local.close()
+    store.close()
+
+def test_batch_sent_twice_is_stored_once(aggregator):
+    payload = encode_batch("h", "s", {"ram_metrics": [("2024-12-18 22:12:18.000", 1.0)]})
+    with socket.create_connection(aggregator.server_address) as sock:
+        for _ in range(2):
+            send_frame(sock, 7, payload)
+            assert ACK.unpack(recv_exact(sock, ACK.size)) == (7,)
+        # A new sequence number is a new batch
+        send_frame(sock, 8, payload)
+        assert ACK.unpack(recv_exact(sock, ACK.size)) == (8,)
+    with aggregator.lock:
+        rows = aggregator.conn.execute("SELECT host, session, ram_usage FROM ram_metrics").fetchall()
+    assert rows == [("h", "s", 1.0), ("h", "s", 1.0)]
+
+@pytest.mark.parametrize("payload", [b"not zlib at all", zlib.compress(b"[1, 2]"), zlib.compress(b"{")[:-2]])
+def test_bad_batch_closes_connection_without_ack(aggregator, payload):
+    with socket.create_connection(aggregator.server_address, timeout=5) as sock:
+        send_frame(sock, 1, payload)
+        assert sock.recv(ACK.size) == b""
+
+def test_decode_batch_caps_decompressed_size():
+    payload = zlib.compress(b" " * 10000000)
+    assert len(payload) < 20000
+    with pytest.raises(ValueError):
+        decode_batch(payload, max_size=1000000)
+
+def test_decode_batch_round_trip():
+    batches = {"cpu_metrics": [["2024-12-18 22:12:18.000", b"\x00\x01\xff", float("nan"), None, 1.5]]}
+    host, session, decoded = decode_batch(encode_batch("h", "s", batches))
+    assert (host, session) == ("h", "s")
+    assert decoded["cpu_metrics"][0][1] == b"\x00\x01\xff"
+    assert decoded["cpu_metrics"][0][2] != decoded["cpu_metrics"][0][2]
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import numpy as np
+import pytest
+import archive
+from archive import ArchiveReader, archive_session, verify_archive
+from backend import PROCESS_TABLE, OVERHEAD_TABLE, rollup_table
+from conftest import RECORDED_SECONDS
+
+def test_round_trip_keeps_every_table(recorded_session):
+    path = archive_session(recorded_session)
+    verify_archive(recorded_session, path)
+    reader = ArchiveReader(path)
+    conn = sqlite3.connect(recorded_session)
+    try:
+        for table in ("ram_metrics", rollup_table("ram_metrics", "1m"), PROCESS_TABLE, OVERHEAD_TABLE,
+                      "network_device_metrics"):
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            assert count > 0 and reader.rows(table) == count, table
+        ram = [row[0] for row in conn.execute("SELECT ram_usage FROM ram_metrics ORDER BY timestamp")]
+        assert np.array_equal(reader.column("ram_metrics", "ram_usage"), np.array(ram, dtype=np.float32))
+        names = [row[0] for row in conn.execute(f"SELECT name FROM {PROCESS_TABLE} ORDER BY timestamp")]
+        archived = [reader.index["process_names"][i] for i in reader.column(PROCESS_TABLE, "name_id")]
+        assert archived == names
+        rollup = conn.execute(f"SELECT sample_count, ram_usage_avg FROM {rollup_table('ram_metrics', '1m')} "
+                              "ORDER BY timestamp").fetchall()
+        assert reader.column(rollup_table("ram_metrics", "1m"), "sample_count").tolist() == [r[0] for r in rollup]
+        assert np.allclose(reader.column(rollup_table("ram_metrics", "1m"), "ram_usage_avg"),
+                           [r[1] for r in rollup])
+    finally:
+        conn.close()
+        reader.close()
+
+def test_rollup_queries_read_archived_rollups(recorded_session):
+    # Raw rows pruned while recording (raw_retention) survive in the rollups
+    conn = sqlite3.connect(recorded_session)
+    start, end = conn.execute("SELECT (julianday(MIN(timestamp)) - 2440587.5) * 86400.0, "
+                              "(julianday(MAX(timestamp)) - 2440587.5) * 86400.0 FROM ram_metrics").fetchone()
+    conn.execute("DELETE FROM ram_metrics")
+    conn.commit()
+    conn.close()
+    reader = ArchiveReader(archive_session(recorded_session))
+    try:
+        assert reader.rows("ram_metrics") == 0
+        rows = list(reader.iter_rows("ram_metrics", ["ram_usage"], start - 60, end, resolution="1m"))
+    finally:
+        reader.close()
+    assert len(rows) == RECORDED_SECONDS // 60
+    expected = [np.mean([float(i % 70) for i in range(60 * b, 60 * b + 60)]) for b in range(RECORDED_SECONDS // 60)]
+    assert np.allclose([value for _, value in rows], expected)
+
+def test_remove_keeps_session_when_a_table_is_not_archived(recorded_session):
+    conn = sqlite3.connect(recorded_session)
+    conn.execute("CREATE TABLE plugin_metrics (timestamp TEXT, value REAL)")
+    conn.execute("INSERT INTO plugin_metrics VALUES ('2024-12-18 22:00:00', 1.0)")
+    conn.commit()
+    conn.close()
+    with pytest.raises(ValueError):
+        verify_archive(recorded_session, archive_session(recorded_session))
+    assert archive.main([recorded_session, "--remove"]) == 1
+    assert os.path.exists(recorded_session)
+
+def test_remove_deletes_session_once_verified(recorded_session):
+    assert archive.main([recorded_session, "--remove"]) == 0
+    assert not os.path.exists(recorded_session)
+    assert os.path.exists(os.path.splitext(recorded_session)[0] + archive.ARCHIVE_SUFFIX)
@@ -0,0 +1,86 @@
+import sqlite3
+import threading
+from backend import BackendLogger, Sink
+
+class FailingSink(Sink):
+    """Raises on its first write only."""
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, batches):
+        self.writes.append(batches)
+        if len(self.writes) == 1:
+            raise RuntimeError("unreachable")
+
+class BlockingSink(Sink):
+    """Holds every write until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, batches):
+        self.started.set()
+        self.release.wait(10)
+
+def read_column(db_path, table, column):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute(f"SELECT {column} FROM {table} ORDER BY rowid")]
+    finally:
+        conn.close()
+
+def test_failing_extra_sink_does_not_duplicate_rows(tmp_path):
+    sink = FailingSink()
+    logger = BackendLogger(base_dir=str(tmp_path), flush_interval=1e9, sinks=[sink])
+    logger.log_ram_metrics(1.0)
+    logger.flush()
+    logger.log_ram_metrics(2.0)
+    logger.flush()
+    logger.close()
+    assert read_column(logger.db_path, "ram_metrics", "ram_usage") == [1.0, 2.0]
+    # The sink still got every batch once (the last one, from close, holds the rollups)
+    assert [batch["ram_metrics"][0][1] for batch in sink.writes if "ram_metrics" in batch] == [1.0, 2.0]
+
+def test_flush_after_flush_rows_from_every_log_method(tmp_path):
+    logger = BackendLogger(base_dir=str(tmp_path), flush_interval=1e9, flush_rows=3)
+    logger.log_ram_metrics(1.0)
+    logger.log_network_device_metrics(["lo"], [(1.0, 2.0)])
+    assert logger.flush_count == 0
+    logger.log_process_top([(1, "init", 0.0, 1.0, 0.0, 0.0)])
+    # The third pending row, whichever table it is in
+    assert logger.flush_count == 1 and logger.pending_rows == 0
+    logger.close()
+
+def test_flush_after_flush_interval(tmp_path, monkeypatch):
+    import backend
+    clock = [1000.0]
+    monkeypatch.setattr(backend.time, "monotonic", lambda: clock[0])
+    logger = BackendLogger(base_dir=str(tmp_path), flush_interval=5.0, flush_rows=1000)
+    logger.log_ram_metrics(1.0)
+    assert logger.flush_count == 0
+    clock[0] += 5.0
+    logger.log_ram_metrics(2.0)
+    assert logger.flush_count == 1
+    logger.close()
+    assert read_column(logger.db_path, "ram_metrics", "ram_usage") == [1.0, 2.0]
+
+def test_slow_extra_sink_does_not_block_logging(tmp_path):
+    sink = BlockingSink()
+    logger = BackendLogger(base_dir=str(tmp_path), flush_interval=1e9, sinks=[sink])
+    logger.log_ram_metrics(1.0)
+    flusher = threading.Thread(target=logger.flush)
+    flusher.start()
+    assert sink.started.wait(5)
+    # The flusher is inside the sink; logging must not wait for it
+    logging = threading.Thread(target=logger.log_ram_metrics, args=(2.0,))
+    logging.start()
+    logging.join(2)
+    blocked = logging.is_alive()
+    sink.release.set()
+    logging.join(5)
+    assert not blocked
+    flusher.join(5)
+    logger.close()
+    assert read_column(logger.db_path, "ram_metrics", "ram_usage") == [1.0, 2.0]
@@ -0,0 +1,48 @@
+import hashlib
+import os
+import sqlite3
+from datetime import timezone
+import numpy as np
+from conftest import V0_START, V0_ROWS
+from cross_session import SessionSet
+
+def digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def v0_epoch():
+    return V0_START.replace(tzinfo=timezone.utc).timestamp()
+
+def test_range_query_leaves_old_sessions_untouched(v0_session):
+    before = digest(v0_session)
+    sessions = SessionSet(os.path.dirname(v0_session))
+    try:
+        rows = list(sessions.query_range("ram_metrics", ["ram_usage"], 0, 4e9))
+        buckets = list(sessions.query_range("ram_metrics", ["ram_usage"], 0, 4e9, resolution="1m"))
+    finally:
+        sessions.close()
+    assert len(rows) == V0_ROWS
+    assert digest(v0_session) == before
+    conn = sqlite3.connect(v0_session)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+
+    # Without rollup tables the raw rows are averaged into the same buckets
+    start = v0_epoch()
+    assert [t for t, _ in buckets] == [start + 60 * i for i in range(V0_ROWS // 60)]
+    expected = [np.mean([float(i % 50) for i in range(60 * b, 60 * b + 60)]) for b in range(V0_ROWS // 60)]
+    assert np.allclose([value for _, value in buckets], expected)
+
+def test_raw_buckets_match_rollups(v0_session, tmp_path):
+    from backend import migrate_session
+    sessions = SessionSet(os.path.dirname(v0_session))
+    try:
+        start = v0_epoch() + 125
+        end = v0_epoch() + 475
+        raw = list(sessions.query_range("cpu_metrics", ["cpu_temp", "avg_usage"], start, end, resolution="10s"))
+        assert migrate_session(v0_session)
+        rolled = list(sessions.query_range("cpu_metrics", ["cpu_temp", "avg_usage"], start, end, resolution="10s"))
+    finally:
+        sessions.close()
+    assert len(raw) == len(rolled) > 0
+    assert np.allclose(np.array(raw, dtype=float), np.array(rolled, dtype=float))
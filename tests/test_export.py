@@ -0,0 +1,92 @@
+import csv
+import os
+from datetime import timezone
+import numpy as np
+import pytest
+from archive import archive_session
+from conftest import RECORDED_SECONDS, V0_START
+from export import FORMATS, export, iter_columnar
+
+TABLES = ["cpu_metrics", "ram_metrics", "network_metrics", "disk_metrics"]
+
+def expected_series():
+    """What record_session logged, by table and column."""
+    i = np.arange(RECORDED_SECONDS, dtype=np.float64)
+    return {
+        "time": V0_START.replace(tzinfo=timezone.utc).timestamp() + i + 0.25,
+        "cpu_metrics": {"avg_usage": (i % 100 + (i * 3) % 100) / 2, "cpu_temp": 40.0 + i % 30},
+        "ram_metrics": {"ram_usage": i % 70},
+        "network_metrics": {"download_speed": i, "upload_speed": i / 2},
+        "disk_metrics": {"read_speed": i % 9, "write_speed": np.ones_like(i)},
+    }
+
+def read_columnar(path):
+    groups = list(iter_columnar(path))
+    return {column: np.concatenate([group[column] for group in groups]) for column in groups[0]}
+
+@pytest.fixture
+def sources(recorded_session, tmp_path):
+    os.makedirs(tmp_path / "archived")
+    archive_path = archive_session(recorded_session, str(tmp_path / "archived" / "session.pcarc"))
+    return {"db": recorded_session, "archive": archive_path, "directory": os.path.dirname(recorded_session)}
+
+@pytest.mark.parametrize("kind", ["db", "archive", "directory"])
+def test_columnar_export_round_trip(sources, tmp_path, kind):
+    expected = expected_series()
+    # Small chunks so every table spans several row groups
+    results = export(sources[kind], str(tmp_path / kind), "columnar", TABLES, chunk_rows=64)
+    assert sorted(results) == sorted(TABLES)
+    for table in TABLES:
+        assert results[table]["rows"] == RECORDED_SECONDS
+        data = read_columnar(results[table]["path"])
+        assert np.allclose(data["time"], expected["time"], rtol=0, atol=1e-3), table
+        for column, values in expected[table].items():
+            assert np.allclose(data[column], values), (table, column)
+
+def test_every_format_writes_every_row(sources, tmp_path):
+    expected = expected_series()
+    results = {fmt: export(sources["db"], str(tmp_path / fmt), fmt, TABLES, tags={"host": "desk"})
+               for fmt in FORMATS}
+
+    with open(results["csv"]["ram_metrics"]["path"], newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["epoch_seconds", "ram_usage"]
+    values = np.array(rows[1:], dtype=np.float64)
+    assert len(values) == RECORDED_SECONDS
+    assert np.allclose(values[:, 0], expected["time"], rtol=0, atol=1e-3)
+    assert np.array_equal(values[:, 1], expected["ram_metrics"]["ram_usage"])
+
+    with open(results["line"]["network_metrics"]["path"]) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == RECORDED_SECONDS
+    stamp = round(expected["time"][3] * 1000) * 1000000
+    assert lines[3] == f"network_metrics,host=desk download_speed=3.0,upload_speed=1.5 {stamp}"
+
+    for table in TABLES:
+        assert {fmt: results[fmt][table]["rows"] for fmt in FORMATS} == dict.fromkeys(FORMATS, RECORDED_SECONDS)
+
+def test_time_range_narrows_every_source(sources, tmp_path):
+    times = expected_series()["time"]
+    start, end = times[100], times[159]
+    counts = {}
+    for kind, source in sources.items():
+        results = export(source, str(tmp_path / kind), "columnar", ["ram_metrics"], start, end)
+        data = read_columnar(results["ram_metrics"]["path"])
+        counts[kind] = len(data["time"])
+        assert data["time"].min() >= start - 1e-3 and data["time"].max() <= end + 1e-3
+    assert counts == dict.fromkeys(sources, 60)
+
+@pytest.mark.parametrize("fmt", list(FORMATS))
+def test_failed_export_leaves_no_file(recorded_session, tmp_path, monkeypatch, fmt):
+    import export as export_module
+    iter_chunks = export_module.iter_chunks
+
+    def failing(*args, **kwargs):
+        chunks = iter_chunks(*args, **kwargs)
+        yield next(chunks)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(export_module, "iter_chunks", failing)
+    with pytest.raises(OSError):
+        export(recorded_session, str(tmp_path / "out"), fmt, ["ram_metrics"], chunk_rows=64)
+    assert os.listdir(tmp_path / "out") == []
@@ -0,0 +1,34 @@
+import os
+from types import SimpleNamespace
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+from PyQt5.QtCore import Qt
+import gui
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+def test_session_being_recorded_cannot_be_renamed(app, tmp_path):
+    sessions = [{"filename": "closed.db", "start_time": "2024-12-18 22:00:00", "end_time": "2024-12-18 23:00:00",
+                 "sample_rows": 1, "size": 0},
+                {"filename": "live.db", "start_time": "2024-12-19 08:00:00", "end_time": None,
+                 "sample_rows": 1, "size": 0}]
+    for session in sessions:
+        (tmp_path / session["filename"]).write_bytes(b"")
+    renamed = []
+    catalog = SimpleNamespace(db_dir=str(tmp_path), sessions=lambda: sessions,
+                              rename=lambda old, new: renamed.append((old, new)))
+    model = gui.SessionTableModel(catalog)
+    model.reload()
+    closed, live = model.index(0, 0), model.index(1, 0)
+
+    assert not model.flags(live) & Qt.ItemIsEditable
+    assert not model.setData(live, "renamed")
+    assert (tmp_path / "live.db").exists() and not renamed
+
+    assert model.flags(closed) & Qt.ItemIsEditable
+    assert model.setData(closed, "renamed")
+    assert (tmp_path / "renamed.db").exists() and len(renamed) == 1
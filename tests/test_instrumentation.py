@@ -0,0 +1,58 @@
+import contextlib
+import math
+import time
+from types import SimpleNamespace
+import instrumentation
+from instrumentation import Instrumentation
+
+class FakeProcess:
+    """A process whose CPU time is set by the test."""
+
+    def __init__(self):
+        self.cpu = 0.0
+
+    def cpu_times(self):
+        return SimpleNamespace(user=self.cpu, system=0.0)
+
+    def memory_info(self):
+        return SimpleNamespace(rss=64 * 1024 ** 2)
+
+    def oneshot(self):
+        return contextlib.nullcontext()
+
+def make_instruments(monkeypatch, num_cpus=2):
+    clock = [1000.0]
+    monkeypatch.setattr(instrumentation.time, "monotonic", lambda: clock[0])
+    instruments = Instrumentation()
+    instruments.process = FakeProcess()
+    instruments.num_cpus = num_cpus
+    instruments.start_cpu_measurement()
+    return instruments, clock
+
+def test_first_sample_right_after_start_is_nan(monkeypatch):
+    instruments, clock = make_instruments(monkeypatch)
+    # A few ms after the start, with a burst of CPU time (e.g. imports)
+    clock[0] += 0.005
+    instruments.process.cpu = 0.02
+    usage = instruments.sample_process()
+    assert math.isnan(usage["cpu_percent"])
+    assert instruments.summary("process.cpu_percent") == {"count": 0}
+
+    # The next sample is measured from the start
+    clock[0] += 0.995
+    instruments.process.cpu = 0.5
+    usage = instruments.sample_process()
+    assert usage["cpu_percent"] == 25.0
+
+def test_cpu_percent_never_above_100(monkeypatch):
+    instruments, clock = make_instruments(monkeypatch, num_cpus=1)
+    clock[0] += 0.2
+    instruments.process.cpu = 0.3
+    assert instruments.sample_process()["cpu_percent"] == 100.0
+
+def test_real_process():
+    instruments = Instrumentation()
+    time.sleep(instrumentation.MIN_CPU_INTERVAL)
+    usage = instruments.sample_process()
+    assert 0.0 <= usage["cpu_percent"] <= 100.0
+    assert usage["rss_mb"] > 0
@@ -0,0 +1,59 @@
+import sqlite3
+import numpy as np
+from conftest import V0_ROWS
+from backend import (DEVICES_TABLE, METRIC_TABLES, PROCESS_TABLE, RATE_TABLES, ROLLUP_RESOLUTIONS,
+                     SCHEMA_VERSION, migrate_session, rollup_table)
+from session_query import SessionReader
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def test_v0_session_migrates_to_current_schema(v0_session):
+    assert migrate_session(v0_session)
+    conn = sqlite3.connect(v0_session)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION == 6
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert "avg_usage" in columns(conn, "cpu_metrics")
+        for table in RATE_TABLES:
+            assert "sample_interval" in columns(conn, table)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for table in METRIC_TABLES:
+            assert f"idx_{table}_timestamp" in indexes
+        assert columns(conn, DEVICES_TABLE) and columns(conn, PROCESS_TABLE)
+
+        # Existing rows are kept as they were, and the rollups cover all of them
+        assert conn.execute("SELECT COUNT(*) FROM ram_metrics").fetchone()[0] == V0_ROWS
+        assert conn.execute("SELECT COUNT(*) FROM cpu_metrics WHERE avg_usage IS NULL").fetchone()[0] == V0_ROWS
+        for resolution in ROLLUP_RESOLUTIONS:
+            count = conn.execute(f"SELECT SUM(sample_count) FROM {rollup_table('cpu_metrics', resolution)}")
+            assert count.fetchone()[0] == V0_ROWS
+        first = conn.execute(f"SELECT avg_usage_avg FROM {rollup_table('cpu_metrics', '10s')} ORDER BY timestamp")
+        # Cores of the first ten rows: (i, 7i % 100) for i in 0..9
+        assert np.isclose(first.fetchone()[0], np.mean([(i + (i * 7) % 100) / 2 for i in range(10)]))
+    finally:
+        conn.close()
+
+def test_migrated_v0_rows_stay_readable(v0_session):
+    migrate_session(v0_session)
+    reader = SessionReader(v0_session)
+    try:
+        data = reader.columns("cpu_metrics", ["core_usage", "cpu_temp"])
+    finally:
+        reader.close()
+    assert len(data["time"]) == V0_ROWS
+    cores = data["core_usage"]
+    assert cores.shape == (V0_ROWS, 2)
+    assert cores[13].tolist() == [13.0, 91.0]
+    assert data["cpu_temp"][25] == 45.0
+
+def test_migration_is_idempotent(v0_session):
+    migrate_session(v0_session)
+    conn = sqlite3.connect(v0_session)
+    before = conn.execute(f"SELECT * FROM {rollup_table('ram_metrics', '1m')} ORDER BY timestamp").fetchall()
+    conn.close()
+    assert migrate_session(v0_session)
+    conn = sqlite3.connect(v0_session)
+    after = conn.execute(f"SELECT * FROM {rollup_table('ram_metrics', '1m')} ORDER BY timestamp").fetchall()
+    conn.close()
+    assert after == before
@@ -0,0 +1,40 @@
+import os
+import threading
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+import old_data_viewer
+from backend import SCHEMA_VERSION
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+def user_version(path):
+    import sqlite3
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_old_session_is_migrated_off_the_gui_thread(app, v0_session, monkeypatch):
+    migrated_in = []
+    migrate = old_data_viewer.migrate_session
+
+    def record_thread(path):
+        migrated_in.append(threading.current_thread())
+        return migrate(path)
+
+    monkeypatch.setattr(old_data_viewer, "migrate_session", record_thread)
+    viewer = old_data_viewer.OldDataViewer(v0_session)
+    try:
+        assert viewer.loader.wait(30000)
+        assert len(migrated_in) == 1 and migrated_in[0] is not threading.main_thread()
+        assert user_version(v0_session) == SCHEMA_VERSION
+        app.processEvents()
+        payload = viewer.payloads["ram_metrics"]
+        assert payload is not None
+    finally:
+        viewer.close()
@@ -0,0 +1,38 @@
+import numpy as np
+from ring_buffer import RingBuffer
+
+def test_fills_then_wraps_oldest_first():
+    buffer = RingBuffer(4)
+    assert len(buffer) == 0 and buffer.latest() is None
+    for value in range(3):
+        buffer.append(value)
+    assert buffer.view().tolist() == [0, 1, 2]
+    for value in range(3, 11):
+        buffer.append(value)
+        expected = list(range(max(0, value - 3), value + 1))
+        assert buffer.view().tolist() == expected
+        assert buffer.latest() == value
+    assert len(buffer) == 4
+
+def test_view_is_contiguous_without_copy():
+    buffer = RingBuffer(5)
+    for value in range(12):
+        buffer.append(value)
+    view = buffer.view()
+    assert np.shares_memory(view, buffer.data)
+    assert view.flags["C_CONTIGUOUS"]
+
+def test_rows_wrap_together():
+    buffer = RingBuffer(3, rows=2)
+    for value in range(5):
+        buffer.append([value, -value])
+    assert buffer.view().tolist() == [[2, 3, 4], [-2, -3, -4]]
+    assert buffer.latest().tolist() == [4, -4]
+
+def test_clear_starts_over():
+    buffer = RingBuffer(3)
+    for value in range(5):
+        buffer.append(value)
+    buffer.clear()
+    buffer.append(9)
+    assert buffer.view().tolist() == [9]
@@ -0,0 +1,44 @@
+import sqlite3
+import numpy as np
+import pytest
+from backend import ROLLUP_COLUMNS, ROLLUP_RESOLUTIONS, rebuild_rollups, rollup_columns, rollup_table
+
+def raw_aggregates(conn, table, seconds):
+    exprs = ", ".join(f"MIN({column}), MAX({column}), AVG({column})" for column in ROLLUP_COLUMNS[table])
+    return conn.execute(f"""
+    SELECT (CAST(strftime('%s', timestamp) AS INTEGER) / {seconds}) * {seconds}, COUNT(*), {exprs}
+    FROM {table} GROUP BY 1 ORDER BY 1
+    """).fetchall()
+
+def rollup_rows(conn, table, resolution):
+    columns = rollup_columns(table)
+    return conn.execute(f"""
+    SELECT CAST(strftime('%s', timestamp) AS INTEGER), {", ".join(columns[1:])}
+    FROM {rollup_table(table, resolution)} ORDER BY timestamp
+    """).fetchall()
+
+@pytest.mark.parametrize("table", ["cpu_metrics", "ram_metrics", "network_metrics", "disk_metrics"])
+@pytest.mark.parametrize("resolution", list(ROLLUP_RESOLUTIONS))
+def test_live_rollups_match_raw_aggregates(recorded_session, table, resolution):
+    conn = sqlite3.connect(recorded_session)
+    try:
+        expected = raw_aggregates(conn, table, ROLLUP_RESOLUTIONS[resolution])
+        written = rollup_rows(conn, table, resolution)
+    finally:
+        conn.close()
+    assert len(written) == len(expected) > 0
+    assert np.allclose(np.array(written, dtype=float), np.array(expected, dtype=float))
+
+def test_rebuilt_rollups_match_live_ones(recorded_session):
+    conn = sqlite3.connect(recorded_session)
+    try:
+        live = {table: rollup_rows(conn, table, "1m") for table in ROLLUP_COLUMNS}
+        conn.execute(f"DELETE FROM {rollup_table('cpu_metrics', '1m')}")
+        rebuild_rollups(conn)
+        for table, rows in live.items():
+            rebuilt = rollup_rows(conn, table, "1m")
+            assert len(rebuilt) == len(rows)
+            if rows:
+                assert np.allclose(np.array(rebuilt, dtype=float), np.array(rows, dtype=float), equal_nan=True)
+    finally:
+        conn.close()
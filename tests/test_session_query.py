@@ -0,0 +1,57 @@
+import sqlite3
+from datetime import timedelta
+import session_query
+from backend import format_timestamp
+from conftest import RECORDED_SECONDS, V0_START
+from session_query import SessionReader
+
+def append_ram_rows(db_path, first, count):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO ram_metrics (timestamp, ram_usage) VALUES (?, ?)",
+                         [(format_timestamp(V0_START + timedelta(seconds=first + i)), 99.0) for i in range(count)])
+    conn.close()
+
+def test_load_table_reads_one_snapshot(recorded_session, monkeypatch):
+    reader = SessionReader(recorded_session)
+    get_time_bounds = session_query.get_time_bounds
+
+    def commit_meanwhile(conn, table):
+        # The logger commits between the rowid read and the bucket queries
+        append_ram_rows(recorded_session, RECORDED_SECONDS, 5)
+        return get_time_bounds(conn, table)
+
+    monkeypatch.setattr(session_query, "get_time_bounds", commit_meanwhile)
+    try:
+        payload = reader.load_table("ram_metrics", ["ram_usage"])
+        monkeypatch.setattr(session_query, "get_time_bounds", get_time_bounds)
+        assert len(payload["buckets"]["time"]) == RECORDED_SECONDS
+        assert payload["buckets"]["ram_usage"]["max"].max() < 99.0
+        # The rows committed meanwhile are left to the tail, once
+        rowid, rows = reader.new_rows("ram_metrics", ["ram_usage"], payload["rowids"][0])
+        assert rows["ram_usage"].tolist() == [99.0] * 5
+    finally:
+        reader.close()
+
+def test_buckets_include_the_open_rollup_bucket(tmp_path):
+    from backend import BackendLogger
+    logger = BackendLogger(base_dir=str(tmp_path) + "/", flush_interval=1e9)
+    try:
+        # Still recording: the 10 s bucket of 90-94 s has no rollup row yet
+        for i in range(95):
+            logger.log_ram_metrics(float(i), format_timestamp(V0_START + timedelta(seconds=i)))
+        logger.flush()
+        conn = session_query.open_session(logger.db_path)
+        try:
+            start, end = session_query.get_time_bounds(conn, "ram_metrics")
+            assert session_query._pick_rollup(conn, "ram_metrics", start, (end - start) / 5)[1] == 10
+            buckets = session_query.query_buckets(conn, "ram_metrics", ["ram_usage"], start, end, max_points=5)
+        finally:
+            conn.close()
+    finally:
+        logger.close()
+    assert buckets["ram_usage"]["max"][-1] == 94.0
+    # The 80-89 rollup row and the raw 90-94 rows
+    assert buckets["ram_usage"]["mean"][-1] == 87.0
+    assert buckets["ram_usage"]["min"][0] == 0.0
+    assert buckets["time"][-1] > 80.0 + start
@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+import numpy as np
+import sources
+from sources import ProcessSource
+
+class FakeProcess:
+    def __init__(self, pid, start, cpu, rss_mb=10.0, io=(0, 0), denied=False):
+        self.pid = pid
+        # As process_iter(PROCESS_ATTRS, ad_value=None) fills it
+        self.info = {"name": f"p{pid}", "create_time": start,
+                     "cpu_times": SimpleNamespace(user=cpu, system=0.0),
+                     "memory_info": SimpleNamespace(rss=rss_mb * 1024 ** 2),
+                     "io_counters": None if denied else SimpleNamespace(read_bytes=io[0], write_bytes=io[1])}
+
+    def io_counters(self):
+        raise AssertionError("I/O counters are read in the process_iter batch")
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+def make_source(monkeypatch, processes, clock):
+    monkeypatch.setattr(sources.psutil, "process_iter", lambda attrs, ad_value=None: list(processes))
+    monkeypatch.setattr(sources.time, "monotonic", clock.monotonic)
+    source = ProcessSource(process_top=2)
+    monkeypatch.setattr(sources.psutil, "pids", lambda: [p.pid for p in processes])
+    assert source.discover()
+    return source
+
+def test_nothing_listed_until_cpu_baseline(monkeypatch):
+    clock = Clock()
+    processes = [FakeProcess(1, 1.0, 5.0), FakeProcess(2, 1.0, 1.0)]
+    source = make_source(monkeypatch, processes, clock)
+    assert source.sample(2.0)["top"] == []
+
+    # A tick right after the trial sample is too short to measure
+    clock.now += 0.005
+    processes[0].info["cpu_times"].user += 0.006
+    assert source.sample(2.0)["top"] == []
+
+    # Measured from the first sample; a process started since is not listed
+    clock.now += 1.995
+    processes[0].info["cpu_times"].user += 1.0
+    processes.append(FakeProcess(3, 50.0, 9.0))
+    top = source.sample(2.0)["top"]
+    assert [row[0] for row in top] == [1, 2]
+    assert np.isclose(top[0][2], (1.0 + 0.006) / 2.0 * 100.0)
+    assert top[1][2] == 0.0
+
+def test_io_denied_keyed_by_pid_and_create_time(monkeypatch):
+    clock = Clock()
+    denied = FakeProcess(7, 1.0, 0.0, denied=True)
+    processes = [denied]
+    source = make_source(monkeypatch, processes, clock)
+    source.sample(2.0)
+    clock.now += 2.0
+    source.sample(2.0)
+    assert source.io_denied == {(7, 1.0)}
+
+    # The PID is reused by a process whose counters are readable
+    reused = FakeProcess(7, 30.0, 0.0, io=(1024, 0))
+    processes[:] = [reused]
+    clock.now += 2.0
+    source.sample(2.0)
+    assert source.io_denied == set()
+
+def test_io_denied_forgets_dead_processes(monkeypatch):
+    clock = Clock()
+    processes = [FakeProcess(pid, 1.0, 0.0, denied=True) for pid in range(10, 15)]
+    source = make_source(monkeypatch, processes, clock)
+    source.sample(2.0)
+    assert len(source.io_denied) == 5
+    # As many processes as before, but others
+    processes[:] = [FakeProcess(pid, 1.0, 0.0) for pid in range(20, 25)]
+    clock.now += 2.0
+    source.sample(2.0)
+    assert source.io_denied == set()
+
+def counters(*rows):
+    return np.array(rows, dtype=np.int64).reshape(len(rows), 2)
+
+def test_device_counters_rates_and_32_bit_wrap():
+    device = sources.DeviceCounters(read=None, include=lambda name: name != "lo")
+    names, rates, interval = device.rates(["lo", "eth0"], counters((0, 0), (1024, 2048)), 10.0)
+    assert names == ["eth0"] and np.isnan(rates).all() and np.isnan(interval)
+
+    # 2 s later: 2 KB received; the sent counter wrapped past 2**32
+    wrap = sources.COUNTER_WRAP
+    names, rates, interval = device.rates(["lo", "eth0"], counters((5, 5), (1024 + 2048, 1024)), 12.0)
+    assert interval == 2.0
+    assert rates.tolist() == [[1.0, (wrap - 2048 + 1024) / 1024.0 / 2.0]]
+
+def test_device_counters_reset_of_a_64_bit_counter_counts_from_zero():
+    device = sources.DeviceCounters(read=None, include=lambda name: True)
+    big = sources.COUNTER_WRAP * 4
+    device.rates(["sda"], counters((big, big)), 0.0)
+    # The driver was reloaded: the counters start over
+    _, rates, _ = device.rates(["sda"], counters((4096, 0)), 1.0)
+    assert rates.tolist() == [[4.0, 0.0]]
+
+def test_device_counters_hot_plug_and_removal():
+    device = sources.DeviceCounters(read=None, include=lambda name: True)
+    device.rates(["sda"], counters((0, 0)), 0.0)
+    names, rates, _ = device.rates(["sda", "sdb"], counters((1024, 0), (50000, 50000)), 1.0)
+    assert names == ["sda", "sdb"]
+    assert rates[0].tolist() == [1.0, 0.0] and np.isnan(rates[1]).all()
+    names, rates, _ = device.rates(["sdb"], counters((51024, 50000)), 2.0)
+    assert names == ["sdb"] and rates.tolist() == [[1.0, 0.0]]
+
+def test_cpu_source_skips_a_too_short_first_interval(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sources.time, "monotonic", clock.monotonic)
+    calls = []
+    monkeypatch.setattr(sources.psutil, "cpu_percent", lambda interval, percpu: calls.append(1) or [50.0, 25.0])
+    source = sources.CpuSource(procfs=False)
+    assert source.discover() and len(calls) == 1
+    # The trial sample of discover_sources and a first tick 30 ms later
+    clock.now += 0.03
+    assert source.sample(1.0) is None
+    assert len(calls) == 1
+    clock.now += 1.0
+    assert source.sample(1.0) == {"core_usage": [50.0, 25.0]}
+
+def test_device_counters_skip_a_too_short_interval(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sources.time, "monotonic", clock.monotonic)
+    reads = iter([(["sda"], counters((0, 0))), (["sda"], counters((2048, 1024)))])
+    device = sources.DeviceCounters(read=lambda: next(reads), include=lambda name: True)
+    assert device.discover()
+    clock.now += 0.03
+    assert device.sample() is None
+    clock.now += 0.97
+    names, rates, interval = device.sample()
+    assert interval == 1.0 and rates.tolist() == [[2.0, 1.0]]